@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class BalancesheetAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'BalanceSheet_app'
+
+    def ready(self):
+        from . import signals
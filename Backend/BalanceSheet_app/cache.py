@@ -0,0 +1,84 @@
+import time
+from django.core.cache import cache
+from UserManagement_app.versioning import bump_data_versions, get_data_version, versions_shared
+from .services import build_balance_sheet
+
+# Generation of each user's balance sheet, bumped after every committed write to their
+# expenses or group details; cached sheets are keyed by it so a write invalidates them
+GENERATION_SCOPE = 'balance-sheet'
+
+SHEET_KEY = 'balance-sheet:{}:{}'
+LOCK_KEY = 'balance-sheet-lock:{}:{}'
+STATS_KEY = 'balance-sheet-stats:{}'
+STATS = ['hits', 'misses', 'computed', 'waited']
+
+# Superseded generations are never read again and simply expire
+SHEET_TIMEOUT = 60 * 60
+
+# One request computes a missing sheet while the others wait for it, up to LOCK_WAIT
+# seconds, after which they compute it themselves
+LOCK_TIMEOUT = 30
+LOCK_WAIT = 5
+LOCK_POLL_INTERVAL = 0.05
+
+
+def count(stat):
+    key = STATS_KEY.format(stat)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def cache_stats():
+    values = cache.get_many([STATS_KEY.format(stat) for stat in STATS])
+    stats = {stat: values.get(STATS_KEY.format(stat), 0) for stat in STATS}
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else None
+    return stats
+
+
+def reset_cache_stats():
+    cache.delete_many([STATS_KEY.format(stat) for stat in STATS])
+
+
+def invalidate_balance_sheet(user_id):
+    bump_data_versions([user_id], GENERATION_SCOPE)
+
+
+def get_balance_sheet(user):
+    # A per-process cache would miss invalidations made by other processes
+    if not versions_shared():
+        return build_balance_sheet(user)
+
+    generation = get_data_version(user.id, GENERATION_SCOPE)
+    key = SHEET_KEY.format(user.id, generation)
+
+    balance_sheet = cache.get(key)
+    if balance_sheet is not None:
+        count('hits')
+        return balance_sheet
+    count('misses')
+
+    lock_key = LOCK_KEY.format(user.id, generation)
+    locked = cache.add(lock_key, 1, timeout=LOCK_TIMEOUT)
+    if not locked:
+        # Someone else is computing this generation already
+        count('waited')
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            balance_sheet = cache.get(key)
+            if balance_sheet is not None:
+                return balance_sheet
+
+    try:
+        balance_sheet = build_balance_sheet(user)
+        cache.set(key, balance_sheet, timeout=SHEET_TIMEOUT)
+        count('computed')
+    finally:
+        # A waiter that gave up must not release the lock of the request still computing
+        if locked:
+            cache.delete(lock_key)
+    return balance_sheet
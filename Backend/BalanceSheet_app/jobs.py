@@ -0,0 +1,41 @@
+from datetime import timedelta
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from .models import BalanceSheetJob
+from .tasks import email_balance_sheet
+
+# Active jobs not updated for this long are assumed lost with their worker
+STALE_AFTER = timedelta(minutes=30)
+
+
+def expire_stale_jobs(user):
+    BalanceSheetJob.objects.filter(
+        user=user,
+        status__in=BalanceSheetJob.ACTIVE_STATUSES,
+        updated_at__lt=timezone.now() - STALE_AFTER,
+    ).update(status=BalanceSheetJob.FAILED, error="Job timed out.", finished_at=timezone.now())
+
+
+def enqueue(job_id):
+    try:
+        email_balance_sheet.delay(str(job_id))
+    except Exception as e:
+        BalanceSheetJob.objects.filter(id=job_id).update(
+            status=BalanceSheetJob.FAILED, error=f"Could not queue the job: {e}", finished_at=timezone.now()
+        )
+
+
+def start_balance_sheet_job(user):
+    """Queues a balance sheet email for user, or returns the job already in flight.
+
+    Returns (job, created). The partial unique constraint on active jobs makes
+    concurrent requests collapse into one job.
+    """
+    expire_stale_jobs(user)
+    try:
+        with transaction.atomic():
+            job = BalanceSheetJob.objects.create(user=user)
+            transaction.on_commit(lambda: enqueue(job.id))
+        return job, True
+    except IntegrityError:
+        return BalanceSheetJob.objects.get(user=user, status__in=BalanceSheetJob.ACTIVE_STATUSES), False
@@ -0,0 +1,129 @@
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test.utils import override_settings
+from BalanceSheet_app.models import BalanceSheetJob
+from BalanceSheet_app.reports import SPOOL_MAX_SIZE, write_balance_sheet
+from BalanceSheet_app.tasks import email_balance_sheet
+from Expenses_app.models import Expense, GroupExpenseDetail
+from datetime import date
+from decimal import Decimal
+from tempfile import SpooledTemporaryFile, TemporaryDirectory
+import resource
+import time
+
+CustomUser = get_user_model()
+
+AMOUNT = Decimal('12.50')
+ZERO = Decimal('0.00')
+
+# Rows inserted per query while seeding the database
+SEED_BATCH_SIZE = 5000
+
+
+def synthetic_rows(count):
+    for i in range(count):
+        paid = i % 3 == 0
+        yield {
+            'date': date(2024, 1, 1),
+            'name': f'Expense {i}',
+            'amount': AMOUNT,
+            'type': 'Group',
+            'note': 'Dinner with friends',
+            'paid': AMOUNT if paid else ZERO,
+            'owed': ZERO if paid else AMOUNT,
+        }
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# Builds the full MIME message like an SMTP backend would, then drops it
+class RenderingEmailBackend(BaseEmailBackend):
+    rendered_bytes = 0
+
+    def send_messages(self, email_messages):
+        for message in email_messages:
+            RenderingEmailBackend.rendered_bytes = len(message.message().as_bytes())
+        return len(email_messages)
+
+
+# Half personal expenses, half group details (three per group expense)
+def seed_expenses(user, count):
+    personal = count // 2
+    for start in range(0, personal, SEED_BATCH_SIZE):
+        Expense.objects.bulk_create([
+            Expense(user=user, date=date(2024, 1, 1), name=f'Expense {i}', amount=AMOUNT, note='Lunch', expense_type='Personal')
+            for i in range(start, min(start + SEED_BATCH_SIZE, personal))
+        ])
+
+    group_expenses = (count - personal + 2) // 3
+    for start in range(0, group_expenses, SEED_BATCH_SIZE):
+        expenses = Expense.objects.bulk_create([
+            Expense(user=user, date=date(2024, 1, 1), name=f'Dinner {i}', amount=AMOUNT * 3, note='Dinner with friends',
+                    expense_type='Group', split_type='Equal', total_friends=2)
+            for i in range(start, min(start + SEED_BATCH_SIZE, group_expenses))
+        ])
+        GroupExpenseDetail.objects.bulk_create([
+            GroupExpenseDetail(expense=expense, name=name, username=username, email=f'{name}@example.com', amount=AMOUNT, is_paid=username is not None)
+            for expense in expenses
+            for name, username in (('owner', user.username), ('carol', None), ('dave', None))
+        ])
+
+
+class Command(BaseCommand):
+    help = (
+        'Writes balance sheets of increasing size and reports time, file size and peak RSS. '
+        'With --task the rows are seeded into the database and the whole email task runs, '
+        'including the attachment or stored download, inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000], help='Sheet sizes to write, smallest first.')
+        parser.add_argument('--task', action='store_true', help='Benchmark the email_balance_sheet task on seeded database rows.')
+
+    def handle(self, *args, **options):
+        if options['task']:
+            self.stdout.write(f"{'rows':>10} {'seconds':>9} {'rows/s':>10} {'delivery':>10} {'email MB':>9} {'peak RSS MB':>12}")
+        else:
+            self.stdout.write(f"{'rows':>10} {'seconds':>9} {'rows/s':>10} {'file MB':>8} {'peak RSS MB':>12}")
+
+        for count in sorted(options['rows']):
+            if options['task']:
+                self.benchmark_task(count)
+                continue
+
+            started = time.perf_counter()
+            with SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as excel_file:
+                write_balance_sheet(synthetic_rows(count), {'total_paid': ZERO, 'total_owed': ZERO}, excel_file)
+                size = excel_file.tell()
+            elapsed = time.perf_counter() - started
+            # Peak RSS only grows, a flat column across sizes means constant memory
+            self.stdout.write(f"{count:>10} {elapsed:>9.2f} {count / elapsed:>10,.0f} {size / 2**20:>8.1f} {peak_rss_mb():>12.1f}")
+
+    def benchmark_task(self, count):
+        email_backend = f'{RenderingEmailBackend.__module__}.{RenderingEmailBackend.__name__}'
+        with TemporaryDirectory() as media_root, override_settings(EMAIL_BACKEND=email_backend, MEDIA_ROOT=media_root):
+            with transaction.atomic():
+                user = CustomUser.objects.create_user(username='balance-sheet-benchmark', email='balance-sheet-benchmark@example.com')
+                seed_expenses(user, count)
+                job = BalanceSheetJob.objects.create(user=user)
+                RenderingEmailBackend.rendered_bytes = 0
+
+                started = time.perf_counter()
+                email_balance_sheet(str(job.id))
+                elapsed = time.perf_counter() - started
+
+                job.refresh_from_db()
+                if job.status != BalanceSheetJob.SUCCEEDED:
+                    self.stderr.write(f"Job failed: {job.error}")
+                delivery = 'download' if job.report else 'attached'
+                transaction.set_rollback(True)
+
+        self.stdout.write(
+            f"{count:>10} {elapsed:>9.2f} {count / elapsed:>10,.0f} {delivery:>10} "
+            f"{RenderingEmailBackend.rendered_bytes / 2**20:>9.1f} {peak_rss_mb():>12.1f}"
+        )
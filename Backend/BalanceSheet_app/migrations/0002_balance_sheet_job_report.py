@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:00
+
+import BalanceSheet_app.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BalanceSheet_app', '0001_balance_sheet_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='balancesheetjob',
+            name='report',
+            field=models.FileField(blank=True, null=True, upload_to=BalanceSheet_app.models.balance_sheet_report_path),
+        ),
+    ]
@@ -1,3 +1,50 @@
+import os
+import uuid
 from django.db import models
+from UserManagement_app.models import *
 
-# Create your models here.
+
+def balance_sheet_report_path(instance, filename):
+    # path is : media/balance_sheets/username/<job id>.xlsx
+    return os.path.join('balance_sheets', instance.user.username, filename)
+
+# One request to build the balance sheet workbook and email it, run by a Celery worker
+class BalanceSheetJob(models.Model):
+    PENDING = 'Pending'
+    RUNNING = 'Running'
+    SUCCEEDED = 'Succeeded'
+    FAILED = 'Failed'
+
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    ACTIVE_STATUSES = [PENDING, RUNNING]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='balance_sheet_jobs')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    rows_written = models.IntegerField(default=0)
+    total_rows = models.IntegerField(null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+    # Workbooks too big to attach are kept here for the owner to download
+    report = models.FileField(upload_to=balance_sheet_report_path, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # At most one job in flight per user, concurrent requests join it
+            models.UniqueConstraint(
+                fields=['user'],
+                condition=models.Q(status__in=['Pending', 'Running']),
+                name='one_active_balance_sheet_job',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Balance sheet job {self.id} of {self.user.username} ({self.status})"
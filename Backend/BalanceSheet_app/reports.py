@@ -0,0 +1,54 @@
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from .services import ROW_FIELDS
+
+HEADERS = ['Date', 'Name', 'Amount', 'Type', 'Note', 'Paid', 'Owed']
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Progress is reported after every this many rows
+PROGRESS_EVERY = 500
+
+# Workbooks up to this size stay in memory, bigger ones spill to a temporary file
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# Attachments are base64 encoded in memory when the email is built, so only workbooks
+# still in memory are attached; bigger ones are stored for download instead
+ATTACHMENT_MAX_SIZE = SPOOL_MAX_SIZE
+
+
+def write_balance_sheet(rows, totals, fileobj, progress=None):
+    """Writes balance sheet rows and totals as an .xlsx workbook into fileobj.
+
+    The workbook is write-only, so rows are streamed out as they are appended
+    and memory does not grow with the number of rows. progress, when given, is
+    called with the number of rows written so far. Returns that number.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Balance Sheet")
+
+    # Adding headers
+    header_cells = []
+    for header in HEADERS:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.font = Font(bold=True)
+        header_cells.append(cell)
+    ws.append(header_cells)
+
+    written = 0
+    for row in rows:
+        cells = [row[field] for field in ROW_FIELDS]
+        cells[0] = cells[0].strftime('%Y-%m-%d')
+        ws.append(cells)
+        written += 1
+        if progress and written % PROGRESS_EVERY == 0:
+            progress(written)
+
+    # Adding totals
+    ws.append(["Total", None, None, None, None, totals['total_paid'], totals['total_owed']])
+
+    wb.save(fileobj)
+    if progress:
+        progress(written)
+    return written
@@ -0,0 +1,17 @@
+from rest_framework import serializers
+from rest_framework.reverse import reverse
+from .models import BalanceSheetJob
+
+class BalanceSheetJobSerializer(serializers.ModelSerializer):
+    job_id = serializers.UUIDField(source='id')
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = BalanceSheetJob
+        fields = ['job_id', 'status', 'rows_written', 'total_rows', 'error', 'created_at', 'finished_at', 'download_url']
+
+    # Only set for workbooks that were too big to email
+    def get_download_url(self, job):
+        if not job.report:
+            return None
+        return reverse('balance_sheet_job_download', kwargs={'job_id': job.id}, request=self.context.get('request'))
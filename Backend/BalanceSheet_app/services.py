@@ -0,0 +1,299 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from django.db import connection
+from django.db.models import Case, CharField, DecimalField, F, IntegerField, Sum, Value, When
+from django.db.models.functions import TruncMonth
+from django.utils.dateparse import parse_date
+from Expenses_app.models import *
+
+# Rows fetched from the database per query
+CHUNK_SIZE = 2000
+
+ROW_FIELDS = ['date', 'name', 'amount', 'type', 'note', 'paid', 'owed']
+
+ROW_COLUMNS = [
+    'row_section', 'row_expense', 'row_id', 'row_date', 'row_name', 'row_amount',
+    'row_type', 'row_note', 'row_paid', 'row_owed', 'row_period',
+]
+
+ZERO = Decimal('0.00')
+
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+# Statement dates stay well clear of date.min and date.max, which the day and month
+# arithmetic below would step past
+EARLIEST_STATEMENT_DATE = date(1900, 1, 1)
+LATEST_STATEMENT_DATE = date(9998, 12, 31)
+
+# Longest monthly statement served at once
+MAX_STATEMENT_PERIODS = 120
+
+
+class StatementRangeError(ValueError):
+    pass
+
+
+# Every row of a statement with what the user paid and is owed up to and including it,
+# chronologically. The window only covers the statement's rows; the opening balance
+# before them is added on top
+STATEMENT_SQL = """
+    SELECT sheet.*,
+        SUM(sheet.row_paid) OVER running AS running_paid,
+        SUM(sheet.row_owed) OVER running AS running_owed
+    FROM ({rows}) sheet
+    WINDOW running AS (
+        ORDER BY sheet.row_date, sheet.row_section, sheet.row_expense, sheet.row_id
+        ROWS UNBOUNDED PRECEDING
+    )
+    ORDER BY sheet.row_date, sheet.row_section, sheet.row_expense, sheet.row_id
+"""
+
+# One row per month with activity: that month's paid and owed and the running
+# totals at its end
+MONTHLY_STATEMENT_SQL = """
+    SELECT sheet.row_period,
+        COUNT(*) AS row_count,
+        SUM(sheet.row_paid) AS paid,
+        SUM(sheet.row_owed) AS owed,
+        SUM(SUM(sheet.row_paid)) OVER running AS running_paid,
+        SUM(SUM(sheet.row_owed)) OVER running AS running_owed
+    FROM ({rows}) sheet
+    GROUP BY sheet.row_period
+    WINDOW running AS (ORDER BY sheet.row_period ROWS UNBOUNDED PRECEDING)
+    ORDER BY sheet.row_period
+"""
+
+
+def money(value):
+    return Value(value, output_field=MONEY)
+
+
+# CASE and SUM results come back at the database's own scale, and raw SQL results skip
+# the ORM's converters altogether: SQLite hands back floats and date strings
+def as_money(value):
+    return Decimal(value or 0).quantize(ZERO)
+
+
+def as_date(value):
+    return value if isinstance(value, date) else parse_date(value)
+
+
+# What the user paid and is owed on each group detail of their expenses: their own
+# share counts as paid once marked paid, everyone else's unpaid share is owed
+def detail_paid(user):
+    return Case(When(username=user.username, is_paid=True, then=F('amount')), default=money(ZERO), output_field=MONEY)
+
+
+def detail_owed(user):
+    return Case(
+        When(username=user.username, then=money(ZERO)),
+        When(is_paid=False, then=F('amount')),
+        default=money(ZERO),
+        output_field=MONEY,
+    )
+
+
+def personal_expenses(user, start=None, end=None):
+    return dated(Expense.objects.filter(user=user, expense_type='Personal'), 'date', start, end)
+
+
+def group_details(user, start=None, end=None):
+    return dated(GroupExpenseDetail.objects.filter(expense__user=user, expense__expense_type='Group'), 'expense__date', start, end)
+
+
+def dated(queryset, field, start=None, end=None):
+    if start is not None:
+        queryset = queryset.filter(**{f'{field}__gte': start})
+    if end is not None:
+        queryset = queryset.filter(**{f'{field}__lte': end})
+    return queryset
+
+
+def sheet_rows(user, start=None, end=None):
+    """Both kinds of balance sheet rows as one UNION ALL queryset.
+
+    Every column is an alias (ROW_COLUMNS) so the union can be wrapped in raw
+    SQL; row_period is the first day of the month the row falls in.
+    """
+    personal = personal_expenses(user, start, end).annotate(
+        row_section=Value(0, output_field=IntegerField()),
+        row_expense=F('id'),
+        row_id=F('id'),
+        row_date=F('date'),
+        row_name=F('name'),
+        row_amount=F('amount'),
+        row_type=Value('Personal', output_field=CharField()),
+        row_note=F('note'),
+        row_paid=F('amount'),
+        row_owed=money(ZERO),
+        row_period=TruncMonth('date'),
+    ).values_list(*ROW_COLUMNS)
+
+    group = group_details(user, start, end).annotate(
+        row_section=Value(1, output_field=IntegerField()),
+        row_expense=F('expense_id'),
+        row_id=F('id'),
+        row_date=F('expense__date'),
+        row_name=F('expense__name'),
+        row_amount=F('amount'),
+        row_type=Value('Group', output_field=CharField()),
+        row_note=F('expense__note'),
+        row_paid=detail_paid(user),
+        row_owed=detail_owed(user),
+        row_period=TruncMonth('expense__date'),
+    ).values_list(*ROW_COLUMNS)
+
+    return personal.union(group, all=True)
+
+
+def balance_sheet_rows(user, chunk_size=CHUNK_SIZE):
+    """Balance sheet rows of user as dicts of ROW_FIELDS, personal expenses first.
+
+    Both kinds of rows come from one UNION ALL query, group details joined to
+    their expense, with paid and owed computed by the database. Rows are read
+    in chunks and yielded lazily; amounts are Decimals with two places.
+    """
+    rows = sheet_rows(user).order_by('row_section', 'row_expense', 'row_id')
+    for row in rows.iterator(chunk_size=chunk_size):
+        row = dict(zip(ROW_FIELDS, row[3:10]))
+        for field in ('amount', 'paid', 'owed'):
+            row[field] = as_money(row[field])
+        yield row
+
+
+def balance_sheet_totals(user, start=None, end=None):
+    """total_paid and total_owed of user, summed by the database as Decimals with two places."""
+    personal = personal_expenses(user, start, end).aggregate(paid=Sum('amount'))
+    group = group_details(user, start, end).aggregate(paid=Sum(detail_paid(user)), owed=Sum(detail_owed(user)))
+    return {
+        'total_paid': as_money(personal['paid']) + as_money(group['paid']),
+        'total_owed': as_money(group['owed']),
+    }
+
+
+def balance_sheet_row_count(user):
+    return personal_expenses(user).count() + group_details(user).count()
+
+
+# The balance sheet as served by BalanceSheetView
+def build_balance_sheet(user):
+    balance_sheet = {
+        'personal_expenses': [],
+        'group_expenses': [],
+    }
+    balance_sheet.update(balance_sheet_totals(user))
+
+    for row in balance_sheet_rows(user):
+        section = 'personal_expenses' if row.pop('type') == 'Personal' else 'group_expenses'
+        balance_sheet[section].append(row)
+    return balance_sheet
+
+
+def run_statement(sql, rows):
+    query, params = rows.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(rows=query), params)
+        columns = [column[0] for column in cursor.description]
+        while chunk := cursor.fetchmany(CHUNK_SIZE):
+            for values in chunk:
+                yield dict(zip(columns, values))
+
+
+def opening_balance(user, start):
+    if start is None:
+        return {'total_paid': ZERO, 'total_owed': ZERO}
+    return balance_sheet_totals(user, end=start - timedelta(days=1))
+
+
+def balance_sheet_statement(user, start=None, end=None):
+    """Rows of user dated from start to end (both optional) in date order, each with
+    the running paid and owed balance up to and including it.
+
+    Paid and owed follow the current payment status of each group detail.
+    """
+    opening = opening_balance(user, start)
+    rows = []
+    for row in run_statement(STATEMENT_SQL, sheet_rows(user, start, end)):
+        rows.append({
+            'date': as_date(row['row_date']),
+            'name': row['row_name'],
+            'amount': as_money(row['row_amount']),
+            'type': row['row_type'],
+            'note': row['row_note'],
+            'paid': as_money(row['row_paid']),
+            'owed': as_money(row['row_owed']),
+            'running_paid': opening['total_paid'] + as_money(row['running_paid']),
+            'running_owed': opening['total_owed'] + as_money(row['running_owed']),
+        })
+
+    return {
+        'from': start,
+        'to': end,
+        'opening_paid': opening['total_paid'],
+        'opening_owed': opening['total_owed'],
+        'rows': rows,
+        **balance_sheet_totals(user, end=end),
+    }
+
+
+def month_starts(first, last):
+    month = first.replace(day=1)
+    while month <= last:
+        yield month
+        month = (month + timedelta(days=32)).replace(day=1)
+
+
+def month_end(month):
+    return (month + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+
+def months_between(first, last):
+    return (last.year - first.year) * 12 + last.month - first.month + 1
+
+
+def monthly_statement(user, start=None, end=None):
+    """One row per month from start to end (by default the months with any rows),
+    with the month's paid and owed and the balance at its end. Months without
+    rows carry the previous balance.
+
+    Raises StatementRangeError for more than MAX_STATEMENT_PERIODS months.
+    """
+    opening = opening_balance(user, start)
+    active = {
+        as_date(period['row_period']): period
+        for period in run_statement(MONTHLY_STATEMENT_SQL, sheet_rows(user, start, end))
+    }
+
+    periods = []
+    if active or (start and end):
+        first = start or max(min(active), EARLIEST_STATEMENT_DATE)
+        last = end or min(max(active), LATEST_STATEMENT_DATE)
+        if months_between(first, last) > MAX_STATEMENT_PERIODS:
+            raise StatementRangeError(f"A monthly statement covers at most {MAX_STATEMENT_PERIODS} months, narrow it with from and to.")
+
+        balance_paid, balance_owed = opening['total_paid'], opening['total_owed']
+        for month in month_starts(first, last):
+            period = active.get(month)
+            if period is not None:
+                balance_paid = opening['total_paid'] + as_money(period['running_paid'])
+                balance_owed = opening['total_owed'] + as_money(period['running_owed'])
+            periods.append({
+                'period': month.strftime('%Y-%m'),
+                'start': max(month, start) if start else month,
+                'end': min(month_end(month), end) if end else month_end(month),
+                'rows': period['row_count'] if period else 0,
+                'paid': as_money(period['paid']) if period else ZERO,
+                'owed': as_money(period['owed']) if period else ZERO,
+                'closing_paid': balance_paid,
+                'closing_owed': balance_owed,
+            })
+
+    return {
+        'from': start,
+        'to': end,
+        'period': 'month',
+        'opening_paid': opening['total_paid'],
+        'opening_owed': opening['total_owed'],
+        'periods': periods,
+        **balance_sheet_totals(user, end=end),
+    }
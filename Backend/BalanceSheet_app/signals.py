@@ -0,0 +1,18 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from Expenses_app.changes import ExpenseChangeSet, expenses_changed
+from UserManagement_app.models import CustomUser
+from .cache import invalidate_balance_sheet
+
+
+# A balance sheet only shows the owner's own expenses
+@receiver(expenses_changed, sender=ExpenseChangeSet)
+def invalidate_cached_balance_sheet(sender, changes, **kwargs):
+    invalidate_balance_sheet(changes.user.id)
+
+
+# Paid and owed amounts are matched on the owner's username
+@receiver(post_save, sender=CustomUser)
+def invalidate_renamed_balance_sheet(sender, instance, created, update_fields=None, **kwargs):
+    if not created and (update_fields is None or 'username' in update_fields):
+        invalidate_balance_sheet(instance.id)
@@ -0,0 +1,75 @@
+from celery import shared_task
+from django.core.files import File
+from django.core.mail import EmailMessage
+from django.utils import timezone
+from daily_expense_system.settings import EMAIL_HOST_USER
+from .models import BalanceSheetJob
+from .reports import ATTACHMENT_MAX_SIZE, SPOOL_MAX_SIZE, XLSX_CONTENT_TYPE, write_balance_sheet
+from .services import balance_sheet_row_count, balance_sheet_rows, balance_sheet_totals
+from tempfile import SpooledTemporaryFile
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Copies the workbook to storage in chunks, replacing the user's previous stored workbooks
+def store_report(job, excel_file):
+    previous = BalanceSheetJob.objects.filter(user=job.user).exclude(id=job.id).exclude(report='').exclude(report=None)
+    for old in previous:
+        old.report.delete(save=False)
+    previous.update(report=None)
+
+    job.report.save(f'{job.id}.xlsx', File(excel_file), save=False)
+    BalanceSheetJob.objects.filter(id=job.id).update(report=job.report.name)
+
+
+@shared_task
+def email_balance_sheet(job_id):
+    claimed = BalanceSheetJob.objects.filter(id=job_id, status=BalanceSheetJob.PENDING).update(
+        status=BalanceSheetJob.RUNNING, updated_at=timezone.now()
+    )
+    if not claimed:
+        logger.info(f"Balance sheet job {job_id} is not pending, skipping")
+        return
+
+    job = BalanceSheetJob.objects.select_related('user').get(id=job_id)
+    user = job.user
+    jobs = BalanceSheetJob.objects.filter(id=job_id)
+
+    try:
+        jobs.update(total_rows=balance_sheet_row_count(user))
+        with SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as excel_file:
+            write_balance_sheet(
+                balance_sheet_rows(user),
+                balance_sheet_totals(user),
+                excel_file,
+                progress=lambda rows: jobs.update(rows_written=rows, updated_at=timezone.now()),
+            )
+            size = excel_file.tell()
+            excel_file.seek(0)
+
+            # Create the email
+            if size <= ATTACHMENT_MAX_SIZE:
+                email = EmailMessage(
+                    'Your Balance Sheet',
+                    'Please find attached your balance sheet.',
+                    EMAIL_HOST_USER,
+                    [user.email],
+                )
+                email.attach('balance_sheet.xlsx', excel_file.read(), XLSX_CONTENT_TYPE)
+            else:
+                store_report(job, excel_file)
+                email = EmailMessage(
+                    'Your Balance Sheet',
+                    'Your balance sheet is too large to attach, you can download it from the app.',
+                    EMAIL_HOST_USER,
+                    [user.email],
+                )
+        email.send()
+    except Exception as e:
+        logger.error(f"Balance sheet job {job_id} failed: {str(e)}")
+        jobs.update(status=BalanceSheetJob.FAILED, error=str(e), finished_at=timezone.now())
+        return
+
+    jobs.update(status=BalanceSheetJob.SUCCEEDED, finished_at=timezone.now())
+    logger.info(f"Balance sheet emailed to {user.email} for job {job_id}")
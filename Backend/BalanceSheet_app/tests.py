@@ -1,3 +1,147 @@
-from django.test import TestCase
+import tempfile
+from unittest import mock
+from django.core import mail
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from UserManagement_app.factories import client_for, make_user
+from UserManagement_app.versioning import get_data_version
+from . import cache as balance_sheet_cache
+from . import tasks
+from .models import BalanceSheetJob
+from .services import build_balance_sheet
 
-# Create your tests here.
+
+class BalanceSheetTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client = client_for(self.user)
+        self.client.post('/expenses/', {
+            'date': '2024-01-02', 'name': 'Dinner', 'amount': '100.00', 'expense_type': 'Group',
+            'split_type': 'Equal', 'total_friends': 2,
+            'group_details': [{'name': 'Carol', 'email': 'carol@example.com'}, {'name': 'Dave', 'email': 'dave@example.com'}],
+        }, format='json')
+
+    def test_amounts_have_two_decimal_places(self):
+        sheet = build_balance_sheet(self.user)
+        amounts = [sheet['total_paid'], sheet['total_owed']]
+        for row in sheet['group_expenses']:
+            amounts += [row['amount'], row['paid'], row['owed']]
+        self.assertEqual({amount.as_tuple().exponent for amount in amounts}, {-2})
+
+    def test_amounts_are_json_numbers(self):
+        sheet = self.client.get('/balance-sheet/').json()
+        self.assertEqual(sheet['total_owed'], 66.67)
+        self.assertEqual(sorted(row['owed'] for row in sheet['group_expenses']), [0, 33.33, 33.34])
+
+
+class BalanceSheetStatementTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = client_for(make_user())
+        for date in ('2024-01-05', '2024-03-02'):
+            self.client.post('/expenses/', {'date': date, 'name': 'Lunch', 'amount': '5.10', 'expense_type': 'Personal'}, format='json')
+
+    def test_monthly_statement_carries_balance_through_empty_months(self):
+        response = self.client.get('/balance-sheet/', {'period': 'month'})
+        self.assertEqual(response.status_code, 200)
+        periods = response.json()['periods']
+        self.assertEqual([period['period'] for period in periods], ['2024-01', '2024-02', '2024-03'])
+        self.assertEqual([period['closing_paid'] for period in periods], [5.1, 5.1, 10.2])
+
+    def test_dates_near_the_limits_are_rejected(self):
+        for params in (
+            {'period': 'month', 'from': '2024-01-01', 'to': '9999-12-31'},
+            {'period': 'month', 'from': '0001-01-01', 'to': '0002-01-01'},
+            {'from': '0001-01-01'},
+            {'as_of': '9999-12-31'},
+        ):
+            response = self.client.get('/balance-sheet/', params)
+            self.assertEqual(response.status_code, 400, params)
+
+    def test_monthly_statement_length_is_capped(self):
+        response = self.client.get('/balance-sheet/', {'period': 'month', 'from': '1990-01-01', 'to': '2024-12-31'})
+        self.assertEqual(response.status_code, 400)
+
+
+class BalanceSheetCacheTests(TestCase):
+    def setUp(self):
+        self.location = tempfile.TemporaryDirectory()
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': self.location.name}}
+        self.settings_override = override_settings(CACHES=shared)
+        self.settings_override.enable()
+        self.user = make_user()
+        self.client = client_for(self.user)
+
+    def tearDown(self):
+        cache.clear()
+        self.settings_override.disable()
+        self.location.cleanup()
+
+    def add_expense(self, amount):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/expenses/', {'date': '2024-01-02', 'name': 'Lunch', 'amount': amount, 'expense_type': 'Personal'}, format='json')
+
+    def test_writes_invalidate_the_cached_sheet(self):
+        self.add_expense('5.00')
+        balance_sheet_cache.get_balance_sheet(self.user)
+        balance_sheet_cache.get_balance_sheet(self.user)
+        self.add_expense('2.50')
+        sheet = balance_sheet_cache.get_balance_sheet(self.user)
+
+        self.assertEqual(len(sheet['personal_expenses']), 2)
+        stats = balance_sheet_cache.cache_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+
+    def test_waiter_that_gives_up_keeps_the_lock(self):
+        generation = get_data_version(self.user.id, balance_sheet_cache.GENERATION_SCOPE)
+        lock_key = balance_sheet_cache.LOCK_KEY.format(self.user.id, generation)
+        cache.add(lock_key, 1)
+        with mock.patch.object(balance_sheet_cache, 'LOCK_WAIT', 0):
+            balance_sheet_cache.get_balance_sheet(self.user)
+        self.assertIsNotNone(cache.get(lock_key))
+
+    def test_not_cached_without_a_shared_cache(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.add_expense('5.00')
+            balance_sheet_cache.get_balance_sheet(self.user)
+            self.add_expense('2.50')
+            self.assertEqual(len(balance_sheet_cache.get_balance_sheet(self.user)['personal_expenses']), 2)
+            self.assertEqual(balance_sheet_cache.cache_stats()['misses'], 0)
+
+
+class BalanceSheetEmailTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root.name)
+        self.settings_override.enable()
+        self.user = make_user()
+        self.client = client_for(self.user)
+        self.client.post('/expenses/', {'date': '2024-01-02', 'name': 'Lunch', 'amount': '12.50', 'expense_type': 'Personal'}, format='json')
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.media_root.cleanup()
+
+    def run_job(self):
+        job = BalanceSheetJob.objects.create(user=self.user)
+        tasks.email_balance_sheet(str(job.id))
+        return self.client.get(f'/balance-sheet-jobs/{job.id}/').json()
+
+    def test_small_workbook_is_attached(self):
+        status = self.run_job()
+        self.assertEqual(status['status'], BalanceSheetJob.SUCCEEDED)
+        self.assertIsNone(status['download_url'])
+        self.assertEqual(len(mail.outbox[0].attachments), 1)
+
+    def test_large_workbook_is_stored_for_download(self):
+        with mock.patch.object(tasks, 'ATTACHMENT_MAX_SIZE', 0):
+            first = self.run_job()
+            status = self.run_job()
+
+        self.assertEqual(status['status'], BalanceSheetJob.SUCCEEDED)
+        self.assertEqual(mail.outbox[-1].attachments, [])
+        response = self.client.get(status['download_url'])
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'PK'))
+        # Only the latest stored workbook is kept
+        self.assertEqual(self.client.get(f"/balance-sheet-jobs/{first['job_id']}/").json()['download_url'], None)
@@ -7,5 +7,8 @@ router = DefaultRouter()
 urlpatterns = [
     path('', include(router.urls)),
     path('email-balance-sheet/', BalanceSheetEmailView.as_view(), name='email_balance_sheet'),
+    path('balance-sheet-jobs/<uuid:job_id>/', BalanceSheetJobStatusView.as_view(), name='balance_sheet_job'),
+    path('balance-sheet-jobs/<uuid:job_id>/download/', BalanceSheetJobDownloadView.as_view(), name='balance_sheet_job_download'),
     path('balance-sheet/', BalanceSheetView.as_view(), name='balance_sheet'),
+    path('balance-sheet/cache-stats/', BalanceSheetCacheStatsView.as_view(), name='balance_sheet_cache_stats'),
 ]
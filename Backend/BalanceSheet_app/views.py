@@ -1,165 +1,117 @@
-from django.http import HttpResponse
-from openpyxl import Workbook
-from openpyxl.styles import Font
-from django.db.models import Sum
-from Expenses_app.models import *
+from django.http import FileResponse
+from django.utils.dateparse import parse_date
 from rest_framework import status
 from rest_framework.views import APIView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from io import BytesIO
-from django.core.mail import EmailMessage
-from daily_expense_system.settings import EMAIL_HOST_USER
+from rest_framework.reverse import reverse
+from UserManagement_app.versioning import DataVersionETagMixin
+from .models import BalanceSheetJob
+from .serializers import BalanceSheetJobSerializer
+from .jobs import start_balance_sheet_job
+from .reports import XLSX_CONTENT_TYPE
+from .cache import cache_stats, get_balance_sheet, reset_cache_stats
+from .services import EARLIEST_STATEMENT_DATE, LATEST_STATEMENT_DATE, StatementRangeError, balance_sheet_statement, balance_sheet_totals, monthly_statement
 
+STATEMENT_PERIODS = ['month']
+
+
+def parse_date_param(value):
+    try:
+        return parse_date(value)
+    except ValueError:
+        return None
+
+
+# Queues the balance sheet email and answers right away with the job to poll
 class BalanceSheetEmailView(APIView):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user = request.user
-        
-        # Creating a new excel sheet
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Balance Sheet"
-
-        # Adding headers
-        headers = ['Date', 'Name', 'Amount', 'Type', 'Note', 'Paid', 'Owed']
-        for col, header in enumerate(headers, start=1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = Font(bold=True)
-
-        personal_expenses = Expense.objects.filter(user=user, expense_type='Personal')
-        group_expenses = Expense.objects.filter(user=user, expense_type='Group')
-
-        row = 2
-        total_paid = 0
-        total_owed = 0
-
-        # Add the personal expenses to the sheet
-        for expense in personal_expenses:
-            ws.append([
-                expense.date.strftime('%Y-%m-%d'),
-                expense.name,
-                float(expense.amount),
-                'Personal',
-                expense.note,
-                float(expense.amount),
-                0
-            ])
-            total_paid += float(expense.amount)
-            row += 1
-
-        # Add the group expenses to the sheet
-        for expense in group_expenses:
-            group_details = expense.group_details.all()
-            
-            for detail in group_details:
-                if detail.username == user.username:
-                    ws.append([
-                        expense.date.strftime('%Y-%m-%d'),
-                        expense.name,
-                        float(detail.amount),
-                        'Group',
-                        expense.note,
-                        float(detail.amount) if detail.is_paid else 0,
-                        0
-                    ])
-                    total_paid += float(detail.amount) if detail.is_paid else 0
-                else:
-                    ws.append([
-                        expense.date.strftime('%Y-%m-%d'),
-                        expense.name,
-                        float(detail.amount),
-                        'Group',
-                        expense.note,
-                        0,
-                        float(detail.amount) if not detail.is_paid else 0
-                    ])
-                    total_owed += float(detail.amount) if not detail.is_paid else 0
-                row += 1
-
-        # Adding totals
-        ws.cell(row=row, column=1, value="Total")
-        ws.cell(row=row, column=6, value=total_paid)
-        ws.cell(row=row, column=7, value=total_owed)
-
-        # Save the excel sheet to a BytesIO object
-        excel_file = BytesIO()
-        wb.save(excel_file)
-        excel_file.seek(0)
-
-        # Create the email
-        subject = 'Your Balance Sheet'
-        message = 'Please find attached your balance sheet.'
-        email = EmailMessage(
-            subject,
-            message,
-            EMAIL_HOST_USER,
-            [user.email],
-        )
-        email.attach('balance_sheet.xlsx', excel_file.getvalue(), 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-
-        # Send the email
-        try:
-            email.send()
-            return Response({"message": "Balance sheet has been sent to your email."}, status=status.HTTP_200_OK)
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return self.post(request)
+
+    def post(self, request):
+        job, _ = start_balance_sheet_job(request.user)
+        data = BalanceSheetJobSerializer(job, context={'request': request}).data
+        data['status_url'] = reverse('balance_sheet_job', kwargs={'job_id': job.id}, request=request)
+        return Response(data, status=status.HTTP_202_ACCEPTED)
+
+# Progress and outcome of a balance sheet email job
+class BalanceSheetJobStatusView(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        job = BalanceSheetJob.objects.filter(id=job_id, user=request.user).first()
+        if job is None:
+            return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(BalanceSheetJobSerializer(job, context={'request': request}).data, status=status.HTTP_200_OK)
+
+# Streams a stored workbook from storage in chunks
+class BalanceSheetJobDownloadView(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        job = BalanceSheetJob.objects.filter(id=job_id, user=request.user).first()
+        if job is None or not job.report:
+            return Response({"error": "Balance sheet not found"}, status=status.HTTP_404_NOT_FOUND)
+        return FileResponse(job.report.open('rb'), as_attachment=True, filename='balance_sheet.xlsx', content_type=XLSX_CONTENT_TYPE)
     
-class BalanceSheetView(APIView):
+# The whole balance sheet, or with from/to/as_of a dated statement with running
+# balances, and with period=month one row per month
+class BalanceSheetView(DataVersionETagMixin, APIView):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user = request.user
-        
-        balance_sheet = {
-            'personal_expenses': [],
-            'group_expenses': [],
-            'total_paid': 0,
-            'total_owed': 0
-        }
-
-        personal_expenses = Expense.objects.filter(user=user, expense_type='Personal')
-        
-        for expense in personal_expenses:
-            balance_sheet['personal_expenses'].append({
-                'date': expense.date,
-                'name': expense.name,
-                'amount': float(expense.amount),
-                'note': expense.note,
-                'paid': float(expense.amount),
-                'owed': 0
-            })
-            balance_sheet['total_paid'] += float(expense.amount)
-
-        group_expenses = Expense.objects.filter(user=user, expense_type='Group')
-
-        for expense in group_expenses:
-            group_details = expense.group_details.all()
-            
-            for detail in group_details:
-                if detail.username == user.username:
-                    balance_sheet['group_expenses'].append({
-                        'date': expense.date,
-                        'name': expense.name,
-                        'amount': float(detail.amount),
-                        'note': expense.note,
-                        'paid': float(detail.amount) if detail.is_paid else 0,
-                        'owed': 0
-                    })
-                    balance_sheet['total_paid'] += float(detail.amount) if detail.is_paid else 0
-                else:
-                    balance_sheet['group_expenses'].append({
-                        'date': expense.date,
-                        'name': expense.name,
-                        'amount': float(detail.amount),
-                        'note': expense.note,
-                        'paid': 0,
-                        'owed': float(detail.amount) if not detail.is_paid else 0
-                    })
-                    balance_sheet['total_owed'] += float(detail.amount) if not detail.is_paid else 0
-
-        return Response(balance_sheet, status=status.HTTP_200_OK)
\ No newline at end of file
+        params = request.query_params
+        if not any(params.get(param) for param in ('from', 'to', 'as_of', 'period')):
+            return Response(get_balance_sheet(request.user), status=status.HTTP_200_OK)
+
+        dates = {}
+        for param in ('from', 'to', 'as_of'):
+            if params.get(param):
+                dates[param] = parse_date_param(params[param])
+                if dates[param] is None:
+                    return Response({"error": f"{param} has wrong format. Use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+                if not EARLIEST_STATEMENT_DATE <= dates[param] <= LATEST_STATEMENT_DATE:
+                    return Response(
+                        {"error": f"{param} must be between {EARLIEST_STATEMENT_DATE} and {LATEST_STATEMENT_DATE}."},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+
+        # as_of is the day the balances are read at: nothing after it counts
+        start = dates.get('from')
+        end = min(filter(None, (dates.get('to'), dates.get('as_of'))), default=None)
+        if start and end and start > end:
+            return Response({"error": "from must not be after to or as_of"}, status=status.HTTP_400_BAD_REQUEST)
+
+        period = params.get('period')
+        if period:
+            if period not in STATEMENT_PERIODS:
+                return Response({"error": f"period must be one of: {', '.join(STATEMENT_PERIODS)}"}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                return Response(monthly_statement(request.user, start, end), status=status.HTTP_200_OK)
+            except StatementRangeError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Only the balance at one date
+        if 'as_of' in dates and not ('from' in dates or 'to' in dates):
+            return Response({"as_of": end, **balance_sheet_totals(request.user, end=end)}, status=status.HTTP_200_OK)
+
+        return Response(balance_sheet_statement(request.user, start, end), status=status.HTTP_200_OK)
+
+# Hit and miss counters of the balance sheet cache
+class BalanceSheetCacheStatsView(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(cache_stats(), status=status.HTTP_200_OK)
+
+    def delete(self, request):
+        reset_cache_stats()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -2,4 +2,9 @@ from django.contrib import admin
 from .models import *
 
 admin.site.register(Expense)
-admin.site.register(GroupExpenseDetail)
\ No newline at end of file
+admin.site.register(GroupExpenseDetail)
+admin.site.register(UserExpenseSummary)
+admin.site.register(UserMonthlyExpenseSummary)
+admin.site.register(PairBalance)
+admin.site.register(ExpenseEvent)
+admin.site.register(ExpenseSnapshot)
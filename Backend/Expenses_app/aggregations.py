@@ -0,0 +1,110 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from .models import Expense, GroupExpenseDetail
+
+COUNT_FIELDS = [
+    'personal_expense_count',
+    'group_expense_count',
+    'paid_count',
+    'unpaid_count',
+]
+
+AMOUNT_FIELDS = [
+    'personal_expense_sum',
+    'group_expense_sum',
+    'payments_received',
+    'payments_pending',
+    'owner_share',
+]
+
+SUMMARY_FIELDS = COUNT_FIELDS + AMOUNT_FIELDS
+
+GROUPINGS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+
+def empty_totals():
+    totals = {field: 0 for field in COUNT_FIELDS}
+    totals.update({field: Decimal('0.00') for field in AMOUNT_FIELDS})
+    return totals
+
+
+def combine_totals(totals_list):
+    combined = empty_totals()
+    for totals in totals_list:
+        for field, value in totals.items():
+            combined[field] += value
+    return combined
+
+
+def expense_totals(user, date_from=None, date_to=None, group_by=None):
+    """Computes every portfolio summary figure with one pass over the expenses
+    and one over the group details, using conditional aggregation.
+
+    Returns {period: totals} when group_by is 'day', 'week' or 'month' (the
+    period is the first day of it), otherwise {None: totals}.
+    """
+    expenses = Expense.objects.filter(user=user)
+    details = GroupExpenseDetail.objects.filter(expense__user=user, expense__expense_type='Group')
+    if date_from:
+        expenses = expenses.filter(date__gte=date_from)
+        details = details.filter(expense__date__gte=date_from)
+    if date_to:
+        expenses = expenses.filter(date__lte=date_to)
+        details = details.filter(expense__date__lte=date_to)
+
+    if group_by:
+        trunc = GROUPINGS[group_by]
+        expenses = expenses.annotate(period=trunc('date')).values('period')
+        details = details.annotate(period=trunc('expense__date')).values('period')
+
+    expense_figures = dict(
+        personal_expense_count=Count('id', filter=Q(expense_type='Personal')),
+        group_expense_count=Count('id', filter=Q(expense_type='Group')),
+        personal_expense_sum=Sum('amount', filter=Q(expense_type='Personal')),
+        group_expense_sum=Sum('amount', filter=Q(expense_type='Group')),
+    )
+    detail_figures = dict(
+        payments_received=Sum('amount', filter=Q(is_paid=True)),
+        payments_pending=Sum('amount', filter=Q(is_paid=False)),
+        paid_count=Count('id', filter=Q(is_paid=True)),
+        unpaid_count=Count('id', filter=Q(is_paid=False)),
+        owner_share=Sum('amount', filter=Q(username=user.username)),
+    )
+
+    if group_by:
+        rows = list(expenses.annotate(**expense_figures).order_by()) + list(details.annotate(**detail_figures).order_by())
+    else:
+        rows = [expenses.aggregate(**expense_figures), details.aggregate(**detail_figures)]
+
+    periods = defaultdict(empty_totals)
+    for row in rows:
+        totals = periods[row.pop('period', None)]
+        for field, value in row.items():
+            totals[field] += value or 0
+
+    if not group_by and not periods:
+        periods[None] = empty_totals()
+    return dict(sorted(periods.items()))
+
+
+# Portfolio summary response built from a set of totals
+def format_summary(totals):
+    return {
+        'personal_expense_count': totals['personal_expense_count'],
+        'group_expense_count': totals['group_expense_count'],
+        'personal_expense_sum': totals['personal_expense_sum'],
+        'group_expense_summary': {
+            'payments_received': totals['payments_received'],
+            'payments_pending': totals['payments_pending'],
+            'paid_count': totals['paid_count'],
+            'unpaid_count': totals['unpaid_count'],
+            'total_spend(Group Expense - My Expense)': totals['group_expense_sum'] - totals['owner_share'],
+        },
+        'total_expense_sum': totals['personal_expense_sum'] + totals['group_expense_sum'],
+    }
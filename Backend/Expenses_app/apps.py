@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ExpensesAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Expenses_app'
+
+    def ready(self):
+        from . import signals
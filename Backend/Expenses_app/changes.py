@@ -0,0 +1,61 @@
+from django.dispatch import Signal
+from django.utils import timezone
+from .models import Expense
+
+# Sent inside the writing transaction with the ExpenseChangeSet of one write
+expenses_changed = Signal()
+
+
+def snapshot(instance):
+    return {field.attname: getattr(instance, field.attname) for field in instance._meta.concrete_fields}
+
+
+class ExpenseChangeSet:
+    """Before and after snapshots of the expenses and group details touched by one write.
+
+    Receivers work out what changed by comparing both sides, so a write has to
+    record the same group details on both sides, except for ones it created
+    (only after) or deleted (only before).
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.before = {}
+        self.after = {}
+
+    def record(self, side, expense, details):
+        entry = side.setdefault(expense.id, {'expense': None, 'details': {}})
+        entry['expense'] = snapshot(expense)
+        for detail in details:
+            entry['details'][detail.id] = snapshot(detail)
+
+    def record_before(self, expense, details=()):
+        self.record(self.before, expense, details)
+
+    def record_after(self, expense, details=()):
+        self.record(self.after, expense, details)
+
+    def expense_ids(self):
+        return self.before.keys() | self.after.keys()
+
+    # Expenses whose row was not saved although their group details changed
+    def untouched_expense_ids(self):
+        return [
+            expense_id for expense_id, entry in self.after.items()
+            if expense_id in self.before and self.before[expense_id]['expense'] == entry['expense']
+        ]
+
+    # Bumping updated_at of those expenses so sync clients pick up the detail changes
+    def touch_expenses(self):
+        expense_ids = self.untouched_expense_ids()
+        if not expense_ids:
+            return
+        now = timezone.now()
+        Expense.all_objects.filter(id__in=expense_ids).update(updated_at=now)
+        for expense_id in expense_ids:
+            self.after[expense_id]['expense']['updated_at'] = now
+
+    def send(self):
+        if self.before or self.after:
+            self.touch_expenses()
+            expenses_changed.send(sender=self.__class__, changes=self)
@@ -0,0 +1,168 @@
+import json
+from decimal import Decimal
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Max
+from django.utils import timezone
+from .aggregations import empty_totals, format_summary
+from .changes import snapshot
+from .models import Expense, ExpenseEvent, ExpenseSnapshot
+from .summaries import add_contribution
+
+# Events replayed per query while rebuilding a state
+REPLAY_CHUNK_SIZE = 2000
+
+
+# Snapshot values as they come back out of a JSONField
+def as_json(row):
+    return json.loads(json.dumps(row, cls=DjangoJSONEncoder))
+
+
+# Bookkeeping timestamps change with every write, they do not make an event by themselves
+TRACKING_FIELDS = {'updated_at', 'deleted_at'}
+
+
+def changed_fields(before, after):
+    return {field for field in after if field not in TRACKING_FIELDS and before.get(field) != after[field]}
+
+
+def detail_event_type(changed):
+    return 'payment_changed' if changed == {'is_paid'} else 'detail_updated'
+
+
+def events_from_changes(changes):
+    """Events describing one ExpenseChangeSet, worked out by comparing its two sides."""
+    events = []
+    now = timezone.now()
+
+    def event(event_type, expense_id, detail_id=None, data=None):
+        events.append(ExpenseEvent(
+            user=changes.user,
+            expense_id=expense_id,
+            detail_id=detail_id,
+            event_type=event_type,
+            data=as_json(data) if data is not None else None,
+            created_at=now,
+        ))
+
+    for expense_id in sorted(changes.expense_ids()):
+        before = changes.before.get(expense_id)
+        after = changes.after.get(expense_id)
+
+        if after is None:
+            event('expense_deleted', expense_id)
+            continue
+
+        if before is None:
+            event('expense_created', expense_id, data=after['expense'])
+            before = {'expense': after['expense'], 'details': {}}
+        elif changed_fields(before['expense'], after['expense']):
+            event('expense_updated', expense_id, data=after['expense'])
+
+        for detail_id in sorted(before['details'].keys() | after['details'].keys()):
+            old = before['details'].get(detail_id)
+            new = after['details'].get(detail_id)
+            if new is None:
+                event('detail_deleted', expense_id, detail_id)
+            elif old is None:
+                event('detail_created', expense_id, detail_id, new)
+            else:
+                changed = changed_fields(old, new)
+                if changed:
+                    event(detail_event_type(changed), expense_id, detail_id, new)
+
+    return events
+
+
+def record_events(changes):
+    ExpenseEvent.objects.bulk_create(events_from_changes(changes))
+
+
+def apply_event(state, event_type, expense_id, detail_id, data):
+    """Applies one event to a state of {expense_id: {'expense': row, 'details': {detail_id: row}}}.
+
+    Ids are strings so a state can be stored in a snapshot as it is.
+    """
+    expense_id = str(expense_id)
+    if event_type == 'expense_deleted':
+        state.pop(expense_id, None)
+    elif event_type in ('expense_created', 'expense_updated'):
+        state.setdefault(expense_id, {'expense': None, 'details': {}})['expense'] = data
+    elif expense_id in state:
+        details = state[expense_id]['details']
+        if event_type == 'detail_deleted':
+            details.pop(str(detail_id), None)
+        else:
+            details[str(detail_id)] = data
+
+
+def nearest_snapshot(user, at=None):
+    snapshots = ExpenseSnapshot.objects.filter(user=user)
+    if at is not None:
+        snapshots = snapshots.filter(created_at__lte=at)
+    return snapshots.order_by('-created_at', '-last_event_id').first()
+
+
+def rebuild_state(user, at=None):
+    """State of the user's expenses at the given time (now by default), replayed from the nearest snapshot.
+
+    Returns (state, last_event_id).
+    """
+    base = nearest_snapshot(user, at)
+    state = base.state if base else {}
+    last_event_id = base.last_event_id if base else 0
+
+    events = ExpenseEvent.objects.filter(user=user, id__gt=last_event_id)
+    if at is not None:
+        events = events.filter(created_at__lte=at)
+    events = events.order_by('id').values_list('id', 'event_type', 'expense_id', 'detail_id', 'data')
+
+    for event_id, event_type, expense_id, detail_id, data in events.iterator(chunk_size=REPLAY_CHUNK_SIZE):
+        apply_event(state, event_type, expense_id, detail_id, data)
+        last_event_id = event_id
+    return state, last_event_id
+
+
+def take_snapshot(user):
+    """Stores the current replayed state, unless nothing happened since the last snapshot."""
+    latest = nearest_snapshot(user)
+    latest_event_id = ExpenseEvent.objects.filter(user=user).aggregate(last=Max('id'))['last'] or 0
+    if latest is not None and latest.last_event_id >= latest_event_id:
+        return None
+
+    state, last_event_id = rebuild_state(user)
+    return ExpenseSnapshot.objects.create(user=user, last_event_id=last_event_id, state=state)
+
+
+# Portfolio summary figures of a replayed state
+def state_totals(state, owner_username):
+    totals = empty_totals()
+    for entry in state.values():
+        expense = dict(entry['expense'], amount=Decimal(entry['expense']['amount']))
+        details = [dict(detail, amount=Decimal(detail['amount'])) for detail in entry['details'].values()]
+        add_contribution(totals, expense, details, owner_username, 1)
+    return format_summary(totals)
+
+
+# Current rows of the user's expenses in the same shape as a replayed state
+def live_state(user):
+    state = {}
+    for expense in Expense.objects.filter(user=user).prefetch_related('group_details'):
+        state[str(expense.id)] = as_json({
+            'expense': snapshot(expense),
+            'details': {str(detail.id): snapshot(detail) for detail in expense.group_details.all()},
+        })
+    return state
+
+
+# A state without the bookkeeping timestamps, which the event log does not follow
+def state_content(state):
+    def content(row):
+        return {field: value for field, value in row.items() if field not in TRACKING_FIELDS}
+
+    return {
+        expense_id: {
+            'expense': content(entry['expense']),
+            'details': {detail_id: content(detail) for detail_id, detail in entry['details'].items()},
+        }
+        for expense_id, entry in state.items()
+    }
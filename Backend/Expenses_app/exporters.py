@@ -0,0 +1,66 @@
+import csv
+import json
+import zlib
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import FilteredRelation, Q
+from .models import Expense
+
+# Output column -> lookup on Expense, group detail columns are empty for personal expenses
+# (detail is the join to the group details that are not soft-deleted)
+EXPORT_COLUMNS = [
+    ('expense_id', 'id'),
+    ('date', 'date'),
+    ('name', 'name'),
+    ('amount', 'amount'),
+    ('note', 'note'),
+    ('expense_type', 'expense_type'),
+    ('split_type', 'split_type'),
+    ('include_self', 'include_self'),
+    ('detail_id', 'detail__id'),
+    ('detail_name', 'detail__name'),
+    ('detail_username', 'detail__username'),
+    ('detail_email', 'detail__email'),
+    ('detail_amount', 'detail__amount'),
+    ('detail_note', 'detail__note'),
+    ('detail_is_paid', 'detail__is_paid'),
+]
+
+EXPORT_HEADERS = [column for column, _ in EXPORT_COLUMNS]
+
+
+# Pseudo buffer so csv.writer hands back each row instead of storing it
+class Echo:
+    def write(self, value):
+        return value
+
+
+# Expenses left joined with their group details, read from the database in chunks
+def iter_export_rows(user, chunk_size=2000):
+    queryset = (
+        Expense.objects.filter(user=user)
+        .annotate(detail=FilteredRelation('group_details', condition=Q(group_details__deleted_at__isnull=True)))
+        .order_by('date', 'id', 'detail__id')
+        .values_list(*[lookup for _, lookup in EXPORT_COLUMNS])
+    )
+    return queryset.iterator(chunk_size=chunk_size)
+
+
+def stream_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_HEADERS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_ndjson(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(EXPORT_HEADERS, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+def gzip_stream(chunks):
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,171 @@
+import csv
+import io
+import time
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from .changes import ExpenseChangeSet
+from .models import Expense
+
+# Expense field -> CSV header used when no mapping is given
+DEFAULT_COLUMNS = {
+    'date': 'date',
+    'name': 'name',
+    'amount': 'amount',
+    'note': 'note',
+}
+
+DEFAULT_DATE_FORMATS = ['%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d %b %Y']
+
+
+class ImportRowError(Exception):
+    pass
+
+
+# Rows that are valid but not imported, like credits when those are left out
+class SkipRow(Exception):
+    pass
+
+
+# Amounts are stored with at most 8 digits before the decimal point
+MAX_AMOUNT_DIGITS = 8
+
+
+# Yielding the CSV rows one at a time so the whole file is never held in memory.
+# The caller closes the generator while the stream is still open (see run), so
+# the stream can be handed back instead of closed with the wrapper.
+def iter_csv_rows(binary_stream, encoding='utf-8-sig'):
+    text_stream = io.TextIOWrapper(binary_stream, encoding=encoding, newline='')
+    try:
+        reader = csv.DictReader(text_stream)
+        for row in reader:
+            # Line 1 is the header
+            yield reader.line_num, row
+    finally:
+        # Leaving the underlying stream open for the caller
+        if not binary_stream.closed:
+            text_stream.detach()
+
+
+class ExpenseImporter:
+    def __init__(self, user, columns=None, date_formats=None, chunk_size=1000, max_errors=100, import_credits=False):
+        self.user = user
+        self.columns = {**DEFAULT_COLUMNS, **(columns or {})}
+        self.date_formats = date_formats or DEFAULT_DATE_FORMATS
+        self.chunk_size = chunk_size
+        self.max_errors = max_errors
+        # Credits (negative amounts) are skipped unless they are imported as expenses of the same size
+        self.import_credits = import_credits
+
+    def parse_date(self, value):
+        for date_format in self.date_formats:
+            try:
+                return datetime.strptime(value, date_format).date()
+            except ValueError:
+                continue
+        raise ImportRowError(f"Date '{value}' does not match any of the formats {', '.join(self.date_formats)}.")
+
+    def parse_amount(self, value):
+        cleaned = value.replace(',', '').replace('₹', '').strip()
+        try:
+            amount = Decimal(cleaned)
+        except InvalidOperation:
+            raise ImportRowError(f"Amount '{value}' is not a valid number.")
+        if not amount.is_finite():
+            raise ImportRowError(f"Amount '{value}' is not a valid number.")
+        # Checked before rounding, which fails for numbers like 1e5000
+        if amount and amount.adjusted() >= MAX_AMOUNT_DIGITS:
+            raise ImportRowError(f"Amount '{value}' is too large.")
+        if amount < 0:
+            if not self.import_credits:
+                raise SkipRow()
+            amount = -amount
+        amount = amount.quantize(Decimal('0.01'))
+        if amount == 0:
+            raise ImportRowError("Amount must be greater than zero.")
+        if amount >= Decimal('100000000'):
+            raise ImportRowError(f"Amount '{value}' is too large.")
+        return amount
+
+    def build_expense(self, row):
+        values = {}
+        for field, column in self.columns.items():
+            value = row.get(column)
+            values[field] = value.strip() if value else ''
+
+        if not values['date']:
+            raise ImportRowError(f"Column '{self.columns['date']}' is required.")
+        if not values['name']:
+            raise ImportRowError(f"Column '{self.columns['name']}' is required.")
+        if not values['amount']:
+            raise ImportRowError(f"Column '{self.columns['amount']}' is required.")
+
+        return Expense(
+            user=self.user,
+            date=self.parse_date(values['date']),
+            name=values['name'][:100],
+            amount=self.parse_amount(values['amount']),
+            note=values['note'] or None,
+            expense_type='Personal',
+        )
+
+    def write_chunk(self, expenses):
+        with transaction.atomic():
+            Expense.objects.bulk_create(expenses)
+            changes = ExpenseChangeSet(self.user)
+            for expense in expenses:
+                changes.record_after(expense)
+            changes.send()
+
+    def run(self, rows):
+        started = time.monotonic()
+        report = {
+            'rows': 0,
+            'imported': 0,
+            'skipped': 0,
+            'failed': 0,
+            'errors': [],
+        }
+        chunk = []
+        line_number = 1
+
+        try:
+            for line_number, row in rows:
+                report['rows'] += 1
+                try:
+                    chunk.append(self.build_expense(row))
+                except SkipRow:
+                    report['skipped'] += 1
+                    continue
+                except ImportRowError as e:
+                    report['failed'] += 1
+                    # Only keeping the first few errors so memory stays bounded
+                    if len(report['errors']) < self.max_errors:
+                        report['errors'].append({'line': line_number, 'error': str(e)})
+                    continue
+
+                if len(chunk) >= self.chunk_size:
+                    self.write_chunk(chunk)
+                    report['imported'] += len(chunk)
+                    chunk = []
+        except UnicodeDecodeError:
+            # Earlier chunks are committed already, so the rows read so far are kept too
+            # and the report says where the import stopped
+            report['error'] = f"The file could not be decoded after line {line_number}, the rest was not imported."
+            report['stopped_after_line'] = line_number
+        except csv.Error as e:
+            report['error'] = f"The file could not be read as CSV after line {line_number} ({e}), the rest was not imported."
+            report['stopped_after_line'] = line_number
+        finally:
+            # A generator left half-read would only be closed once its stream is gone
+            if hasattr(rows, 'close'):
+                rows.close()
+
+        if chunk:
+            self.write_chunk(chunk)
+            report['imported'] += len(chunk)
+
+        elapsed = time.monotonic() - started
+        report['elapsed_seconds'] = round(elapsed, 3)
+        report['rows_per_second'] = round(report['rows'] / elapsed, 1) if elapsed else report['rows']
+        return report
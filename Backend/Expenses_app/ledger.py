@@ -0,0 +1,121 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.db.models import Case, DecimalField, F, IntegerField, Max, Q, Sum, Value, When
+from .models import GroupExpenseDetail, PairBalance
+from .settlements import participant_key
+
+
+# Change in what each debtor owes the expense owner caused by one ExpenseChangeSet
+def changes_delta(changes):
+    owner_username = changes.user.username
+    delta = defaultdict(Decimal)
+    debtors = {}
+
+    for side, sign in ((changes.before, -1), (changes.after, 1)):
+        for entry in side.values():
+            if entry['expense']['expense_type'] != 'Group':
+                continue
+            for detail in entry['details'].values():
+                key = participant_key(detail['username'], detail['email'])
+                if detail['is_paid'] or not key or key == owner_username:
+                    continue
+                delta[key] += sign * detail['amount']
+                if sign > 0 or key not in debtors:
+                    debtors[key] = detail['participant_id']
+
+    return {key: (amount, debtors[key]) for key, amount in delta.items() if amount}
+
+
+# Two queries however many debtors changed: the missing pairs are inserted, then
+# every pair is moved by its own amount in a single UPDATE
+def apply_delta(creditor, delta):
+    if not delta:
+        return
+
+    PairBalance.objects.bulk_create(
+        [PairBalance(creditor=creditor, debtor_key=key, debtor_id=debtor_id) for key, (_, debtor_id) in delta.items()],
+        ignore_conflicts=True,
+    )
+    amounts = [When(debtor_key=key, then=Value(amount)) for key, (amount, _) in delta.items()]
+    debtors = [When(debtor_key=key, then=Value(debtor_id)) for key, (_, debtor_id) in delta.items() if debtor_id]
+    PairBalance.objects.filter(creditor=creditor, debtor_key__in=delta.keys()).update(
+        amount=F('amount') + Case(*amounts, output_field=DecimalField(max_digits=14, decimal_places=2)),
+        debtor_id=Case(*debtors, default=F('debtor_id'), output_field=IntegerField()),
+    )
+
+
+# Per friend: what they owe user, what user owes them and the net of both
+def friend_balances(user):
+    balances = {}
+
+    def entry(friend):
+        return balances.setdefault(friend, {'friend': friend, 'owes_you': Decimal('0.00'), 'you_owe': Decimal('0.00')})
+
+    owed_to_user = PairBalance.objects.filter(creditor=user).exclude(amount=0).select_related('debtor')
+    for row in owed_to_user:
+        friend = row.debtor.username if row.debtor_id else row.debtor_key
+        entry(friend)['owes_you'] += row.amount
+
+    owed_by_user = (
+        PairBalance.objects.filter(Q(debtor=user) | Q(debtor_key__in=[user.username, user.email]))
+        .exclude(amount=0)
+        .exclude(creditor=user)
+        .select_related('creditor')
+    )
+    for row in owed_by_user:
+        entry(row.creditor.username)['you_owe'] += row.amount
+
+    for balance in balances.values():
+        balance['net'] = balance['owes_you'] - balance['you_owe']
+    return sorted(balances.values(), key=lambda balance: balance['friend'])
+
+
+# Balances recomputed from the unpaid group expense details
+def compute_pair_balances(creditor=None):
+    details = GroupExpenseDetail.objects.filter(is_paid=False, expense__expense_type='Group').exclude(
+        username=F('expense__user__username')
+    )
+    if creditor is not None:
+        details = details.filter(expense__user=creditor)
+
+    balances = {}
+    rows = (
+        details.values('expense__user_id', 'username', 'email')
+        .annotate(total=Sum('amount'), debtor_id=Max('participant_id'))
+        .order_by()
+    )
+    for row in rows:
+        key = participant_key(row['username'], row['email'])
+        if not key:
+            continue
+        pair = (row['expense__user_id'], key)
+        amount, debtor_id = balances.get(pair, (Decimal('0.00'), None))
+        balances[pair] = (amount + row['total'], debtor_id or row['debtor_id'])
+    return balances
+
+
+# Pairs whose stored balance differs from the recomputed one: {(creditor_id, key): (stored, expected)}
+def ledger_drift(creditor=None):
+    expected = compute_pair_balances(creditor)
+    stored_rows = PairBalance.objects.all()
+    if creditor is not None:
+        stored_rows = stored_rows.filter(creditor=creditor)
+    stored = {(row.creditor_id, row.debtor_key): row.amount for row in stored_rows}
+
+    drift = {}
+    for pair in expected.keys() | stored.keys():
+        expected_amount = expected.get(pair, (Decimal('0.00'), None))[0]
+        stored_amount = stored.get(pair, Decimal('0.00'))
+        if expected_amount != stored_amount:
+            drift[pair] = (stored_amount, expected_amount)
+    return drift
+
+
+def fix_ledger_drift(drift):
+    expected = compute_pair_balances()
+    for (creditor_id, key), (_, amount) in drift.items():
+        PairBalance.objects.update_or_create(
+            creditor_id=creditor_id,
+            debtor_key=key,
+            defaults={'amount': amount, 'debtor_id': expected.get((creditor_id, key), (None, None))[1]},
+        )
@@ -0,0 +1,66 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from Expenses_app.models import Expense, GroupExpenseDetail
+import random
+
+# Helpers shared by the benchmark commands to fill the database with synthetic expenses
+
+WORDS = [
+    'dinner', 'lunch', 'breakfast', 'coffee', 'groceries', 'taxi', 'train', 'flight', 'hotel', 'rent',
+    'electricity', 'internet', 'movie', 'concert', 'gym', 'pharmacy', 'books', 'gift', 'pizza', 'sushi',
+    'birthday', 'weekend', 'trip', 'office', 'party', 'market', 'fuel', 'parking', 'museum', 'picnic',
+]
+
+FIRST_DATE = date(2020, 1, 1)
+
+# Rows inserted per query
+BATCH_SIZE = 5000
+
+
+def random_text(rng, words=2):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def seed_expenses(user, count, group_every=2, participants=('carol', 'dave'), seed=0, offset=0):
+    """Bulk inserts count expenses of user over about four years of dates.
+
+    Every group_every-th expense is an equal group split between the owner and
+    participants (usernames, or None for email-only guests by name). Inserts go
+    around ExpenseChangeSet, so only database triggers follow them. Returns the
+    number of group details created.
+    """
+    rng = random.Random(seed + offset)
+    details_created = 0
+    for start in range(offset, offset + count, BATCH_SIZE):
+        expenses = []
+        for i in range(start, min(start + BATCH_SIZE, offset + count)):
+            group = group_every and i % group_every == 0
+            expenses.append(Expense(
+                user=user,
+                date=FIRST_DATE + timedelta(days=i % 1500),
+                name=random_text(rng),
+                amount=Decimal(rng.randint(100, 100_000)) / 100,
+                note=random_text(rng, 4),
+                expense_type='Group' if group else 'Personal',
+                split_type='Equal' if group else None,
+                total_friends=len(participants) if group else None,
+            ))
+        Expense.objects.bulk_create(expenses)
+
+        details = []
+        for expense in expenses:
+            if expense.expense_type != 'Group':
+                continue
+            share = (expense.amount / (len(participants) + 1)).quantize(Decimal('0.01'))
+            details.append(GroupExpenseDetail(
+                expense=expense, name=user.username, username=user.username, email=user.email,
+                amount=share, note="Owner's share", is_paid=True,
+            ))
+            for participant in participants:
+                details.append(GroupExpenseDetail(
+                    expense=expense, name=participant, username=None, email=f'{participant}@example.com',
+                    amount=share, note=random_text(rng), is_paid=rng.random() < 0.3,
+                ))
+        GroupExpenseDetail.objects.bulk_create(details)
+        details_created += len(details)
+    return details_created
@@ -0,0 +1,77 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from rest_framework.test import APIClient
+from Expenses_app.views import ExpenseBatchCreateView
+import time
+
+CustomUser = get_user_model()
+
+
+# Alternating personal and 3-way group expenses, like a replayed offline queue
+def synthetic_expenses(count):
+    expenses = []
+    for i in range(count):
+        if i % 2:
+            expenses.append({'date': '2024-01-02', 'name': f'Lunch {i}', 'amount': '12.50', 'expense_type': 'Personal'})
+        else:
+            expenses.append({
+                'date': '2024-01-02', 'name': f'Dinner {i}', 'amount': '90.00', 'expense_type': 'Group',
+                'split_type': 'Equal', 'total_friends': 2,
+                'group_details': [{'name': 'Carol', 'email': 'carol@example.com'}, {'name': 'Dave', 'email': 'dave@example.com'}],
+            })
+    return expenses
+
+
+# Counts every query, the debug query log only keeps the last 9000
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        'Creates the same expenses through the per-row endpoint and through the batch endpoint, reporting '
+        'HTTP round-trips, database queries and wall time for each. Runs in a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--expenses', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        expenses = synthetic_expenses(options['expenses'])
+        batch_size = ExpenseBatchCreateView.max_batch_size
+
+        self.stdout.write(f"{'path':>8} {'expenses':>9} {'round-trips':>12} {'queries':>8} {'seconds':>8} {'expenses/s':>11}")
+        with transaction.atomic():
+            client = APIClient()
+            client.force_authenticate(CustomUser.objects.create_user(username='batch-benchmark', email='batch-benchmark@example.com'))
+
+            def per_row():
+                for expense in expenses:
+                    yield client.post('/expenses/', expense, format='json')
+
+            def batched():
+                for start in range(0, len(expenses), batch_size):
+                    yield client.post('/expenses/batch/', {'expenses': expenses[start:start + batch_size]}, format='json')
+
+            for name, requests in (('per-row', per_row), ('batch', batched)):
+                queries = QueryCounter()
+                with connection.execute_wrapper(queries):
+                    started = time.perf_counter()
+                    responses = list(requests())
+                    elapsed = time.perf_counter() - started
+
+                failed = [response.status_code for response in responses if response.status_code != 201]
+                if failed:
+                    self.stderr.write(f"{name}: {len(failed)} requests failed with {sorted(set(failed))}")
+                self.stdout.write(
+                    f"{name:>8} {len(expenses):>9} {len(responses):>12} {queries.count:>8} "
+                    f"{elapsed:>8.2f} {len(expenses) / elapsed:>11,.0f}"
+                )
+
+            transaction.set_rollback(True)
@@ -0,0 +1,86 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from rest_framework.test import APIClient
+from ._seed import seed_expenses
+import resource
+import time
+
+CustomUser = get_user_model()
+
+# Seeded group expenses have an owner row and two friend rows, so every
+# two expenses make four export rows
+ROWS_PER_EXPENSE = 2
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def rss_mb():
+    # Linux only, seeding leaves heap behind that the export should not be blamed for
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+
+
+def reset_peak_rss():
+    # Linux only, so each export reports its own peak instead of the seeding's
+    with open('/proc/self/clear_refs', 'w') as clear_refs:
+        clear_refs.write('5')
+
+
+class Command(BaseCommand):
+    help = (
+        'Streams the expense export at increasing sizes and reports time to the first row, total time, '
+        'bytes sent, peak RSS and how much of it the export added. Rows are seeded inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1_000, 10_000, 100_000, 1_000_000], help='Export sizes, smallest first.')
+        parser.add_argument('--file-format', choices=['csv', 'ndjson'], default='csv')
+        parser.add_argument('--gzip', action='store_true')
+
+    def handle(self, *args, **options):
+        params = {'file_format': options['file_format']}
+        if options['gzip']:
+            params['gzip'] = '1'
+
+        self.stdout.write(f"{'rows':>10} {'first row s':>12} {'seconds':>9} {'rows/s':>10} {'MB sent':>8} {'peak RSS MB':>12} {'export adds MB':>15}")
+        with transaction.atomic():
+            user = CustomUser.objects.create_user(username='export-benchmark', email='export-benchmark@example.com')
+            client = APIClient()
+            client.force_authenticate(user)
+
+            seeded = 0
+            for rows in sorted(options['rows']):
+                expenses = rows // ROWS_PER_EXPENSE
+                seed_expenses(user, expenses - seeded, offset=seeded)
+                seeded = expenses
+                self.benchmark(client, params, rows)
+
+            transaction.set_rollback(True)
+
+    def benchmark(self, client, params, rows):
+        reset_peak_rss()
+        baseline = rss_mb()
+        started = time.perf_counter()
+        response = client.get('/expenses/export/', params)
+        chunks = iter(response.streaming_content)
+        size = len(next(chunks))
+        if params['file_format'] == 'csv' and 'gzip' not in params:
+            # The first chunk is the header, which is written before the query runs
+            size += len(next(chunks))
+        first_row = time.perf_counter() - started
+
+        # Counted and dropped, like a socket would
+        for chunk in chunks:
+            size += len(chunk)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"{rows:>10} {first_row:>12.4f} {elapsed:>9.2f} {rows / elapsed:>10,.0f} "
+            f"{size / 2**20:>8.1f} {peak_rss_mb():>12.1f} {peak_rss_mb() - baseline:>15.1f}"
+        )
@@ -0,0 +1,96 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Sum
+from Expenses_app.aggregations import combine_totals, expense_totals, format_summary
+from Expenses_app.models import Expense, GroupExpenseDetail
+from Expenses_app.splits import CENT
+from decimal import Decimal
+from statistics import median
+from ._seed import seed_expenses
+from .benchmark_batch_create import QueryCounter
+import time
+
+CustomUser = get_user_model()
+
+
+# The nine queries the portfolio summary view used to run, for comparison
+def legacy_summary(user):
+    expenses = Expense.objects.filter(user=user)
+    personal_expense_count = expenses.filter(expense_type='Personal').count()
+    group_expense_count = expenses.filter(expense_type='Group').count()
+    personal_expense_sum = expenses.filter(expense_type='Personal').aggregate(Sum('amount'))['amount__sum'] or 0
+    group_expenses = expenses.filter(expense_type='Group')
+    group_expense_details = GroupExpenseDetail.objects.filter(expense__in=group_expenses)
+
+    payments_received = group_expense_details.filter(is_paid=True).aggregate(Sum('amount'))['amount__sum'] or 0
+    payments_pending = group_expense_details.filter(is_paid=False).aggregate(Sum('amount'))['amount__sum'] or 0
+    paid_count = group_expense_details.filter(is_paid=True).count()
+    unpaid_count = group_expense_details.filter(is_paid=False).count()
+
+    group_expense_spend = group_expenses.aggregate(Sum('amount'))['amount__sum'] or 0
+    owner_share = group_expense_details.filter(username=user.username).aggregate(Sum('amount'))['amount__sum'] or 0
+    return {
+        'personal_expense_count': personal_expense_count,
+        'group_expense_count': group_expense_count,
+        'personal_expense_sum': personal_expense_sum,
+        'group_expense_summary': {
+            'payments_received': payments_received,
+            'payments_pending': payments_pending,
+            'paid_count': paid_count,
+            'unpaid_count': unpaid_count,
+            'total_spend(Group Expense - My Expense)': group_expense_spend - owner_share,
+        },
+        'total_expense_sum': personal_expense_sum + group_expense_spend,
+    }
+
+
+# SQLite sums decimals as floats, so the two only agree to the cent
+def rounded(summary):
+    return {
+        key: rounded(value) if isinstance(value, dict) else Decimal(value).quantize(CENT)
+        for key, value in summary.items()
+    }
+
+
+def single_pass_summary(user):
+    return format_summary(combine_totals(expense_totals(user).values()))
+
+
+def monthly_series(user):
+    return [format_summary(totals) for totals in expense_totals(user, group_by='month').values()]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares query count and latency of the old nine-query portfolio summary with the single-pass '
+        'conditional aggregation, on expenses seeded inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--expenses', type=int, default=100_000)
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per variant, the median is reported.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = CustomUser.objects.create_user(username='summary-benchmark', email='summary-benchmark@example.com')
+            # A second user's rows so the filters have something to skip
+            other = CustomUser.objects.create_user(username='summary-benchmark-other', email='summary-benchmark-other@example.com')
+            seed_expenses(user, options['expenses'])
+            seed_expenses(other, options['expenses'] // 10, seed=1)
+
+            self.stdout.write(f"{'variant':>14} {'expenses':>9} {'queries':>8} {'median ms':>10}")
+            results = {}
+            for name, summary in (('nine queries', legacy_summary), ('single pass', single_pass_summary), ('monthly', monthly_series)):
+                timings = []
+                for _ in range(options['repeat']):
+                    queries = QueryCounter()
+                    with connection.execute_wrapper(queries):
+                        started = time.perf_counter()
+                        results[name] = summary(user)
+                        timings.append(time.perf_counter() - started)
+                self.stdout.write(f"{name:>14} {options['expenses']:>9} {queries.count:>8} {median(timings) * 1000:>10.1f}")
+
+            if rounded(results['nine queries']) != rounded(results['single pass']):
+                self.stderr.write(f"Summaries differ:\n{results['nine queries']}\n{results['single pass']}")
+            transaction.set_rollback(True)
@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from Expenses_app.search import fts_available, search_expense_ids, substring_search_ids
+from statistics import median
+from ._seed import seed_expenses
+import time
+
+CustomUser = get_user_model()
+
+# A word in about a sixth of the expenses, its prefix, two words, and a word in none
+QUERIES = ['dinner', 'din', 'pizza party', 'zebra']
+
+# One page of the search endpoint plus the look-ahead hit
+LIMIT = 21
+
+
+def timed(search, user, text, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        search(user, text, LIMIT)
+        timings.append(time.perf_counter() - started)
+    return median(timings) * 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Times one user\'s full-text search against the icontains scan while the other users\' expenses grow. '
+        'Rows are seeded inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000], help='Expenses across all users, smallest first.')
+        parser.add_argument('--own', type=int, default=10_000, help='Expenses of the user who searches.')
+        parser.add_argument('--users', type=int, default=10, help='Other users sharing the rest of the expenses.')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per query, the median is reported.')
+
+    def handle(self, *args, **options):
+        if not fts_available():
+            self.stderr.write("Full-text search needs SQLite, only the icontains scan would run.")
+            return
+
+        self.stdout.write(f"{'rows':>10} {'own rows':>9} {'query':>12} {'fts ms':>8} {'icontains ms':>13}")
+        with transaction.atomic():
+            searcher = CustomUser.objects.create_user(username='search-benchmark', email='search-benchmark@example.com')
+            others = [
+                CustomUser.objects.create_user(username=f'search-benchmark-{number}', email=f'search-benchmark-{number}@example.com')
+                for number in range(options['users'])
+            ]
+            seed_expenses(searcher, options['own'])
+
+            seeded = 0
+            for rows in sorted(options['rows']):
+                per_user = max(rows - options['own'], 0) // len(others)
+                for number, user in enumerate(others, start=1):
+                    seed_expenses(user, per_user - seeded, seed=number, offset=seeded)
+                seeded = per_user
+
+                for text in QUERIES:
+                    # Single words must match the same expenses either way, only the order differs
+                    if ' ' not in text and set(search_expense_ids(searcher, text, rows)) != set(substring_search_ids(searcher, text, rows)):
+                        self.stderr.write(f"{text!r}: full-text and icontains hits differ")
+
+                    self.stdout.write(
+                        f"{rows:>10} {options['own']:>9} {text:>12} "
+                        f"{timed(search_expense_ids, searcher, text, options['repeat']):>8.1f} "
+                        f"{timed(substring_search_ids, searcher, text, options['repeat']):>13.1f}"
+                    )
+
+            transaction.set_rollback(True)
@@ -0,0 +1,91 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from Expenses_app.models import Expense, GroupExpenseDetail
+from Expenses_app.settlements import net_balances
+from datetime import date
+from decimal import Decimal
+from rest_framework.test import APIClient
+from ._seed import BATCH_SIZE
+from .benchmark_batch_create import QueryCounter
+import random
+import time
+
+CustomUser = get_user_model()
+
+
+def seed_counterparties(user, count, rng):
+    """Gives user count people to settle with: every fourth one is a registered
+    user who shared an expense with user, the others were added by email to
+    user's expenses. Everyone has several unpaid shares, so the balances are
+    sums over many details."""
+    creditors = CustomUser.objects.bulk_create([
+        CustomUser(username=f'settle-creditor-{number}', email=f'settle-creditor-{number}@example.com')
+        for number in range(count // 4)
+    ], batch_size=BATCH_SIZE)
+    debtors = [f'settle-debtor-{number}@example.com' for number in range(count - len(creditors))]
+
+    # The user's expenses, each split with four people who owe the user
+    expenses = Expense.objects.bulk_create([
+        Expense(user=user, date=date(2024, 1, 1), name='Dinner', amount=Decimal('50.00'), expense_type='Group',
+                split_type='Equal', total_friends=4)
+        for _ in range(len(debtors))
+    ], batch_size=BATCH_SIZE)
+    details = []
+    for number, expense in enumerate(expenses):
+        for offset in range(4):
+            email = debtors[(number + offset) % len(debtors)]
+            details.append(GroupExpenseDetail(expense=expense, name=email, email=email, amount=Decimal(rng.randint(100, 5000)) / 100))
+
+    # Expenses of the registered people, each shared with the user
+    expenses = Expense.objects.bulk_create([
+        Expense(user=creditor, date=date(2024, 1, 1), name='Taxi', amount=Decimal('20.00'), expense_type='Group',
+                split_type='Equal', total_friends=1)
+        for creditor in creditors for _ in range(4)
+    ], batch_size=BATCH_SIZE)
+    details += [
+        GroupExpenseDetail(expense=expense, name=user.username, username=user.username, participant=user, amount=Decimal(rng.randint(100, 5000)) / 100)
+        for expense in expenses
+    ]
+    GroupExpenseDetail.objects.bulk_create(details, batch_size=BATCH_SIZE)
+    return len(details)
+
+
+class Command(BaseCommand):
+    help = (
+        'Times the settle-up endpoint for a user with many people to settle with, seeded inside a '
+        'transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--participants', type=int, nargs='+', default=[100, 1_000, 10_000], help='Group sizes, smallest first.')
+        parser.add_argument('--seed', type=int, default=13)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+
+        self.stdout.write("Settle-up endpoint, transfers to or from the requester")
+        self.stdout.write(f"{'people':>8} {'details':>9} {'queries':>8} {'balances s':>11} {'request s':>10} {'transfers':>10}")
+        for count in sorted(options['participants']):
+            with transaction.atomic():
+                user = CustomUser.objects.create_user(username='settle-benchmark', email='settle-benchmark@example.com')
+                details = seed_counterparties(user, count, rng)
+
+                started = time.perf_counter()
+                net_balances(user)
+                balances_elapsed = time.perf_counter() - started
+
+                client = APIClient()
+                client.force_authenticate(user)
+                queries = QueryCounter()
+                with connection.execute_wrapper(queries):
+                    started = time.perf_counter()
+                    response = client.get('/settle-up/')
+                    elapsed = time.perf_counter() - started
+
+                transfers = response.json()['transfers']
+                if any(user.username not in (transfer['from'], transfer['to']) for transfer in transfers):
+                    self.stderr.write("A transfer does not involve the requester")
+                self.stdout.write(f"{count:>8} {details:>9} {queries.count:>8} {balances_elapsed:>11.3f} {elapsed:>10.3f} {len(transfers):>10}")
+                transaction.set_rollback(True)
+
@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand
+from Expenses_app.splits import CENT, compute_batch_shares
+from decimal import Decimal
+import random
+import time
+
+
+# Percentage splits use equal percentages, so every item can also be split the legacy way
+def synthetic_items(count, seed):
+    rng = random.Random(seed)
+    items = []
+    for _ in range(count):
+        amount = Decimal(rng.randint(100, 10_000_000)) * CENT
+        friends = rng.randint(1, 10)
+        include_self = rng.random() < 0.5
+        split_type = rng.choice(['Equal', 'Percentage'])
+        if split_type == 'Equal':
+            values = [None] * friends
+        else:
+            values = [Decimal(100) / (friends + 1)] * friends
+            if not include_self:
+                values = [Decimal(100) / friends] * friends
+        items.append((amount, split_type, values, include_self))
+    return items
+
+
+# The unrounded division every view used to do by itself, for comparison
+def legacy_equal_shares(amount, friends, include_self):
+    participants = friends + 1 if include_self else friends
+    return [amount / participants] * participants
+
+
+class Command(BaseCommand):
+    help = 'Times the split engine on batches of random group expenses and checks that every split adds up to its amount.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--expenses', type=int, nargs='+', default=[1_000, 10_000, 100_000], help='Batch sizes to split.')
+        parser.add_argument('--seed', type=int, default=6)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'expenses':>10} {'engine s':>9} {'us/expense':>11} {'legacy s':>9} {'legacy off by':>14} {'engine off by':>14}")
+        for count in sorted(options['expenses']):
+            items = synthetic_items(count, options['seed'])
+
+            started = time.perf_counter()
+            splits = compute_batch_shares(items)
+            elapsed = time.perf_counter() - started
+
+            engine_off = 0
+            for (amount, _, _, include_self), split in zip(items, splits):
+                total = sum(split.friend_shares, split.owner_share if include_self else Decimal('0.00'))
+                engine_off += total != amount
+
+            started = time.perf_counter()
+            legacy_off = 0
+            for amount, _, values, include_self in items:
+                shares = [share.quantize(CENT) for share in legacy_equal_shares(amount, len(values), include_self)]
+                legacy_off += sum(shares) != amount
+            legacy_elapsed = time.perf_counter() - started
+
+            # "off by" counts the expenses whose stored shares do not add up to the amount
+            self.stdout.write(
+                f"{count:>10} {elapsed:>9.3f} {elapsed / count * 1e6:>11.1f} {legacy_elapsed:>9.3f} "
+                f"{legacy_off:>14} {engine_off:>14}"
+            )
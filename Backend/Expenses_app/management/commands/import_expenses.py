@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from Expenses_app.importers import ExpenseImporter, iter_csv_rows
+
+CustomUser = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Imports personal expenses for a user from a CSV bank statement, streaming the file in chunks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('path')
+        parser.add_argument('--column', action='append', default=[], metavar='FIELD=HEADER',
+                            help='Maps an expense field (date, name, amount, note) to a CSV header.')
+        parser.add_argument('--date-format', action='append', dest='date_formats',
+                            help='strptime format of the date column, can be given more than once.')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--encoding', default='utf-8-sig')
+        parser.add_argument('--import-credits', action='store_true',
+                            help='Imports credits (negative amounts) as expenses of the same size instead of skipping them.')
+
+    def handle(self, *args, **options):
+        try:
+            user = CustomUser.objects.get(username=options['username'])
+        except CustomUser.DoesNotExist:
+            raise CommandError(f"User '{options['username']}' does not exist.")
+
+        columns = {}
+        for mapping in options['column']:
+            field, _, header = mapping.partition('=')
+            if not header:
+                raise CommandError(f"Invalid column mapping '{mapping}', expected FIELD=HEADER.")
+            columns[field] = header
+
+        importer = ExpenseImporter(
+            user,
+            columns=columns,
+            date_formats=options['date_formats'],
+            chunk_size=options['chunk_size'],
+            import_credits=options['import_credits'],
+        )
+
+        with open(options['path'], 'rb') as csv_file:
+            report = importer.run(iter_csv_rows(csv_file, encoding=options['encoding']))
+
+        for error in report['errors']:
+            self.stderr.write(f"Line {error['line']}: {error['error']}")
+        if 'error' in report:
+            self.stderr.write(report['error'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['imported']} of {report['rows']} rows ({report['skipped']} skipped, {report['failed']} failed) "
+            f"in {report['elapsed_seconds']}s, {report['rows_per_second']} rows/sec."
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand, CommandError
+from Expenses_app.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index over expense and group detail names and notes.'
+
+    def handle(self, *args, **options):
+        if not rebuild_search_index():
+            raise CommandError("Full-text search needs the SQLite FTS5 index, this database uses substring search.")
+        self.stdout.write(self.style.SUCCESS("Expense search index rebuilt."))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from Expenses_app.summaries import rebuild_user_summary, summary_drift
+
+CustomUser = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the per-user expense summaries from the expense rows, or only reports drift with --check.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', dest='username', help='Only process this username.')
+        parser.add_argument('--check', action='store_true', help='Report drift without rewriting the summaries.')
+
+    def handle(self, *args, **options):
+        users = CustomUser.objects.order_by('id')
+        if options['username']:
+            users = users.filter(username=options['username'])
+            if not users.exists():
+                raise CommandError(f"User '{options['username']}' does not exist.")
+
+        drifted = 0
+        for user in users.iterator():
+            if options['check']:
+                drift = summary_drift(user)
+                if drift:
+                    drifted += 1
+                    self.stdout.write(self.style.WARNING(f"{user.username}: {drift}"))
+            else:
+                with transaction.atomic():
+                    rebuild_user_summary(user)
+
+        if options['check']:
+            if drifted:
+                raise CommandError(f"{drifted} user summaries have drifted.")
+            self.stdout.write(self.style.SUCCESS("All user summaries match the expense rows."))
+        else:
+            self.stdout.write(self.style.SUCCESS("User summaries rebuilt."))
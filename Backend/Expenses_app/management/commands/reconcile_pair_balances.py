@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from Expenses_app.ledger import fix_ledger_drift, ledger_drift
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the pairwise balances from the unpaid group expense details and reports drift, fixing it with --fix.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Rewrite the drifted balances with the recomputed amounts.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            drift = ledger_drift()
+            for (creditor_id, key), (stored, expected) in sorted(drift.items()):
+                self.stdout.write(self.style.WARNING(f"user {creditor_id} <- {key}: stored {stored}, expected {expected}"))
+
+            if not drift:
+                self.stdout.write(self.style.SUCCESS("All pairwise balances match the group expense details."))
+            elif options['fix']:
+                fix_ledger_drift(drift)
+                self.stdout.write(self.style.SUCCESS(f"{len(drift)} pairwise balances fixed."))
+            else:
+                raise CommandError(f"{len(drift)} pairwise balances have drifted.")
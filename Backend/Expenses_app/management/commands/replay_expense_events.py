@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from Expenses_app.events import live_state, nearest_snapshot, rebuild_state, state_content
+from Expenses_app.models import ExpenseEvent
+import time
+
+CustomUser = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Replays the expense event log of each user from their latest snapshot, reporting replay throughput and any difference from the live rows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', dest='username', help='Only process this username.')
+
+    def handle(self, *args, **options):
+        users = CustomUser.objects.filter(id__in=ExpenseEvent.objects.values('user')).order_by('id')
+        if options['username']:
+            users = CustomUser.objects.filter(username=options['username'])
+            if not users.exists():
+                raise CommandError(f"User '{options['username']}' does not exist.")
+
+        mismatched = 0
+        total_events = 0
+        total_elapsed = 0
+        for user in users.iterator():
+            snapshot = nearest_snapshot(user)
+            pending = ExpenseEvent.objects.filter(user=user, id__gt=snapshot.last_event_id if snapshot else 0).count()
+
+            started = time.perf_counter()
+            state, _ = rebuild_state(user)
+            elapsed = time.perf_counter() - started
+            total_events += pending
+            total_elapsed += elapsed
+
+            rate = pending / elapsed if elapsed else 0
+            self.stdout.write(f"{user.username}: {pending} events replayed into {len(state)} expenses in {elapsed:.3f}s ({rate:,.0f} events/s)")
+
+            if state_content(state) != state_content(live_state(user)):
+                mismatched += 1
+                self.stdout.write(self.style.WARNING(f"{user.username}: replayed state differs from the live rows"))
+
+        if total_elapsed:
+            self.stdout.write(f"Overall: {total_events} events in {total_elapsed:.3f}s ({total_events / total_elapsed:,.0f} events/s)")
+        if mismatched:
+            raise CommandError(f"{mismatched} users have a replayed state that differs from the live rows.")
+        self.stdout.write(self.style.SUCCESS("Replayed states match the live rows."))
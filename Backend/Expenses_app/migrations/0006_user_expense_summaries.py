@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Expenses_app', '0005_expense_list_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserExpenseSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('personal_expense_count', models.IntegerField(default=0)),
+                ('group_expense_count', models.IntegerField(default=0)),
+                ('personal_expense_sum', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('group_expense_sum', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('payments_received', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('payments_pending', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('paid_count', models.IntegerField(default=0)),
+                ('unpaid_count', models.IntegerField(default=0)),
+                ('owner_share', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='expense_summary', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='UserMonthlyExpenseSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('personal_expense_count', models.IntegerField(default=0)),
+                ('group_expense_count', models.IntegerField(default=0)),
+                ('personal_expense_sum', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('group_expense_sum', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('payments_received', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('payments_pending', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('paid_count', models.IntegerField(default=0)),
+                ('unpaid_count', models.IntegerField(default=0)),
+                ('owner_share', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('month', models.DateField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_expense_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'month'), name='unique_user_month_summary')],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+from django.db import migrations
+
+# FTS5 indexes mirroring the expense and group detail names and notes. They are
+# external content tables kept in sync by triggers, so every write path
+# (including bulk_create and raw deletes) updates them.
+FTS_TABLES = [
+    ('Expenses_app_expense_fts', 'Expenses_app_expense'),
+    ('Expenses_app_groupexpensedetail_fts', 'Expenses_app_groupexpensedetail'),
+]
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    for fts_table, table in FTS_TABLES:
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {fts_table} USING fts5("
+            f"name, note, content='{table}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {fts_table}_insert AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts_table}(rowid, name, note) VALUES (new.id, new.name, new.note); "
+            f"END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {fts_table}_delete AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts_table}({fts_table}, rowid, name, note) VALUES ('delete', old.id, old.name, old.note); "
+            f"END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {fts_table}_update AFTER UPDATE OF name, note ON {table} BEGIN "
+            f"INSERT INTO {fts_table}({fts_table}, rowid, name, note) VALUES ('delete', old.id, old.name, old.note); "
+            f"INSERT INTO {fts_table}(rowid, name, note) VALUES (new.id, new.name, new.note); "
+            f"END"
+        )
+        schema_editor.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    for fts_table, _ in FTS_TABLES:
+        for action in ('insert', 'delete', 'update'):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {fts_table}_{action}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {fts_table}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Expenses_app', '0006_user_expense_summaries'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
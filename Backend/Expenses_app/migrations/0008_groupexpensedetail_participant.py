@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+# Resolving existing group details to users by username, then by email for the rest
+def backfill_participants(apps, schema_editor):
+    GroupExpenseDetail = apps.get_model('Expenses_app', 'GroupExpenseDetail')
+    CustomUser = apps.get_model('UserManagement_app', 'CustomUser')
+
+    GroupExpenseDetail.objects.filter(participant__isnull=True, username__isnull=False).exclude(username='').update(
+        participant_id=Subquery(CustomUser.objects.filter(username=OuterRef('username')).values('id')[:1])
+    )
+    GroupExpenseDetail.objects.filter(participant__isnull=True, email__isnull=False).exclude(email='').update(
+        participant_id=Subquery(CustomUser.objects.filter(email=OuterRef('email')).values('id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Expenses_app', '0007_expense_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='groupexpensedetail',
+            name='participant',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='expense_shares', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='groupexpensedetail',
+            index=models.Index(fields=['participant', 'is_paid'], name='detail_participant_paid_idx'),
+        ),
+        migrations.RunPython(backfill_participants, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, Max, Sum
+
+
+# Seeding the ledger from the unpaid group expense details that already exist
+def backfill_pair_balances(apps, schema_editor):
+    GroupExpenseDetail = apps.get_model('Expenses_app', 'GroupExpenseDetail')
+    PairBalance = apps.get_model('Expenses_app', 'PairBalance')
+
+    rows = (
+        GroupExpenseDetail.objects.filter(is_paid=False, expense__expense_type='Group')
+        .exclude(username=F('expense__user__username'))
+        .values('expense__user_id', 'username', 'email')
+        .annotate(total=Sum('amount'), debtor_id=Max('participant_id'))
+        .order_by()
+    )
+    balances = {}
+    for row in rows:
+        key = row['username'] or row['email']
+        if not key:
+            continue
+        balance = balances.setdefault((row['expense__user_id'], key), PairBalance(creditor_id=row['expense__user_id'], debtor_key=key, amount=0))
+        balance.amount += row['total']
+        balance.debtor_id = balance.debtor_id or row['debtor_id']
+    PairBalance.objects.bulk_create(balances.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Expenses_app', '0008_groupexpensedetail_participant'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PairBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('debtor_key', models.CharField(max_length=254)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('creditor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balances_owed_to', to=settings.AUTH_USER_MODEL)),
+                ('debtor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='balances_owed', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['debtor_key'], name='pair_balance_debtor_key_idx')],
+                'constraints': [models.UniqueConstraint(fields=('creditor', 'debtor_key'), name='unique_pair_balance')],
+            },
+        ),
+        migrations.RunPython(backfill_pair_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:22
+
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def row(instance):
+    return {field.attname: getattr(instance, field.attname) for field in instance._meta.concrete_fields}
+
+
+# History starts here: each user's existing expenses become their first snapshot
+def snapshot_existing_expenses(apps, schema_editor):
+    Expense = apps.get_model('Expenses_app', 'Expense')
+    ExpenseSnapshot = apps.get_model('Expenses_app', 'ExpenseSnapshot')
+
+    user_ids = Expense.objects.values_list('user_id', flat=True).distinct().order_by('user_id')
+    for user_id in user_ids:
+        state = {}
+        for expense in Expense.objects.filter(user_id=user_id).prefetch_related('group_details'):
+            state[str(expense.id)] = {
+                'expense': row(expense),
+                'details': {str(detail.id): row(detail) for detail in expense.group_details.all()},
+            }
+        ExpenseSnapshot.objects.create(user_id=user_id, last_event_id=0, state=state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Expenses_app', '0009_pair_balances'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpenseEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('expense_id', models.BigIntegerField()),
+                ('detail_id', models.BigIntegerField(blank=True, null=True)),
+                ('event_type', models.CharField(choices=[('expense_created', 'Expense created'), ('expense_updated', 'Expense updated'), ('expense_deleted', 'Expense deleted'), ('detail_created', 'Group detail created'), ('detail_updated', 'Group detail updated'), ('detail_deleted', 'Group detail deleted'), ('payment_changed', 'Payment status changed')], max_length=20)),
+                ('data', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='expense_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'id'], name='expense_event_user_id_idx'), models.Index(fields=['user', 'expense_id', 'id'], name='expense_event_expense_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ExpenseSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_event_id', models.BigIntegerField(default=0)),
+                ('state', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='expense_snapshots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'created_at'], name='expense_snapshot_user_idx')],
+            },
+        ),
+        migrations.RunPython(snapshot_existing_expenses, migrations.RunPython.noop),
+    ]
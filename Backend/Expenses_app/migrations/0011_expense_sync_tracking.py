@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+FTS_TABLES = [
+    ('Expenses_app_expense_fts', 'Expenses_app_expense'),
+    ('Expenses_app_groupexpensedetail_fts', 'Expenses_app_groupexpensedetail'),
+]
+
+
+# Adding the columns rebuilds both tables on SQLite, which drops the search index triggers
+def recreate_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    for fts_table, table in FTS_TABLES:
+        for action in ('insert', 'delete', 'update'):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {fts_table}_{action}")
+        schema_editor.execute(
+            f"CREATE TRIGGER {fts_table}_insert AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts_table}(rowid, name, note) VALUES (new.id, new.name, new.note); "
+            f"END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {fts_table}_delete AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts_table}({fts_table}, rowid, name, note) VALUES ('delete', old.id, old.name, old.note); "
+            f"END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {fts_table}_update AFTER UPDATE OF name, note ON {table} BEGIN "
+            f"INSERT INTO {fts_table}({fts_table}, rowid, name, note) VALUES ('delete', old.id, old.name, old.note); "
+            f"INSERT INTO {fts_table}(rowid, name, note) VALUES (new.id, new.name, new.note); "
+            f"END"
+        )
+        schema_editor.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Expenses_app', '0010_expense_event_log'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expense',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='groupexpensedetail',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='groupexpensedetail',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='expense_user_updated_idx'),
+        ),
+        migrations.RunPython(recreate_search_triggers, recreate_search_triggers),
+    ]
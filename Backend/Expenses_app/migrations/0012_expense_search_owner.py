@@ -0,0 +1,101 @@
+from django.db import migrations
+import Expenses_app.search
+
+# Every word in the search indexes becomes u<owner id>_<word>, so a search and
+# the document counts bm25 ranks it with only ever read the searching user's
+# postings instead of every user's. The words are prefixed by a SQL function
+# registered on each SQLite connection, and since the indexed text no longer
+# equals the table columns the indexes become contentless.
+EXPENSE_FTS_TABLE = 'Expenses_app_expense_fts'
+DETAIL_FTS_TABLE = 'Expenses_app_groupexpensedetail_fts'
+
+# FTS table -> (content table, owner user id of a row given as new./old.)
+OWNERS = {
+    EXPENSE_FTS_TABLE: ('Expenses_app_expense', "{row}.user_id"),
+    DETAIL_FTS_TABLE: ('Expenses_app_groupexpensedetail', "(SELECT user_id FROM Expenses_app_expense WHERE id = {row}.expense_id)"),
+}
+
+
+def drop_search_index(schema_editor):
+    for fts_table in OWNERS:
+        for action in ('insert', 'delete', 'update'):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {fts_table}_{action}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {fts_table}")
+
+
+def create_owner_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    Expenses_app.search.register_search_terms(schema_editor.connection.connection)
+    drop_search_index(schema_editor)
+    terms = Expenses_app.search.SEARCH_TERMS_FUNCTION
+    for fts_table, (table, owner) in OWNERS.items():
+        new_owner = owner.format(row='new')
+        old_owner = owner.format(row='old')
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {fts_table} USING fts5("
+            f"name, note, content='', tokenize=\"unicode61 remove_diacritics 2 tokenchars '_'\")"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {fts_table}_insert AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts_table}(rowid, name, note) "
+            f"VALUES (new.id, {terms}({new_owner}, new.name), {terms}({new_owner}, new.note)); "
+            f"END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {fts_table}_delete AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts_table}({fts_table}, rowid, name, note) "
+            f"VALUES ('delete', old.id, {terms}({old_owner}, old.name), {terms}({old_owner}, old.note)); "
+            f"END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {fts_table}_update AFTER UPDATE OF name, note ON {table} BEGIN "
+            f"INSERT INTO {fts_table}({fts_table}, rowid, name, note) "
+            f"VALUES ('delete', old.id, {terms}({old_owner}, old.name), {terms}({old_owner}, old.note)); "
+            f"INSERT INTO {fts_table}(rowid, name, note) "
+            f"VALUES (new.id, {terms}({new_owner}, new.name), {terms}({new_owner}, new.note)); "
+            f"END"
+        )
+        schema_editor.execute(Expenses_app.search.REFILL_SQL[fts_table])
+
+
+# Back to the unscoped external content indexes of 0007
+def create_global_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    drop_search_index(schema_editor)
+    for fts_table, (table, _) in OWNERS.items():
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {fts_table} USING fts5("
+            f"name, note, content='{table}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {fts_table}_insert AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts_table}(rowid, name, note) VALUES (new.id, new.name, new.note); "
+            f"END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {fts_table}_delete AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts_table}({fts_table}, rowid, name, note) VALUES ('delete', old.id, old.name, old.note); "
+            f"END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {fts_table}_update AFTER UPDATE OF name, note ON {table} BEGIN "
+            f"INSERT INTO {fts_table}({fts_table}, rowid, name, note) VALUES ('delete', old.id, old.name, old.note); "
+            f"INSERT INTO {fts_table}(rowid, name, note) VALUES (new.id, new.name, new.note); "
+            f"END"
+        )
+        schema_editor.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Expenses_app', '0011_expense_sync_tracking'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_owner_search_index, create_global_search_index),
+    ]
@@ -1,6 +1,18 @@
 from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
 from UserManagement_app.models import *
 
+# Soft-deleted rows stay behind as tombstones for sync clients
+class SoftDeleteQuerySet(models.QuerySet):
+    def soft_delete(self):
+        now = timezone.now()
+        return self.update(deleted_at=now, updated_at=now)
+
+class ActiveManager(models.Manager.from_queryset(SoftDeleteQuerySet)):
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
 class Expense(models.Model):
     EXPENSE_TYPE_CHOICES = [
         ('Personal', 'Personal'),
@@ -22,6 +34,20 @@ class Expense(models.Model):
     split_type = models.CharField(max_length=10, choices=SPLIT_TYPE_CHOICES, null=True, blank=True)
     total_friends = models.IntegerField(null=True, blank=True)
     include_self = models.BooleanField(default=True)
+    # Also bumped when only the group details change, so sync clients refetch the expense
+    updated_at = models.DateTimeField(auto_now=True)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = ActiveManager()
+    all_objects = models.Manager.from_queryset(SoftDeleteQuerySet)()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date', 'id'], name='expense_user_date_id_idx'),
+            models.Index(fields=['user', 'expense_type', 'date'], name='expense_user_type_date_idx'),
+            models.Index(fields=['user', 'amount'], name='expense_user_amount_idx'),
+            models.Index(fields=['user', 'updated_at', 'id'], name='expense_user_updated_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -34,6 +60,125 @@ class GroupExpenseDetail(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     note = models.TextField(null=True, blank=True)
     is_paid = models.BooleanField(default=False)
+    # Registered user behind username/email, filled in whenever it can be resolved
+    participant = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='expense_shares', db_index=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = ActiveManager()
+    all_objects = models.Manager.from_queryset(SoftDeleteQuerySet)()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['participant', 'is_paid'], name='detail_participant_paid_idx'),
+        ]
 
     def __str__(self):
         return self.name
+
+# Running totals behind the expense portfolio summary, kept up to date on every write
+class ExpenseSummaryFields(models.Model):
+    personal_expense_count = models.IntegerField(default=0)
+    group_expense_count = models.IntegerField(default=0)
+    personal_expense_sum = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    group_expense_sum = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    payments_received = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    payments_pending = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    paid_count = models.IntegerField(default=0)
+    unpaid_count = models.IntegerField(default=0)
+    owner_share = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+class UserExpenseSummary(ExpenseSummaryFields):
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='expense_summary')
+
+    def __str__(self):
+        return f"Expense summary of {self.user.username}"
+
+class UserMonthlyExpenseSummary(ExpenseSummaryFields):
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='monthly_expense_summaries')
+    month = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month'], name='unique_user_month_summary'),
+        ]
+
+    def __str__(self):
+        return f"Expense summary of {self.user.username} for {self.month:%Y-%m}"
+
+# What a debtor still owes a creditor across all unpaid group expense details
+class PairBalance(models.Model):
+    creditor = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='balances_owed_to')
+    # Username of the debtor, or their email when they are not registered
+    debtor_key = models.CharField(max_length=254)
+    debtor = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='balances_owed')
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['creditor', 'debtor_key'], name='unique_pair_balance'),
+        ]
+        indexes = [
+            models.Index(fields=['debtor_key'], name='pair_balance_debtor_key_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.debtor_key} owes {self.creditor.username} {self.amount}"
+
+# Append-only history of every change to a user's expenses and group details
+class ExpenseEvent(models.Model):
+    EVENT_TYPE_CHOICES = [
+        ('expense_created', 'Expense created'),
+        ('expense_updated', 'Expense updated'),
+        ('expense_deleted', 'Expense deleted'),
+        ('detail_created', 'Group detail created'),
+        ('detail_updated', 'Group detail updated'),
+        ('detail_deleted', 'Group detail deleted'),
+        ('payment_changed', 'Payment status changed'),
+    ]
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='expense_events')
+    # Plain ids, the rows they point at may no longer exist
+    expense_id = models.BigIntegerField()
+    detail_id = models.BigIntegerField(null=True, blank=True)
+    event_type = models.CharField(max_length=20, choices=EVENT_TYPE_CHOICES)
+    # Full row after the change, empty for deletions
+    data = models.JSONField(encoder=DjangoJSONEncoder, null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'], name='expense_event_user_id_idx'),
+            models.Index(fields=['user', 'expense_id', 'id'], name='expense_event_expense_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError("Expense events are append-only.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Expense events are append-only.")
+
+    def __str__(self):
+        return f"{self.event_type} of expense {self.expense_id}"
+
+# Replayed state of a user's expenses up to last_event_id, where later replays start from
+class ExpenseSnapshot(models.Model):
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='expense_snapshots')
+    last_event_id = models.BigIntegerField(default=0)
+    state = models.JSONField(encoder=DjangoJSONEncoder, default=dict)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='expense_snapshot_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"Expense snapshot of {self.user.username} at event {self.last_event_id}"
@@ -0,0 +1,107 @@
+from datetime import date
+from django.core import signing
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+# Keyset pagination for the expense list, newest first, backed by the (user, date, id)
+# index. The cursor holds both the date and the id of the row it stops at, so pages
+# never fall back to OFFSET however many expenses share a date.
+class ExpenseCursorPagination(BasePagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    cursor_salt = 'Expenses_app.pagination'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+
+        if position is None:
+            reverse = False
+            queryset = queryset.order_by('-date', '-id')
+        else:
+            position_date, position_id, reverse = position
+            if reverse:
+                queryset = queryset.filter(Q(date__gt=position_date) | Q(date=position_date, id__gt=position_id)).order_by('date', 'id')
+            else:
+                queryset = queryset.filter(Q(date__lt=position_date) | Q(date=position_date, id__lt=position_id)).order_by('-date', '-id')
+
+        # One extra row tells whether there is another page in this direction
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        # Coming back from a later page there is always a next one, and any page
+        # reached through a cursor has one before it unless this is the first
+        self.next_position = self.previous_position = None
+        if rows and (has_more or reverse):
+            self.next_position = (rows[-1].date, rows[-1].id, False)
+        if rows and position is not None and (has_more or not reverse):
+            self.previous_position = (rows[0].date, rows[0].id, True)
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            position = signing.loads(cursor, salt=self.cursor_salt)
+            return date.fromisoformat(position['d']), int(position['id']), bool(position['r'])
+        except (signing.BadSignature, KeyError, TypeError, ValueError):
+            raise NotFound("Invalid cursor")
+
+    def encode_cursor(self, position):
+        if position is None:
+            return None
+        position_date, position_id, reverse = position
+        cursor = signing.dumps({'d': position_date.isoformat(), 'id': position_id, 'r': reverse}, salt=self.cursor_salt)
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        return self.encode_cursor(self.next_position)
+
+    def get_previous_link(self):
+        return self.encode_cursor(self.previous_position)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+# Keyset pagination for group expense detail lists, newest first
+class GroupExpenseDetailCursorPagination(CursorPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = '-id'
+
+# Keyset pagination for an expense's event log, oldest first
+class ExpenseEventCursorPagination(CursorPagination):
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    ordering = 'id'
+
+# Page numbers for aggregated rows, which have no stable column to keep a cursor on
+class AggregatePagination(PageNumberPagination):
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
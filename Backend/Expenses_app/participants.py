@@ -0,0 +1,27 @@
+from UserManagement_app.lookups import lookup_users
+from UserManagement_app.models import CustomUser
+
+
+# Filling in participant on unsaved group details from their username, or their email
+# when no username is given, with at most one lookup per kind for the whole list
+def resolve_participants(details):
+    users_by_username = lookup_users(detail.username for detail in details if detail.username)
+    emails = {detail.email for detail in details if not detail.username and detail.email}
+    ids_by_email = dict(CustomUser.objects.filter(email__in=emails).values_list('email', 'id')) if emails else {}
+
+    for detail in details:
+        if detail.username:
+            user = users_by_username.get(detail.username)
+            detail.participant_id = user['id'] if user else None
+        else:
+            detail.participant_id = ids_by_email.get(detail.email)
+    return details
+
+
+def resolve_participant_id(username, email):
+    if username:
+        user = lookup_users([username]).get(username)
+        return user['id'] if user else None
+    if email:
+        return CustomUser.objects.filter(email=email).values_list('id', flat=True).first()
+    return None
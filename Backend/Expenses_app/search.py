@@ -0,0 +1,116 @@
+import re
+from django.db import connection, transaction
+from django.db.models import Q
+from .models import Expense
+
+EXPENSE_FTS_TABLE = 'Expenses_app_expense_fts'
+DETAIL_FTS_TABLE = 'Expenses_app_groupexpensedetail_fts'
+
+# SQL function the index triggers use to turn a name or note into indexed words
+SEARCH_TERMS_FUNCTION = 'expense_search_terms'
+
+# Expenses matching on their own name/note or on a group member's name/note,
+# best bm25 rank per expense first
+SEARCH_SQL = f"""
+    SELECT hits.expense_id, MIN(hits.rank) AS best_rank
+    FROM (
+        SELECT {EXPENSE_FTS_TABLE}.rowid AS expense_id, bm25({EXPENSE_FTS_TABLE}) AS rank
+        FROM {EXPENSE_FTS_TABLE}
+        WHERE {EXPENSE_FTS_TABLE} MATCH %s
+        UNION ALL
+        SELECT detail.expense_id, bm25({DETAIL_FTS_TABLE}) AS rank
+        FROM {DETAIL_FTS_TABLE}
+        JOIN Expenses_app_groupexpensedetail detail ON detail.id = {DETAIL_FTS_TABLE}.rowid
+        WHERE {DETAIL_FTS_TABLE} MATCH %s AND detail.deleted_at IS NULL
+    ) hits
+    JOIN Expenses_app_expense expense ON expense.id = hits.expense_id
+    WHERE expense.user_id = %s AND expense.deleted_at IS NULL
+    GROUP BY hits.expense_id
+    ORDER BY best_rank, hits.expense_id
+    LIMIT %s OFFSET %s
+"""
+
+
+def fts_available():
+    return connection.vendor == 'sqlite'
+
+
+# Every word is indexed as u<owner id>_<word>, so a search and the document
+# counts bm25 ranks it with only read the searching user's postings
+def owner_term(user_id, word):
+    return f'u{user_id}_{word}'
+
+
+def search_terms(user_id, text):
+    if user_id is None or text is None:
+        return None
+    return ' '.join(owner_term(user_id, word) for word in re.findall(r'\w+', text))
+
+
+# Called for every new SQLite connection (see signals) and by the migration
+# that creates the index triggers
+def register_search_terms(sqlite_connection):
+    sqlite_connection.create_function(SEARCH_TERMS_FUNCTION, 2, search_terms, deterministic=True)
+
+
+# Turning free text into an FTS5 query: every word is quoted so user input
+# cannot inject FTS syntax, and the last one is a prefix for search-as-you-type
+def build_match_query(user, text):
+    words = re.findall(r'\w+', text)
+    if not words:
+        return None
+    terms = [f'"{owner_term(user.id, word)}"' for word in words]
+    terms[-1] += '*'
+    return ' OR '.join(terms)
+
+
+def search_expense_ids(user, text, limit, offset=0):
+    if fts_available():
+        match = build_match_query(user, text)
+        if match is None:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(SEARCH_SQL, [match, match, user.id, limit, offset])
+            return [row[0] for row in cursor.fetchall()]
+    return substring_search_ids(user, text, limit, offset)
+
+
+# Other databases fall back to a substring scan
+def substring_search_ids(user, text, limit, offset=0):
+    queryset = (
+        Expense.objects.filter(user=user)
+        .filter(
+            Q(name__icontains=text) | Q(note__icontains=text)
+            | Q(group_details__name__icontains=text, group_details__deleted_at__isnull=True)
+            | Q(group_details__note__icontains=text, group_details__deleted_at__isnull=True)
+        )
+        .distinct()
+        .order_by('-date', '-id')
+        .values_list('id', flat=True)
+    )
+    return list(queryset[offset:offset + limit])
+
+
+# The indexes are contentless (their words differ from the table columns), so
+# they are emptied and refilled instead of using FTS5's 'rebuild'
+REFILL_SQL = {
+    EXPENSE_FTS_TABLE: (
+        f"INSERT INTO {EXPENSE_FTS_TABLE}(rowid, name, note) "
+        f"SELECT id, {SEARCH_TERMS_FUNCTION}(user_id, name), {SEARCH_TERMS_FUNCTION}(user_id, note) FROM Expenses_app_expense"
+    ),
+    DETAIL_FTS_TABLE: (
+        f"INSERT INTO {DETAIL_FTS_TABLE}(rowid, name, note) "
+        f"SELECT detail.id, {SEARCH_TERMS_FUNCTION}(expense.user_id, detail.name), {SEARCH_TERMS_FUNCTION}(expense.user_id, detail.note) "
+        f"FROM Expenses_app_groupexpensedetail detail JOIN Expenses_app_expense expense ON expense.id = detail.expense_id"
+    ),
+}
+
+
+def rebuild_search_index():
+    if not fts_available():
+        return False
+    with transaction.atomic(), connection.cursor() as cursor:
+        for table, refill in REFILL_SQL.items():
+            cursor.execute(f"INSERT INTO {table}({table}) VALUES ('delete-all')")
+            cursor.execute(refill)
+    return True
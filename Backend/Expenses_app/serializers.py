@@ -1,11 +1,20 @@
+from decimal import Decimal
 from rest_framework import serializers, status
 from .models import *
-from decimal import Decimal
+from UserManagement_app.lookups import lookup_users
+from UserManagement_app.versioning import DataVersionETagMixin
+from .changes import ExpenseChangeSet
+from .summaries import get_user_summary
+from .aggregations import GROUPINGS, combine_totals, expense_totals, format_summary
+from datetime import datetime
+from .participants import resolve_participants
+from .splits import SplitError, build_group_details, compute_shares, split_group_expense
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from django.db.models import Sum
+from django.db import transaction
+from django.utils import timezone
 
 # Group expense serializer 
 class GroupExpenseDetailSerializer(serializers.ModelSerializer):
@@ -27,7 +36,7 @@ class GroupExpenseDetailSerializer(serializers.ModelSerializer):
 
 # Serializer for expenses
 class ExpenseSerializer(serializers.ModelSerializer):
-    amount = serializers.DecimalField(max_digits=10, decimal_places=2)
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0.01'))
     group_details = GroupExpenseDetailSerializer(many=True, required=False)
 
     class Meta:
@@ -35,8 +44,8 @@ class ExpenseSerializer(serializers.ModelSerializer):
         fields = ['id', 'date', 'name', 'amount', 'note', 'expense_type', 'split_type', 'total_friends', 'include_self', 'group_details']
 
     def to_internal_value(self, data):
-        # include_self default value is true
-        if 'include_self' not in data:
+        # include_self default value is true, partial updates keep the stored value
+        if 'include_self' not in data and not (self.instance and self.partial):
             data['include_self'] = True
         return super().to_internal_value(data)
 
@@ -50,10 +59,16 @@ class ExpenseSerializer(serializers.ModelSerializer):
 
         if self.instance:
             expense_type = expense_type or self.instance.expense_type
+            total_amount = total_amount if total_amount is not None else self.instance.amount
             split_type = split_type or self.instance.split_type
             total_friends = total_friends or self.instance.total_friends
             include_self = include_self if include_self is not None else self.instance.include_self
 
+        # Edits that leave the split untouched do not need the group details again
+        split_fields = ('amount', 'expense_type', 'split_type', 'total_friends', 'include_self', 'group_details')
+        if self.instance and self.partial and not any(field in self.initial_data for field in split_fields):
+            return data
+
         # Checking group expense details
         if expense_type == 'Group':
             if not group_details:
@@ -70,22 +85,11 @@ class ExpenseSerializer(serializers.ModelSerializer):
                     f"Number of friends provided ({len(group_details)}) does not match the expected count ({expected_group_details_count})."
                 )
             
-            if split_type == 'Equal':
-                equal_share = total_amount / total_friends
-                for detail in group_details:
-                    detail['amount'] = equal_share
-            elif split_type == 'Exact':
-                for detail in group_details:
-                    if 'amount' not in detail or detail['amount'] is None:
-                        raise serializers.ValidationError("Amount is required for 'Exact' split type.")
-            elif split_type == 'Percentage':
-                total_percentage = sum(detail.get('amount', 0) for detail in group_details)
-                if include_self:
-                    if total_percentage >= 100:
-                        raise serializers.ValidationError("Total percentage exceeds 100% when including self.")
-                else:
-                    if abs(total_percentage - 100) > 0.01:  
-                        raise serializers.ValidationError("Total percentage must equal 100% when not including self.")
+            # The split engine checks the amounts and percentages for every split type
+            try:
+                compute_shares(total_amount, split_type, [detail.get('amount') for detail in group_details], include_self)
+            except SplitError as e:
+                raise serializers.ValidationError(str(e))
 
             self.validate_group_details(group_details)
         else:
@@ -101,6 +105,9 @@ class ExpenseSerializer(serializers.ModelSerializer):
         seen_emails = set()
         unregistered_usernames = []
 
+        # Resolving every username of the expense with one lookup
+        registered_users = lookup_users(detail.get('username') for detail in group_details)
+
         for detail in group_details:
             username = detail.get('username')
             email = detail.get('email')
@@ -110,7 +117,7 @@ class ExpenseSerializer(serializers.ModelSerializer):
                     errors.append(f"Duplicate entry found for username '{username}'.")
                 else:
                     seen_usernames.add(username)
-                    if not CustomUser.objects.filter(username=username).exists():
+                    if username not in registered_users:
                         unregistered_usernames.append(username)
                         detail['username'] = None  
                         errors.append(f"Username '{username}' is not registered. Please enter an email address instead.")
@@ -132,112 +139,89 @@ class ExpenseSerializer(serializers.ModelSerializer):
         expense = Expense.objects.create(**validated_data)
         return expense
 
-    def to_representation(self, instance):
-        representation = super().to_representation(instance)
-        if instance.expense_type == 'Group':
-            representation['group_details'] = GroupExpenseDetailSerializer(
-                instance.group_details.all(), many=True
-            ).data
-        return representation
-    
     def update(self, instance, validated_data):
         group_details_data = validated_data.pop('group_details', None)
+
+        changes = ExpenseChangeSet(instance.user)
+        details = list(instance.group_details.all())
+        changes.record_before(instance, details)
         
         # Update the expense instance
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
-        instance.save()
 
-        # Handle group details if provided and if it's a group expense
+        # Computing the new shares before anything is written
+        split = None
         if group_details_data is not None and instance.expense_type == 'Group':
-            # Delete existing group details
-            instance.group_details.all().delete()
-            
-            total_amount = Decimal(instance.amount)
-            total_participants = instance.total_friends + (1 if instance.include_self else 0)
-
-            if instance.split_type == 'Equal':
-                equal_share = total_amount / total_participants
-                for detail_data in group_details_data:
-                    GroupExpenseDetail.objects.create(
-                        expense=instance,
-                        name=detail_data['name'],
-                        username=detail_data.get('username'),
-                        email=detail_data.get('email'),
-                        amount=equal_share,
-                        note=detail_data.get('note', ''),
-                        is_paid=detail_data.get('is_paid', False)
-                    )
-                if instance.include_self:
-                    GroupExpenseDetail.objects.create(
-                        expense=instance,
-                        name=instance.user.get_full_name() or instance.user.username,
-                        username=instance.user.username,
-                        email=instance.user.email,
-                        amount=equal_share,
-                        note='Owner\'s share',
-                        is_paid=True
-                    )
-
-            elif instance.split_type == 'Exact':
-                total_friends_amount = sum(Decimal(detail['amount']) for detail in group_details_data)
-                for detail_data in group_details_data:
-                    GroupExpenseDetail.objects.create(
-                        expense=instance,
-                        name=detail_data['name'],
-                        username=detail_data.get('username'),
-                        email=detail_data.get('email'),
-                        amount=detail_data['amount'],
-                        note=detail_data.get('note', ''),
-                        is_paid=detail_data.get('is_paid', False)
-                    )
-                if instance.include_self:
-                    owner_amount = total_amount - total_friends_amount
-                    GroupExpenseDetail.objects.create(
-                        expense=instance,
-                        name=instance.user.get_full_name() or instance.user.username,
-                        username=instance.user.username,
-                        email=instance.user.email,
-                        amount=owner_amount,
-                        note='Owner\'s share',
-                        is_paid=True
-                    )
-                else:
-                    if total_friends_amount != total_amount:
-                        raise serializers.ValidationError("Total of friends' amounts must equal the total expense amount when not including self.")
-
-            elif instance.split_type == 'Percentage':
-                total_percentage = sum(Decimal(detail['amount']) for detail in group_details_data)
-                for detail_data in group_details_data:
-                    percentage = Decimal(detail_data['amount'])
-                    amount = (percentage / 100) * total_amount
-                    GroupExpenseDetail.objects.create(
-                        expense=instance,
-                        name=detail_data['name'],
-                        username=detail_data.get('username'),
-                        email=detail_data.get('email'),
-                        amount=amount,
-                        note=detail_data.get('note', ''),
-                        is_paid=detail_data.get('is_paid', False)
-                    )
-                if instance.include_self:
-                    owner_percentage = 100 - total_percentage
-                    owner_amount = (owner_percentage / 100) * total_amount
-                    GroupExpenseDetail.objects.create(
-                        expense=instance,
-                        name=instance.user.get_full_name() or instance.user.username,
-                        username=instance.user.username,
-                        email=instance.user.email,
-                        amount=owner_amount,
-                        note='Owner\'s share',
-                        is_paid=True
-                    )
-                else:
-                    if total_percentage != 100:
-                        raise serializers.ValidationError("Total percentage must equal 100% when not including self.")
+            try:
+                split = split_group_expense(instance, group_details_data)
+            except SplitError as e:
+                raise serializers.ValidationError(str(e))
+
+        with transaction.atomic():
+            instance.save()
+
+            # Handle group details if provided and if it's a group expense
+            if split is not None:
+                details = self.reconcile_group_details(instance, group_details_data, split)
+
+            changes.record_after(instance, details)
+            changes.send()
 
         return instance
 
+    # Applying only the differences between the stored and the incoming group details,
+    # matched by username or email, so unchanged members keep their rows and is_paid state
+    def reconcile_group_details(self, instance, group_details_data, split):
+        existing = list(instance.group_details.all())
+        by_username = {detail.username: detail for detail in existing if detail.username}
+        by_email = {detail.email: detail for detail in existing if detail.email}
+
+        desired = resolve_participants(build_group_details(instance, group_details_data, split))
+        # The owner's row has no incoming data and always keeps its paid state
+        incoming = list(group_details_data) + [None] * (len(desired) - len(group_details_data))
+
+        matched_ids = set()
+        to_create = []
+        to_update = []
+        updated_fields = set()
+
+        for detail, detail_data in zip(desired, incoming):
+            current = by_username.get(detail.username) if detail.username else None
+            if current is None and detail.email:
+                current = by_email.get(detail.email)
+            if current is None or current.id in matched_ids:
+                to_create.append(detail)
+                continue
+
+            matched_ids.add(current.id)
+            fields = ['name', 'username', 'email', 'amount', 'note', 'participant_id']
+            if detail_data is not None and 'is_paid' in detail_data:
+                fields.append('is_paid')
+
+            changed = [field for field in fields if getattr(current, field) != getattr(detail, field)]
+            if changed:
+                for field in changed:
+                    setattr(current, field, getattr(detail, field))
+                updated_fields.update(changed)
+                to_update.append(current)
+
+        kept = [detail for detail in existing if detail.id in matched_ids]
+        to_delete = [detail.id for detail in existing if detail.id not in matched_ids]
+
+        if to_delete:
+            GroupExpenseDetail.objects.filter(id__in=to_delete).soft_delete()
+        if to_update:
+            # bulk_update skips auto_now
+            now = timezone.now()
+            for detail in to_update:
+                detail.updated_at = now
+            GroupExpenseDetail.objects.bulk_update(to_update, sorted(updated_fields | {'updated_at'}))
+        if to_create:
+            GroupExpenseDetail.objects.bulk_create(to_create)
+
+        return kept + to_create
+
 # Serializer for updating group expense
 class UpdateGroupExpenseDetailSerializer(serializers.ModelSerializer):
     class Meta:
@@ -257,51 +241,45 @@ class UpdateGroupExpenseDetailSerializer(serializers.ModelSerializer):
         return data
 
 # Getting expense portfolio summary
-class ExpensePortfolioSummaryView(APIView):
+class ExpensePortfolioSummaryView(DataVersionETagMixin, APIView):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user = request.user
-        
-        # Get all expenses for the user
-        expenses = Expense.objects.filter(user=user)
-        personal_expense_count = expenses.filter(expense_type='Personal').count()
-        group_expense_count = expenses.filter(expense_type='Group').count()
-        personal_expense_sum = expenses.filter(expense_type='Personal').aggregate(Sum('amount'))['amount__sum'] or 0
-        group_expenses = expenses.filter(expense_type='Group')
-        group_expense_details = GroupExpenseDetail.objects.filter(expense__in=group_expenses)
-        
-        # Payments received and pending
-        payments_received = group_expense_details.filter(is_paid=True).aggregate(Sum('amount'))['amount__sum'] or 0
-        payments_pending = group_expense_details.filter(is_paid=False).aggregate(Sum('amount'))['amount__sum'] or 0
-        
-        # Counting paid and unpaid expenses
-        paid_count = group_expense_details.filter(is_paid=True).count()
-        unpaid_count = group_expense_details.filter(is_paid=False).count()
-        
-        # Total spend on group expense (excluding owner's share)
-        group_expense_spend = group_expenses.aggregate(Sum('amount'))['amount__sum'] or 0
-        owner_share = group_expense_details.filter(username=user.username).aggregate(Sum('amount'))['amount__sum'] or 0
-        total_group_spend = group_expense_spend - owner_share
-        
-        # Summary data
-        summary = {
-            'personal_expense_count': personal_expense_count,
-            'group_expense_count': group_expense_count,
-            'personal_expense_sum': personal_expense_sum,
-            'group_expense_summary': {
-                'payments_received': payments_received,
-                'payments_pending': payments_pending,
-                'paid_count': paid_count,
-                'unpaid_count': unpaid_count,
-                'total_spend(Group Expense - My Expense)': total_group_spend,
-            },
-            'total_expense_sum': personal_expense_sum + group_expense_spend,
-        }
+        params = request.query_params
+        date_from = self.parse_date(params, 'from')
+        date_to = self.parse_date(params, 'to')
+        group_by = params.get('group_by')
+        if group_by and group_by not in GROUPINGS:
+            raise serializers.ValidationError({'group_by': f"group_by must be one of {', '.join(GROUPINGS)}."})
+
+        # Lifetime figures are a single row read of the incrementally maintained summary
+        if not (date_from or date_to or group_by):
+            return Response(format_summary(get_user_summary(request.user)), status=status.HTTP_200_OK)
+
+        # Date windows and time series are computed in one pass with conditional aggregation
+        periods = expense_totals(request.user, date_from, date_to, group_by)
+        summary = format_summary(combine_totals(periods.values()))
+        summary['from'] = date_from
+        summary['to'] = date_to
+        if group_by:
+            summary['group_by'] = group_by
+            summary['series'] = [
+                {'period': period, **format_summary(totals)}
+                for period, totals in periods.items()
+            ]
         
         return Response(summary, status=status.HTTP_200_OK)
 
+    def parse_date(self, params, name):
+        value = params.get(name)
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise serializers.ValidationError({name: "Date has wrong format. Use YYYY-MM-DD."})
+
 # Serializer for unpaid expense
 class UnpaidExpenseSerializer(serializers.ModelSerializer):
     expense_name = serializers.CharField(source='expense.name')
@@ -309,4 +287,27 @@ class UnpaidExpenseSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = GroupExpenseDetail
-        fields = ['id', 'name', 'username', 'email', 'amount', 'note', 'expense_name', 'expense_note']
\ No newline at end of file
+        fields = ['id', 'name', 'username', 'email', 'amount', 'note', 'expense_name', 'expense_note']
+
+# Serializer for what the user owes on other people's group expenses
+class MyDebtSerializer(serializers.ModelSerializer):
+    expense_id = serializers.IntegerField(source='expense.id')
+    expense_name = serializers.CharField(source='expense.name')
+    expense_date = serializers.DateField(source='expense.date')
+    expense_note = serializers.CharField(source='expense.note')
+    owed_to = serializers.CharField(source='expense.user.username')
+    owed_to_email = serializers.EmailField(source='expense.user.email')
+
+    class Meta:
+        model = GroupExpenseDetail
+        fields = ['id', 'name', 'amount', 'note', 'expense_id', 'expense_name', 'expense_date', 'expense_note', 'owed_to', 'owed_to_email']
+
+class ExpenseEventSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ExpenseEvent
+        fields = ['id', 'expense_id', 'detail_id', 'event_type', 'data', 'created_at']
+
+# Expense as sent to sync clients, with the change time they can show or compare
+class SyncExpenseSerializer(ExpenseSerializer):
+    class Meta(ExpenseSerializer.Meta):
+        fields = ExpenseSerializer.Meta.fields + ['updated_at']
@@ -0,0 +1,71 @@
+from decimal import Decimal
+from django.db.models import F, Q, Sum
+from .models import GroupExpenseDetail
+
+CENT = Decimal('0.01')
+
+
+def participant_key(username, email):
+    return username or email
+
+
+def net_balances(user):
+    """Net balance in cents of everyone sharing unpaid group expenses with user.
+
+    Positive balances are owed money, negative balances owe money. All unpaid
+    details involving the user are summed in a single grouped query, so every
+    balance other than the user's own is only what that person and the user
+    owe each other.
+    """
+    involving_user = Q(expense__user=user) | Q(username=user.username) | Q(email=user.email)
+    rows = (
+        GroupExpenseDetail.objects.filter(involving_user, is_paid=False, expense__expense_type='Group')
+        # The owner's own share is not a debt
+        .exclude(username=F('expense__user__username'))
+        .values('expense__user__username', 'username', 'email')
+        .annotate(total=Sum('amount'))
+        .order_by()
+    )
+
+    balances = {}
+    for row in rows:
+        # Quantized first: SQLite sums decimals as floats, so a total can land just below the cent
+        cents = int(row['total'].quantize(CENT) / CENT)
+        creditor = row['expense__user__username']
+        debtor = participant_key(row['username'], row['email'])
+        # Shares the user was added to by email belong to the same balance
+        if row['username'] == user.username or row['email'] == user.email:
+            debtor = user.username
+        if debtor == creditor:
+            continue
+        balances[creditor] = balances.get(creditor, 0) + cents
+        balances[debtor] = balances.get(debtor, 0) - cents
+    return balances
+
+
+# Each person settles directly with the requester, one transfer per person
+def requester_transfers(balances, requester):
+    transfers = []
+    for name, cents in sorted(balances.items()):
+        if name == requester:
+            continue
+        if cents < 0:
+            transfers.append((name, requester, -cents))
+        else:
+            transfers.append((requester, name, cents))
+    return transfers
+
+
+def simplify_debts(balances, requester):
+    """Transfers that bring every balance to zero, each one to or from requester.
+
+    Balances from net_balances only hold what each person and the requester
+    owe each other, so a transfer between two other people would move money
+    they do not owe one another. One transfer per person is then the fewest
+    possible.
+    """
+    nonzero = {name: cents for name, cents in balances.items() if cents}
+    return [
+        {'from': debtor, 'to': creditor, 'amount': Decimal(cents) * CENT}
+        for debtor, creditor, cents in requester_transfers(nonzero, requester)
+    ]
@@ -0,0 +1,50 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from UserManagement_app.models import CustomUser
+from UserManagement_app.versioning import bump_data_versions
+from .changes import ExpenseChangeSet, expenses_changed
+from . import ledger
+from .events import record_events
+from .models import GroupExpenseDetail
+from .search import register_search_terms
+from .summaries import apply_delta, changes_delta
+
+
+@receiver(expenses_changed, sender=ExpenseChangeSet)
+def update_expense_summary(sender, changes, **kwargs):
+    apply_delta(changes.user, changes_delta(changes))
+
+
+@receiver(expenses_changed, sender=ExpenseChangeSet)
+def update_pair_balances(sender, changes, **kwargs):
+    ledger.apply_delta(changes.user, ledger.changes_delta(changes))
+
+
+@receiver(expenses_changed, sender=ExpenseChangeSet)
+def append_expense_events(sender, changes, **kwargs):
+    record_events(changes)
+
+
+# Owner and every registered participant see the change in their read endpoints
+@receiver(expenses_changed, sender=ExpenseChangeSet)
+def bump_expense_data_versions(sender, changes, **kwargs):
+    user_ids = {changes.user.id}
+    for side in (changes.before, changes.after):
+        for entry in side.values():
+            user_ids.update(detail['participant_id'] for detail in entry['details'].values())
+    bump_data_versions(user_ids)
+
+
+# Group details added by email before the person registered now point at them
+@receiver(post_save, sender=CustomUser)
+def link_participant(sender, instance, created, **kwargs):
+    if created and instance.email:
+        GroupExpenseDetail.objects.filter(participant__isnull=True, username__isnull=True, email=instance.email).update(participant=instance)
+
+
+# The search index triggers call a Python function on SQLite
+@receiver(connection_created)
+def register_search_functions(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        register_search_terms(connection.connection)
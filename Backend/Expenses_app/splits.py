@@ -0,0 +1,141 @@
+import math
+from collections import namedtuple
+from decimal import Decimal
+from .models import GroupExpenseDetail
+
+CENT = Decimal('0.01')
+
+# Shares of one group expense, owner_share is None when the owner is not included
+Split = namedtuple('Split', ['friend_shares', 'owner_share'])
+
+
+class SplitError(ValueError):
+    pass
+
+
+# Splitting a 2 decimal total in proportion to the weights with largest remainder
+# rounding, so the shares always add up to the total exactly
+def allocate(total, weights):
+    weight_sum = sum(weights)
+    if weight_sum <= 0:
+        raise SplitError("Shares cannot be calculated without any participants.")
+
+    total_cents = int(Decimal(total).quantize(CENT) / CENT)
+    exact_cents = [total_cents * Decimal(weight) / weight_sum for weight in weights]
+    # Flooring (not truncating towards zero) so a negative total also only leaves cents to hand out
+    cents = [math.floor(value) for value in exact_cents]
+
+    # Handing out the cents lost to flooring, largest fractional part first
+    leftover = total_cents - sum(cents)
+    by_remainder = sorted(range(len(cents)), key=lambda i: (cents[i] - exact_cents[i], i))
+    for i in by_remainder[:leftover]:
+        cents[i] += 1
+
+    return [Decimal(value) * CENT for value in cents]
+
+
+def compute_shares(amount, split_type, values, include_self):
+    """Computes each friend's share and the owner's share of a group expense.
+
+    values holds each friend's amount for 'Exact' and percentage for
+    'Percentage', and is ignored for 'Equal'.
+    """
+    amount = Decimal(amount).quantize(CENT)
+    if amount <= 0:
+        raise SplitError("Amount must be greater than zero.")
+    friend_count = len(values)
+
+    if split_type == 'Equal':
+        weights = [1] * (friend_count + (1 if include_self else 0))
+        shares = allocate(amount, weights)
+
+    elif split_type == 'Exact':
+        if any(value is None for value in values):
+            raise SplitError("Amount is required for 'Exact' split type.")
+        friend_shares = [Decimal(value).quantize(CENT) for value in values]
+        if any(share < 0 for share in friend_shares):
+            raise SplitError("Amounts cannot be negative.")
+
+        friends_total = sum(friend_shares, Decimal('0.00'))
+        if include_self:
+            if friends_total > amount:
+                raise SplitError(
+                    f"The sum of amounts ({friends_total}) exceeds the total expense amount ({amount})"
+                )
+            return Split(friend_shares, amount - friends_total)
+        if friends_total != amount:
+            raise SplitError(
+                f"The sum of amounts ({friends_total}) does not match the total expense amount ({amount})"
+            )
+        return Split(friend_shares, None)
+
+    elif split_type == 'Percentage':
+        if any(value is None for value in values):
+            raise SplitError("Amount is required for 'Percentage' split type.")
+        weights = [Decimal(value) for value in values]
+        if any(weight < 0 for weight in weights):
+            raise SplitError("Percentages cannot be negative.")
+
+        total_percentage = sum(weights, Decimal('0'))
+        if include_self:
+            if total_percentage >= 100:
+                raise SplitError("Total percentage exceeds 100% when including self.")
+            weights.append(100 - total_percentage)
+        elif abs(total_percentage - 100) > Decimal('0.01'):
+            raise SplitError("Total percentage must equal 100% when not including self.")
+        shares = allocate(amount, weights)
+
+    else:
+        raise SplitError(f"Unknown split type '{split_type}'.")
+
+    if include_self:
+        return Split(shares[:friend_count], shares[friend_count])
+    return Split(shares, None)
+
+
+def compute_batch_shares(items):
+    """Computes the shares of many expenses in one call.
+
+    items is an iterable of (amount, split_type, values, include_self) tuples.
+    Each result is either a Split or the SplitError raised for that item, so
+    one bad expense does not stop the rest of the batch.
+    """
+    results = []
+    for amount, split_type, values, include_self in items:
+        try:
+            results.append(compute_shares(amount, split_type, values, include_self))
+        except SplitError as e:
+            results.append(e)
+    return results
+
+
+def split_group_expense(expense, group_details_data):
+    values = [detail.get('amount') for detail in group_details_data]
+    return compute_shares(expense.amount, expense.split_type, values, expense.include_self)
+
+
+# Building the unsaved group expense details of an expense from its computed split
+def build_group_details(expense, group_details_data, split):
+    details = []
+    for detail_data, share in zip(group_details_data, split.friend_shares):
+        details.append(GroupExpenseDetail(
+            expense=expense,
+            name=detail_data['name'],
+            username=detail_data.get('username'),
+            email=detail_data.get('email'),
+            amount=share,
+            note=detail_data.get('note', ''),
+            is_paid=detail_data.get('is_paid', False)
+        ))
+
+    if split.owner_share is not None:
+        details.append(GroupExpenseDetail(
+            expense=expense,
+            name=expense.user.get_full_name() or expense.user.username,
+            username=expense.user.username,
+            email=expense.user.email,
+            amount=split.owner_share,
+            note='Owner\'s share',
+            is_paid=True
+        ))
+    return details
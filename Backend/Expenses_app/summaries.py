@@ -0,0 +1,116 @@
+from collections import defaultdict
+from django.db.models import F
+from .aggregations import SUMMARY_FIELDS, combine_totals, empty_totals, expense_totals
+from .models import UserExpenseSummary, UserMonthlyExpenseSummary
+
+
+# What one expense snapshot and its group detail snapshots add to the summary
+def add_contribution(totals, expense, details, owner_username, sign):
+    if expense['expense_type'] == 'Personal':
+        totals['personal_expense_count'] += sign
+        totals['personal_expense_sum'] += sign * expense['amount']
+    elif expense['expense_type'] == 'Group':
+        totals['group_expense_count'] += sign
+        totals['group_expense_sum'] += sign * expense['amount']
+        for detail in details:
+            if detail['is_paid']:
+                totals['payments_received'] += sign * detail['amount']
+                totals['paid_count'] += sign
+            else:
+                totals['payments_pending'] += sign * detail['amount']
+                totals['unpaid_count'] += sign
+            if detail['username'] == owner_username:
+                totals['owner_share'] += sign * detail['amount']
+
+
+def month_of(value):
+    return value.replace(day=1)
+
+
+# Summary changes per month caused by one ExpenseChangeSet
+def changes_delta(changes):
+    delta = defaultdict(empty_totals)
+    owner_username = changes.user.username
+
+    for side, sign in ((changes.before, -1), (changes.after, 1)):
+        for entry in side.values():
+            expense = entry['expense']
+            details = entry['details'].values()
+            totals = delta[month_of(expense['date'])]
+            add_contribution(totals, expense, details, owner_username, sign)
+
+    return {month: totals for month, totals in delta.items() if any(totals.values())}
+
+
+def apply_delta(user, delta):
+    if not delta:
+        return
+
+    # Summaries that were never built are built from the current rows instead,
+    # which already include this write
+    if not UserExpenseSummary.objects.filter(user=user).exists():
+        rebuild_user_summary(user)
+        return
+
+    for month, totals in sorted(delta.items()):
+        UserMonthlyExpenseSummary.objects.get_or_create(user=user, month=month)
+        UserMonthlyExpenseSummary.objects.filter(user=user, month=month).update(
+            **{field: F(field) + value for field, value in totals.items() if value}
+        )
+
+    # Moving an expense between months leaves the overall totals unchanged
+    overall = combine_totals(delta.values())
+    changed = {field: F(field) + value for field, value in overall.items() if value}
+    if changed:
+        UserExpenseSummary.objects.filter(user=user).update(**changed)
+
+
+def compute_monthly_totals(user):
+    return expense_totals(user, group_by='month')
+
+
+def rebuild_user_summary(user):
+    months = compute_monthly_totals(user)
+    overall = combine_totals(months.values())
+
+    UserExpenseSummary.objects.update_or_create(user=user, defaults=overall)
+    UserMonthlyExpenseSummary.objects.filter(user=user).exclude(month__in=months.keys()).delete()
+    for month, totals in months.items():
+        UserMonthlyExpenseSummary.objects.update_or_create(user=user, month=month, defaults=totals)
+    return overall
+
+
+# Differences between the stored summary rows and freshly computed figures
+def summary_drift(user):
+    stored = UserExpenseSummary.objects.filter(user=user).values(*SUMMARY_FIELDS).first()
+    if stored is None:
+        # Not built yet, it is computed on the first read or write
+        return {}
+
+    months = compute_monthly_totals(user)
+    drift = {}
+
+    overall = combine_totals(months.values())
+    differences = {field: (stored[field], overall[field]) for field in SUMMARY_FIELDS if stored[field] != overall[field]}
+    if differences:
+        drift['total'] = differences
+
+    stored_months = {
+        row.pop('month'): row
+        for row in UserMonthlyExpenseSummary.objects.filter(user=user).values('month', *SUMMARY_FIELDS)
+    }
+    for month in months.keys() | stored_months.keys():
+        expected = months.get(month, empty_totals())
+        actual = stored_months.get(month, empty_totals())
+        differences = {field: (actual[field], expected[field]) for field in SUMMARY_FIELDS if actual[field] != expected[field]}
+        if differences:
+            drift[month.strftime('%Y-%m')] = differences
+
+    return drift
+
+
+def get_user_summary(user):
+    summary = UserExpenseSummary.objects.filter(user=user).values(*SUMMARY_FIELDS).first()
+    if summary is None:
+        summary = rebuild_user_summary(user)
+    return summary
@@ -0,0 +1,81 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core import signing
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import Expense, GroupExpenseDetail
+
+CURSOR_SALT = 'Expenses_app.sync'
+
+# Rows this recent may still have concurrent transactions committing before them,
+# so they are left for the next sync instead of being skipped past
+SETTLE_DELAY = timedelta(seconds=2)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+# The tombstones after this cursor may have been purged, the client has to sync from scratch
+class CursorExpired(InvalidCursor):
+    pass
+
+
+# Position after the last synced row, signed so clients treat it as opaque. The
+# cursor also carries when the client last had a complete copy: when a sync read
+# every page, or when it started from scratch. Any tombstone the client still
+# needs was written after that
+def encode_cursor(updated_at, expense_id, synced_at):
+    return signing.dumps(
+        {'t': updated_at.isoformat(), 'id': expense_id, 's': synced_at.isoformat()},
+        salt=CURSOR_SALT,
+        compress=True,
+    )
+
+
+def decode_cursor(cursor):
+    try:
+        position = signing.loads(cursor, salt=CURSOR_SALT)
+        updated_at = parse_datetime(position['t'])
+        expense_id = int(position['id'])
+        synced_at = parse_datetime(position.get('s', position['t']))
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        raise InvalidCursor("Invalid sync cursor.")
+    if updated_at is None or synced_at is None:
+        raise InvalidCursor("Invalid sync cursor.")
+    return updated_at, expense_id, synced_at
+
+
+def changed_expenses(user, cursor=None, limit=200):
+    """Expenses of user changed or deleted after the cursor, oldest change first.
+
+    Served by the (user, updated_at, id) index. Returns (changed, deleted_ids,
+    next_cursor, has_more); changed expenses come with their current group details.
+    """
+    cutoff = timezone.now() - SETTLE_DELAY
+    queryset = Expense.all_objects.filter(user=user, updated_at__lte=cutoff)
+    if cursor:
+        updated_at, expense_id, synced_at = decode_cursor(cursor)
+        # Tombstones written since synced_at are kept for the retention period
+        if synced_at < timezone.now() - settings.EXPENSE_TOMBSTONE_RETENTION:
+            raise CursorExpired("Sync cursor is too old, sync again without a cursor.")
+        queryset = queryset.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=expense_id))
+    else:
+        updated_at, expense_id, synced_at = None, 0, cutoff
+
+    rows = list(
+        queryset.order_by('updated_at', 'id')
+        .prefetch_related(Prefetch('group_details', queryset=GroupExpenseDetail.objects.order_by('id')))[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    changed = [expense for expense in rows if expense.deleted_at is None]
+    deleted_ids = [expense.id for expense in rows if expense.deleted_at is not None]
+    if rows:
+        updated_at, expense_id = rows[-1].updated_at, rows[-1].id
+    elif updated_at is None:
+        updated_at = cutoff
+    next_cursor = encode_cursor(updated_at, expense_id, synced_at if has_more else cutoff)
+    return changed, deleted_ids, next_cursor, has_more
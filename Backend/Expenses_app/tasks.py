@@ -0,0 +1,84 @@
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, OuterRef, Subquery
+from django.utils import timezone
+from django_celery_beat.models import PeriodicTask
+from Notification_app.models import ExpenseNotification, reminder_task_names
+from UserManagement_app.models import CustomUser
+from .events import take_snapshot
+from .models import Expense, ExpenseEvent, ExpenseSnapshot, GroupExpenseDetail
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Snapshots every user with events after their latest snapshot, so replays stay short
+@shared_task
+def snapshot_expense_states():
+    latest_snapshot = (
+        ExpenseSnapshot.objects.filter(user=OuterRef('user'))
+        .order_by('-last_event_id')
+        .values('last_event_id')[:1]
+    )
+    rows = (
+        ExpenseEvent.objects.values('user')
+        .annotate(last_event_id=Max('id'), snapshot_event_id=Subquery(latest_snapshot))
+        .order_by()
+    )
+    user_ids = [
+        row['user'] for row in rows
+        if row['snapshot_event_id'] is None or row['snapshot_event_id'] < row['last_event_id']
+    ]
+
+    for user in CustomUser.objects.filter(id__in=user_ids).iterator():
+        take_snapshot(user)
+
+    logger.info(f"Took {len(user_ids)} expense snapshots")
+    return len(user_ids)
+
+
+# A single DELETE ... WHERE, without loading the rows or running the ORM cascade
+def raw_delete(queryset):
+    return queryset._raw_delete(queryset.db)
+
+
+def purge_expense_batch(expense_ids):
+    with transaction.atomic():
+        # Children first, the foreign keys are not cascaded by the database
+        raw_delete(ExpenseNotification.objects.filter(expense_id__in=expense_ids))
+        raw_delete(GroupExpenseDetail.all_objects.filter(expense_id__in=expense_ids))
+        raw_delete(Expense.all_objects.filter(id__in=expense_ids))
+        # Through the ORM so django_celery_beat notices the schedule change
+        PeriodicTask.objects.filter(name__in=reminder_task_names(expense_ids)).delete()
+
+
+# Hard-deletes expenses and group details soft-deleted longer ago than the tombstone
+# retention, batch_size rows per transaction and at most max_batches batches per run
+@shared_task
+def purge_deleted_expenses(batch_size=500, max_batches=100):
+    cutoff = timezone.now() - settings.EXPENSE_TOMBSTONE_RETENTION
+    purged_expenses = 0
+    purged_details = 0
+
+    for _ in range(max_batches):
+        expense_ids = list(
+            Expense.all_objects.filter(deleted_at__lt=cutoff).order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not expense_ids:
+            break
+        purge_expense_batch(expense_ids)
+        purged_expenses += len(expense_ids)
+
+    # Group details deleted from expenses that still exist
+    for _ in range(max_batches):
+        detail_ids = list(
+            GroupExpenseDetail.all_objects.filter(deleted_at__lt=cutoff).order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not detail_ids:
+            break
+        raw_delete(GroupExpenseDetail.all_objects.filter(id__in=detail_ids))
+        purged_details += len(detail_ids)
+
+    logger.info(f"Purged {purged_expenses} expenses and {purged_details} group details")
+    return {'expenses': purged_expenses, 'group_details': purged_details}
@@ -1,3 +1,691 @@
-from django.test import TestCase
+import csv
+import gc
+import io
+import random
+from datetime import time, timedelta
+from decimal import Decimal
+from unittest import mock
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django_celery_beat.models import PeriodicTask
+from Notification_app.models import ExpenseNotification
+from UserManagement_app.factories import client_for, make_user
+from .events import live_state, rebuild_state, state_content, state_totals, take_snapshot
+from .ledger import friend_balances, ledger_drift
+from .models import Expense, ExpenseEvent, GroupExpenseDetail
+from .search import rebuild_search_index
+from .settlements import simplify_debts
+from .summaries import get_user_summary, summary_drift
+from .splits import CENT, SplitError, allocate, compute_shares
+from .sync import encode_cursor
+from .tasks import purge_deleted_expenses
+from .views import ExpenseBatchCreateView
 
-# Create your tests here.
+
+def personal_expense(client, name='Lunch', amount='12.50', date='2024-01-02'):
+    response = client.post('/expenses/', {'date': date, 'name': name, 'amount': amount, 'expense_type': 'Personal'}, format='json')
+    return response.json()['id']
+
+
+class ExpenseSyncTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client = client_for(self.user)
+
+    def test_cursor_of_inactive_user_keeps_working(self):
+        personal_expense(self.client)
+        Expense.objects.update(updated_at=timezone.now() - timedelta(days=40))
+
+        first = self.client.get('/expenses/sync/').json()
+        self.assertEqual(len(first['changed']), 1)
+
+        response = self.client.get('/expenses/sync/', {'cursor': first['cursor']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['changed'], [])
+
+    def test_cursor_synced_before_retention_expires(self):
+        old = timezone.now() - timedelta(days=40)
+        response = self.client.get('/expenses/sync/', {'cursor': encode_cursor(old, 1, old)})
+        self.assertEqual(response.status_code, 410)
+        self.assertTrue(response.json()['reset'])
+
+    def test_paging_through_old_rows_from_scratch(self):
+        for name in ('Lunch', 'Dinner'):
+            personal_expense(self.client, name)
+        Expense.objects.update(updated_at=timezone.now() - timedelta(days=40))
+
+        first = self.client.get('/expenses/sync/', {'limit': 1}).json()
+        self.assertTrue(first['has_more'])
+        response = self.client.get('/expenses/sync/', {'cursor': first['cursor'], 'limit': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['changed']), 1)
+
+
+class ExpenseListQueryTests(TestCase):
+    def setUp(self):
+        self.client = client_for(make_user())
+
+    def add_group_expenses(self, count):
+        for number in range(count):
+            self.client.post('/expenses/', {
+                'date': '2024-01-02', 'name': f'Dinner {number}', 'amount': '90.00', 'expense_type': 'Group',
+                'split_type': 'Equal', 'total_friends': 2,
+                'group_details': [{'name': 'Carol', 'email': 'carol@example.com'}, {'name': 'Dave', 'email': 'dave@example.com'}],
+            }, format='json')
+
+    def test_query_count_does_not_grow_with_the_number_of_expenses(self):
+        for count, total in ((3, 3), (30, 33)):
+            self.add_group_expenses(count)
+            # One query for the page of expenses, one for all their group details
+            with self.assertNumQueries(2):
+                response = self.client.get('/expenses/', {'page_size': 100})
+            self.assertEqual(len(response.json()['results']), total)
+            self.assertTrue(all(len(expense['group_details']) == 3 for expense in response.json()['results']))
+
+
+class GroupDetailReconcileTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        make_user('bob')
+        self.client = client_for(self.user)
+
+    def group_expense(self, members):
+        return self.client.post('/expenses/', {
+            'date': '2024-01-02', 'name': 'Dinner', 'amount': '90.00', 'expense_type': 'Group',
+            'split_type': 'Equal', 'total_friends': len(members), 'group_details': members,
+        }, format='json').json()
+
+    def edit(self, expense_id, members, **fields):
+        response = self.client.patch('/update-expense/', {
+            'id': expense_id, 'total_friends': len(members), 'group_details': members, **fields,
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        return {detail['username'] or detail['email']: detail for detail in response.json()['group_details']}
+
+    def test_is_paid_survives_an_edit_that_does_not_send_it(self):
+        members = [{'name': 'Bob', 'username': 'bob'}, {'name': 'Carol', 'email': 'carol@example.com'}]
+        expense = self.group_expense(members)
+        carol = next(detail for detail in expense['group_details'] if detail['email'] == 'carol@example.com')
+        self.client.patch(f'/expenses/{expense["id"]}/update-payment/{carol["id"]}/', {'is_paid': True}, format='json')
+
+        details = self.edit(expense['id'], members, amount='120.00')
+        self.assertEqual(details['carol@example.com']['id'], carol['id'])
+        self.assertTrue(details['carol@example.com']['is_paid'])
+        self.assertEqual(details['carol@example.com']['amount'], '40.00')
+        self.assertFalse(details['bob']['is_paid'])
+
+        # Sent explicitly it is applied
+        details = self.edit(expense['id'], [members[0], {**members[1], 'is_paid': False}])
+        self.assertFalse(details['carol@example.com']['is_paid'])
+
+    def test_rows_are_matched_by_username_or_email(self):
+        members = [{'name': 'Bob', 'username': 'bob'}, {'name': 'Carol', 'email': 'carol@example.com'}]
+        expense = self.group_expense(members)
+        ids = {detail['username'] or detail['email']: detail['id'] for detail in expense['group_details']}
+
+        # Reordered and renamed, every member keeps their row
+        details = self.edit(expense['id'], [{'name': 'Caroline', 'email': 'carol@example.com'}, members[0]])
+        self.assertEqual({key: detail['id'] for key, detail in details.items()}, ids)
+        self.assertEqual(details['carol@example.com']['name'], 'Caroline')
+
+        # Replacing bob with dave keeps carol's and the owner's rows, bob's is soft-deleted
+        details = self.edit(expense['id'], [members[1], {'name': 'Dave', 'email': 'dave@example.com'}])
+        self.assertEqual(details['carol@example.com']['id'], ids['carol@example.com'])
+        self.assertEqual(details['alice']['id'], ids['alice'])
+        self.assertNotIn(details['dave@example.com']['id'], ids.values())
+        self.assertTrue(GroupExpenseDetail.all_objects.get(id=ids['bob']).deleted_at)
+        self.assertEqual(GroupExpenseDetail.objects.filter(expense_id=expense['id']).count(), 3)
+
+    def test_query_count_does_not_grow_with_the_number_of_members(self):
+        counts = []
+        for size in (2, 20):
+            members = [{'name': f'Friend {number}', 'email': f'friend{number}@example.com'} for number in range(size)]
+            expense = self.group_expense(members)
+            # Every share changes, one member leaves and one joins
+            members = members[1:] + [{'name': 'Newcomer', 'email': f'newcomer{size}@example.com'}]
+            with CaptureQueriesContext(connection) as queries:
+                self.edit(expense['id'], members, amount='150.00')
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+
+class ExpenseBatchCreateTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client = client_for(self.user)
+
+    def group_item(self, name, split_type='Equal', amounts=None):
+        details = [{'name': 'Carol', 'email': 'carol@example.com'}, {'name': 'Dave', 'email': 'dave@example.com'}]
+        if amounts:
+            details = [dict(detail, amount=amount) for detail, amount in zip(details, amounts)]
+        return {
+            'date': '2024-01-02', 'name': name, 'amount': '90.00', 'expense_type': 'Group',
+            'split_type': split_type, 'total_friends': 2, 'group_details': details,
+        }
+
+    def test_each_item_gets_its_own_result(self):
+        response = self.client.post('/expenses/batch/', {'expenses': [
+            {'date': '2024-01-02', 'name': 'Lunch', 'amount': '12.50', 'expense_type': 'Personal'},
+            {'date': '2024-01-02', 'amount': '12.50', 'expense_type': 'Personal'},
+            # Shares adding up to more than the amount
+            self.group_item('Taxi', 'Exact', ('60.00', '40.00')),
+            'Coffee',
+            self.group_item('Dinner'),
+        ]}, format='json')
+        self.assertEqual(response.status_code, 207)
+        body = response.json()
+        self.assertEqual((body['created_count'], body['failed_count']), (2, 3))
+        self.assertEqual([result['status'] for result in body['results']], [201, 400, 400, 400, 201])
+        self.assertIn('name', body['results'][1]['errors'])
+        self.assertEqual(body['results'][4]['data']['name'], 'Dinner')
+        self.assertEqual(len(body['results'][4]['data']['group_details']), 3)
+
+        # The item whose split failed wrote nothing, not even an expense without its details
+        self.assertEqual(sorted(Expense.objects.values_list('name', flat=True)), ['Dinner', 'Lunch'])
+        self.assertEqual(GroupExpenseDetail.objects.count(), 3)
+
+    def test_batches_over_the_size_limit_are_rejected(self):
+        item = {'date': '2024-01-02', 'name': 'Lunch', 'amount': '12.50', 'expense_type': 'Personal'}
+        with mock.patch.object(ExpenseBatchCreateView, 'max_batch_size', 3):
+            response = self.client.post('/expenses/batch/', {'expenses': [item] * 4}, format='json')
+            self.assertEqual(response.status_code, 400)
+            self.assertFalse(Expense.objects.exists())
+
+            self.assertEqual(self.client.post('/expenses/batch/', {'expenses': [item] * 3}, format='json').status_code, 201)
+        self.assertEqual(self.client.post('/expenses/batch/', {'expenses': []}, format='json').status_code, 400)
+
+    def test_a_failed_write_leaves_no_expense_without_its_details(self):
+        self.client.raise_request_exception = False
+        with mock.patch.object(GroupExpenseDetail.objects, 'bulk_create', side_effect=IntegrityError('constraint failed')):
+            response = self.client.post('/expenses/batch/', {'expenses': [self.group_item('Dinner'), self.group_item('Taxi')]}, format='json')
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(Expense.all_objects.exists())
+        self.assertFalse(ExpenseEvent.objects.exists())
+
+
+class ExpenseListPaginationTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client = client_for(self.user)
+
+    def add_expenses(self, dates):
+        Expense.objects.bulk_create([
+            Expense(user=self.user, date=date, name=f'Expense {number}', amount='10.00', expense_type='Personal')
+            for number, date in enumerate(dates)
+        ])
+
+    def walk(self, url, params=None, direction='next'):
+        pages = []
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            pages.append([expense['id'] for expense in response.json()['results']])
+            url, params = response.json()[direction], None
+        return pages
+
+    def test_pages_through_more_tied_dates_than_an_offset_allows(self):
+        self.add_expenses(['2024-01-01'] * 5 + ['2024-01-02'] * 1200 + ['2024-01-03'] * 5)
+        expected = list(Expense.objects.filter(user=self.user).order_by('-date', '-id').values_list('id', flat=True))
+
+        pages = self.walk('/expenses/', {'page_size': 100})
+        self.assertEqual(len(pages), 13)
+        self.assertEqual([expense_id for page in pages for expense_id in page], expected)
+
+        # Walking back from the last page gives the same pages in reverse
+        last = self.client.get('/expenses/', {'page_size': 100})
+        for _ in range(12):
+            last = self.client.get(last.json()['next'])
+        self.assertEqual(self.walk(last.json()['previous'], direction='previous'), pages[-2::-1])
+
+    def test_first_page_has_no_previous_and_last_page_no_next(self):
+        self.add_expenses(['2024-01-02'] * 3)
+        first = self.client.get('/expenses/', {'page_size': 2}).json()
+        self.assertIsNone(first['previous'])
+        last = self.client.get(first['next']).json()
+        self.assertEqual(len(last['results']), 1)
+        self.assertIsNone(last['next'])
+        self.assertIsNotNone(last['previous'])
+
+    def test_invalid_cursor_is_not_found(self):
+        self.assertEqual(self.client.get('/expenses/', {'cursor': 'garbage'}).status_code, 404)
+
+
+class ExpenseListFilterTests(TestCase):
+    def setUp(self):
+        self.client = client_for(make_user())
+        self.lunch_id = personal_expense(self.client, name='Lunch', amount='12.50', date='2024-01-02')
+        self.taxi_id = personal_expense(self.client, name='Taxi', amount='30.00', date='2024-02-10')
+        self.dinner_id = self.client.post('/expenses/', {
+            'date': '2024-03-05', 'name': 'Dinner', 'amount': '90.00', 'expense_type': 'Group',
+            'split_type': 'Equal', 'total_friends': 2,
+            'group_details': [{'name': 'Carol', 'email': 'carol@example.com'}, {'name': 'Dave', 'email': 'dave@example.com'}],
+        }, format='json').json()['id']
+
+    def listed(self, **params):
+        response = self.client.get('/expenses/', params)
+        self.assertEqual(response.status_code, 200)
+        return sorted(expense['id'] for expense in response.json()['results'])
+
+    def test_each_filter(self):
+        self.assertEqual(self.listed(date_from='2024-02-01'), [self.taxi_id, self.dinner_id])
+        self.assertEqual(self.listed(date_to='2024-02-10'), [self.lunch_id, self.taxi_id])
+        self.assertEqual(self.listed(amount_min='30'), [self.taxi_id, self.dinner_id])
+        self.assertEqual(self.listed(amount_max='30.00'), [self.lunch_id, self.taxi_id])
+        self.assertEqual(self.listed(expense_type='Group'), [self.dinner_id])
+        self.assertEqual(self.listed(split_type='Equal'), [self.dinner_id])
+        self.assertEqual(self.listed(date_from='2024-01-01', amount_max='20', expense_type='Personal'), [self.lunch_id])
+
+    def test_invalid_filters_are_rejected(self):
+        for params in (
+            {'date_from': '02/01/2024'}, {'amount_min': 'ten'}, {'expense_type': 'Business'}, {'split_type': 'Shares'},
+            {'amount_min': 'NaN'}, {'amount_max': 'Infinity'}, {'amount_min': '-inf'}, {'amount_max': 'sNaN'},
+        ):
+            response = self.client.get('/expenses/', params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn(next(iter(params)), response.json())
+
+
+class ExpenseSearchTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.other = make_user('bob')
+        self.client = client_for(self.user)
+        self.lunch_id = personal_expense(self.client, name='Sushi lunch')
+        self.dinner_id = self.client.post('/expenses/', {
+            'date': '2024-01-03', 'name': 'Dinner', 'amount': '90.00', 'expense_type': 'Group',
+            'split_type': 'Equal', 'total_friends': 1,
+            'group_details': [{'name': 'Carol', 'email': 'carol@example.com', 'note': 'sushi'}],
+        }, format='json').json()['id']
+        personal_expense(client_for(self.other), name='Sushi lunch')
+
+    def search(self, query):
+        response = self.client.get('/expenses/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return sorted(expense['id'] for expense in response.json()['results'])
+
+    def test_only_the_users_own_expenses_match(self):
+        self.assertEqual(self.search('sush'), sorted([self.lunch_id, self.dinner_id]))
+        self.assertEqual(self.search('carol'), [self.dinner_id])
+        # Typing another user's indexed form of a word does not reach their rows
+        self.assertEqual(self.search(f'u{self.other.id}_sushi'), [])
+
+    def test_index_follows_writes_and_rebuilds(self):
+        Expense.objects.filter(id=self.lunch_id).update(name='Ramen lunch')
+        Expense.all_objects.filter(id=self.dinner_id).delete()
+        self.assertEqual(self.search('sushi'), [])
+        self.assertEqual(self.search('ramen'), [self.lunch_id])
+
+        self.assertTrue(rebuild_search_index())
+        self.assertEqual(self.search('ramen'), [self.lunch_id])
+        self.assertEqual(self.search('sushi'), [])
+
+    def test_pages_past_the_offset_cap_are_rejected(self):
+        response = self.client.get('/expenses/search/', {'q': 'sushi', 'page': 10 ** 30})
+        self.assertEqual(response.status_code, 400)
+
+        # The last page within the cap still answers, and does not point past it
+        response = self.client.get('/expenses/search/', {'q': 'sushi', 'page': 501, 'page_size': 20})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()['next_page'])
+        self.assertEqual(self.client.get('/expenses/search/', {'q': 'sushi', 'page': 502, 'page_size': 20}).status_code, 400)
+
+
+class ExpenseImportTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client = client_for(self.user)
+
+    def upload(self, content, **data):
+        csv_file = SimpleUploadedFile('statement.csv', content, content_type='text/csv')
+        return self.client.post('/expenses/import/', {'file': csv_file, **data}, format='multipart')
+
+    def test_non_finite_amounts_are_row_errors(self):
+        response = self.upload(b'date,name,amount\n2024-01-02,Lunch,NaN\n2024-01-03,Taxi,Infinity\n2024-01-04,Tea,2.00\n')
+        self.assertEqual(response.status_code, 201)
+        report = response.json()
+        self.assertEqual((report['imported'], report['failed']), (1, 2))
+        self.assertEqual([error['line'] for error in report['errors']], [2, 3])
+
+    def test_credits_are_skipped_unless_imported(self):
+        content = b'date,name,amount\n2024-01-02,Refund,-20.00\n2024-01-03,Taxi,8.00\n'
+        report = self.upload(content).json()
+        self.assertEqual((report['imported'], report['skipped']), (1, 1))
+
+        report = self.upload(content, import_credits='true').json()
+        self.assertEqual((report['imported'], report['skipped']), (2, 0))
+        self.assertTrue(Expense.objects.filter(name='Refund', amount='20.00').exists())
+
+    def test_decoding_error_reports_what_was_imported(self):
+        rows = ''.join(f'2024-01-02,Row {number},1.00\n' for number in range(3000)).encode()
+        content = b'date,name,amount\n' + rows + b'2024-01-03,\xff\xfe,1.00\n'
+
+        response = self.upload(content)
+        self.assertEqual(response.status_code, 400)
+        report = response.json()
+        self.assertIn('error', report)
+        self.assertEqual(report['imported'], Expense.objects.filter(user=self.user).count())
+        self.assertGreater(report['imported'], 0)
+
+    def test_amounts_too_large_to_round_are_row_errors(self):
+        response = self.upload(b'date,name,amount\n2024-01-02,Lunch,1e5000\n2024-01-03,Rent,100000000\n2024-01-04,Tea,2.00\n')
+        self.assertEqual(response.status_code, 201)
+        report = response.json()
+        self.assertEqual((report['imported'], report['failed']), (1, 2))
+        self.assertEqual([error['line'] for error in report['errors']], [2, 3])
+
+    def test_oversized_field_stops_the_import_with_a_report(self):
+        rows = ''.join(f'2024-01-02,Row {number},1.00\n' for number in range(1500)).encode()
+        oversized = b'2024-01-03,"' + b'x' * (csv.field_size_limit() + 1) + b'",1.00\n'
+
+        with mock.patch('sys.unraisablehook') as unraisable:
+            response = self.upload(b'date,name,amount\n' + rows + oversized)
+            gc.collect()
+        # The reader is closed while the upload is still open, nothing fails at collection
+        unraisable.assert_not_called()
+        self.assertEqual(response.status_code, 400)
+        report = response.json()
+        self.assertEqual(report['stopped_after_line'], 1501)
+        self.assertEqual(report['imported'], 1500)
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 1500)
+
+
+class ExpenseEventTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client = client_for(self.user)
+        response = self.client.post('/expenses/', {
+            'date': '2024-01-02', 'name': 'Dinner', 'amount': '90.00', 'expense_type': 'Group',
+            'split_type': 'Equal', 'total_friends': 2,
+            'group_details': [{'name': 'Carol', 'email': 'carol@example.com'}, {'name': 'Dave', 'email': 'dave@example.com'}],
+        }, format='json').json()
+        self.expense_id = response['id']
+        self.detail_id = response['group_details'][0]['id']
+
+    def new_event_types(self, write):
+        last_id = ExpenseEvent.objects.order_by('-id').values_list('id', flat=True).first()
+        write()
+        return list(ExpenseEvent.objects.filter(id__gt=last_id).order_by('id').values_list('event_type', flat=True))
+
+    def test_payment_toggle_is_logged_as_payment_changed(self):
+        events = self.new_event_types(lambda: self.client.patch(
+            f'/expenses/{self.expense_id}/update-payment/{self.detail_id}/', {'is_paid': True}, format='json',
+        ))
+        self.assertEqual(events, ['payment_changed'])
+
+    def test_bulk_payment_update_is_logged_as_payment_changed(self):
+        events = self.new_event_types(lambda: self.client.patch('/expenses/update-payments/', {
+            'updates': [{'expense_id': self.expense_id, 'detail_id': self.detail_id, 'is_paid': True}],
+        }, format='json'))
+        self.assertEqual(events, ['payment_changed'])
+
+
+class PurgeDeletedExpensesTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client = client_for(self.user)
+
+    def group_expense(self, name='Dinner'):
+        response = self.client.post('/expenses/', {
+            'date': '2024-01-02', 'name': name, 'amount': '90.00', 'expense_type': 'Group',
+            'split_type': 'Equal', 'total_friends': 2,
+            'group_details': [{'name': 'Carol', 'email': 'carol@example.com'}, {'name': 'Dave', 'email': 'dave@example.com'}],
+        }, format='json').json()
+        # Due far enough ahead that both the 24 hour and the 1 hour reminders get scheduled
+        due = timezone.localtime() + timedelta(days=3)
+        ExpenseNotification.objects.create(
+            expense_id=response['id'], due_date=due.date(), due_time=time(due.hour, due.minute), notification_status=True,
+        )
+        return response
+
+    def delete(self, expense_id, days_ago):
+        self.client.delete(f'/delete-expense/{expense_id}/')
+        Expense.all_objects.filter(id=expense_id).update(deleted_at=timezone.now() - timedelta(days=days_ago))
+        GroupExpenseDetail.all_objects.filter(expense_id=expense_id).update(deleted_at=timezone.now() - timedelta(days=days_ago))
+
+    def reminder_names(self, expense_id):
+        return set(PeriodicTask.objects.filter(name__endswith=f'_reminder_for_expense_{expense_id}').values_list('name', flat=True))
+
+    def test_expenses_past_retention_are_purged_with_their_reminders(self):
+        expired = self.group_expense('Dinner')['id']
+        recent = self.group_expense('Taxi')['id']
+        self.assertEqual(self.reminder_names(expired), {f'24 hour_reminder_for_expense_{expired}', f'1 hour_reminder_for_expense_{expired}'})
+        self.delete(expired, days_ago=31)
+        self.delete(recent, days_ago=1)
+
+        self.assertEqual(purge_deleted_expenses(), {'expenses': 1, 'group_details': 0})
+        self.assertFalse(Expense.all_objects.filter(id=expired).exists())
+        self.assertFalse(GroupExpenseDetail.all_objects.filter(expense_id=expired).exists())
+        self.assertFalse(ExpenseNotification.objects.filter(expense_id=expired).exists())
+        self.assertEqual(self.reminder_names(expired), set())
+
+        # Still within retention, the tombstone and its reminders stay for sync clients
+        self.assertTrue(Expense.all_objects.filter(id=recent).exists())
+        self.assertEqual(GroupExpenseDetail.all_objects.filter(expense_id=recent).count(), 3)
+        self.assertEqual(len(self.reminder_names(recent)), 2)
+
+    def test_deleted_details_of_live_expenses_are_purged(self):
+        expense = self.group_expense()
+        detail_id = expense['group_details'][0]['id']
+        self.client.delete(f'/delete-group-expense-detail/{expense["id"]}/{detail_id}/')
+        GroupExpenseDetail.all_objects.filter(id=detail_id).update(deleted_at=timezone.now() - timedelta(days=31))
+
+        self.assertEqual(purge_deleted_expenses(), {'expenses': 0, 'group_details': 1})
+        self.assertFalse(GroupExpenseDetail.all_objects.filter(id=detail_id).exists())
+        self.assertEqual(GroupExpenseDetail.objects.filter(expense_id=expense['id']).count(), 2)
+        self.assertEqual(len(self.reminder_names(expense['id'])), 2)
+
+    def test_each_run_purges_at_most_max_batches(self):
+        expense_ids = [self.group_expense(name)['id'] for name in ('Dinner', 'Taxi', 'Lunch')]
+        for expense_id in expense_ids:
+            self.delete(expense_id, days_ago=31)
+
+        self.assertEqual(purge_deleted_expenses(batch_size=1, max_batches=2)['expenses'], 2)
+        self.assertEqual(list(Expense.all_objects.values_list('id', flat=True)), expense_ids[2:])
+        self.assertEqual(self.reminder_names(expense_ids[0]) | self.reminder_names(expense_ids[1]), set())
+        self.assertEqual(len(self.reminder_names(expense_ids[2])), 2)
+
+        self.assertEqual(purge_deleted_expenses(batch_size=1, max_batches=2)['expenses'], 1)
+        self.assertFalse(PeriodicTask.objects.filter(name__contains='_reminder_for_expense_').exists())
+
+
+class ExpenseProjectionTests(TestCase):
+    """The summary, the pair balances and the event log follow an expense through its life."""
+
+    def setUp(self):
+        self.user = make_user()
+        self.bob = make_user('bob')
+        self.client = client_for(self.user)
+
+    def assert_projections_match(self):
+        self.assertEqual(summary_drift(self.user), {})
+        self.assertEqual(ledger_drift(), {})
+        call_command('reconcile_pair_balances', stdout=io.StringIO())
+        self.assertEqual(state_content(rebuild_state(self.user)[0]), state_content(live_state(self.user)))
+
+    def test_create_pay_edit_convert_and_delete(self):
+        expense = self.client.post('/expenses/', {
+            'date': '2024-01-02', 'name': 'Dinner', 'amount': '90.00', 'expense_type': 'Group',
+            'split_type': 'Equal', 'total_friends': 2,
+            'group_details': [{'name': 'Bob', 'username': 'bob'}, {'name': 'Carol', 'email': 'carol@example.com'}],
+        }, format='json').json()
+        self.assert_projections_match()
+        self.assertEqual(get_user_summary(self.user)['payments_pending'], Decimal('60.00'))
+
+        bob = next(detail for detail in expense['group_details'] if detail['username'] == 'bob')
+        self.client.patch(f'/expenses/{expense["id"]}/update-payment/{bob["id"]}/', {'is_paid': True}, format='json')
+        self.assert_projections_match()
+        self.assertEqual([(row['friend'], row['owes_you']) for row in friend_balances(self.user)], [('carol@example.com', Decimal('30.00'))])
+
+        # Everything so far happened an hour ago, the replay as of then must give this state back
+        checkpoint_state = state_content(live_state(self.user))
+        checkpoint_summary = state_totals(rebuild_state(self.user)[0], self.user.username)
+        ExpenseEvent.objects.update(created_at=F('created_at') - timedelta(hours=1))
+        checkpoint = timezone.now() - timedelta(minutes=30)
+
+        self.client.patch('/update-expense/', {
+            'id': expense['id'], 'amount': '120.00', 'total_friends': 2,
+            'group_details': [{'name': 'Bob', 'username': 'bob'}, {'name': 'Dave', 'email': 'dave@example.com'}],
+        }, format='json')
+        self.assert_projections_match()
+        self.assertEqual(get_user_summary(self.user)['payments_pending'], Decimal('40.00'))
+        take_snapshot(self.user)
+
+        self.client.patch('/update-expense/', {'id': expense['id'], 'expense_type': 'Personal'}, format='json')
+        self.assert_projections_match()
+        self.assertEqual(get_user_summary(self.user)['personal_expense_sum'], Decimal('120.00'))
+        self.assertEqual(friend_balances(self.user), [])
+
+        self.client.delete(f'/delete-expense/{expense["id"]}/')
+        self.assert_projections_match()
+        summary = get_user_summary(self.user)
+        self.assertEqual((summary['personal_expense_count'], summary['group_expense_count']), (0, 0))
+
+        state, _ = rebuild_state(self.user, checkpoint)
+        self.assertEqual(state_content(state), checkpoint_state)
+        self.assertEqual(state_totals(state, self.user.username), checkpoint_summary)
+        response = self.client.get('/expenses/as-of/', {'at': checkpoint.isoformat()})
+        self.assertEqual([row['amount'] for row in response.json()['expenses']], ['90.00'])
+
+
+class UnpaidExpenseTests(TestCase):
+    def test_debtor_totals_have_two_decimal_places(self):
+        client = client_for(make_user())
+        client.post('/expenses/', {
+            'date': '2024-01-02', 'name': 'Dinner', 'amount': '100.00', 'expense_type': 'Group',
+            'split_type': 'Equal', 'total_friends': 2,
+            'group_details': [{'name': 'Carol', 'email': 'carol@example.com'}, {'name': 'Dave', 'email': 'dave@example.com'}],
+        }, format='json')
+
+        response = client.get('/unpaid-expenses/', {'group_by': 'debtor'})
+        totals = {row['debtor']: row['total_owed'] for row in response.data['results']}
+        self.assertEqual({str(total) for total in totals.values()}, {'33.34', '33.33'})
+
+
+class MyDebtsTests(TestCase):
+    def test_shares_of_expenses_turned_personal_are_not_listed(self):
+        alice, bob = make_user(), make_user('bob')
+        client = client_for(bob)
+        expense_ids = [
+            client.post('/expenses/', {
+                'date': '2024-01-02', 'name': name, 'amount': '20.00', 'expense_type': 'Group',
+                'split_type': 'Equal', 'total_friends': 1, 'group_details': [{'name': 'Alice', 'username': 'alice'}],
+            }, format='json').json()['id']
+            for name in ('Dinner', 'Taxi')
+        ]
+        client.patch('/update-expense/', {'id': expense_ids[1], 'expense_type': 'Personal'}, format='json')
+
+        response = client_for(alice).get('/my-debts/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(debt['expense_name'], debt['amount']) for debt in response.json()['results']], [('Dinner', '10.00')])
+
+
+class SettleUpTests(TestCase):
+    def split_with(self, owner, amount, friend):
+        client_for(owner).post('/expenses/', {
+            'date': '2024-01-02', 'name': 'Dinner', 'amount': amount, 'expense_type': 'Group',
+            'split_type': 'Equal', 'total_friends': 1, 'group_details': [{'name': 'Friend', **friend}],
+        }, format='json')
+
+    def test_transfers_always_involve_the_requester(self):
+        alice, bob, dave = make_user(), make_user('bob'), make_user('dave')
+        self.split_with(bob, '20.00', {'username': 'alice'})
+        self.split_with(dave, '10.00', {'email': 'alice@example.com'})
+        self.split_with(alice, '30.00', {'email': 'carol@example.com'})
+
+        # Carol owes alice, alice owes bob and dave: carol paying bob would be a debt she never had
+        settlement = client_for(alice).get('/settle-up/').json()
+        transfers = sorted((transfer['from'], transfer['to'], transfer['amount']) for transfer in settlement['transfers'])
+        self.assertEqual(transfers, [('alice', 'bob', 10.0), ('alice', 'dave', 5.0), ('carol@example.com', 'alice', 15.0)])
+        # Alice's share added by email counts towards her own balance, which nets to zero
+        self.assertEqual(settlement['balances'], {'bob': 10.0, 'carol@example.com': -15.0, 'dave': 5.0})
+
+
+class DebtSimplificationTests(SimpleTestCase):
+    def test_requester_transfers_settle_only_their_balances(self):
+        transfers = simplify_debts({'alice': 500, 'bob': 300, 'carol': -800}, requester='alice')
+        self.assertEqual(
+            [(transfer['from'], transfer['to'], transfer['amount']) for transfer in transfers],
+            [('alice', 'bob', Decimal('3.00')), ('carol', 'alice', Decimal('8.00'))],
+        )
+
+
+class SplitPropertyTests(SimpleTestCase):
+    """Properties of the split engine over many seeded random expenses."""
+
+    cases = 2000
+
+    def random_cents(self, rng, low, high):
+        return Decimal(rng.randint(low, high)) * CENT
+
+    def assert_fair(self, total, weights, shares):
+        self.assertEqual(sum(shares, Decimal('0.00')), total)
+        weight_sum = sum(weights)
+        for weight, share in zip(weights, shares):
+            # Every share is its exact proportion rounded down or up to the cent
+            self.assertLess(abs(share - total * Decimal(weight) / weight_sum), CENT)
+
+    def test_allocate_adds_up_for_any_total(self):
+        rng = random.Random(6)
+        for _ in range(self.cases):
+            total = self.random_cents(rng, -10_000_000, 10_000_000)
+            weights = [rng.randint(1, 100) for _ in range(rng.randint(1, 12))]
+            self.assert_fair(total, weights, allocate(total, weights))
+
+    def test_allocate_negative_equal_split(self):
+        self.assertEqual(allocate(Decimal('-10.00'), [1, 1, 1]), [Decimal('-3.33'), Decimal('-3.33'), Decimal('-3.34')])
+
+    def test_equal_and_percentage_splits_add_up(self):
+        rng = random.Random(16)
+        for _ in range(self.cases):
+            amount = self.random_cents(rng, 1, 10_000_000)
+            friends = rng.randint(1, 10)
+            include_self = rng.random() < 0.5
+
+            split = compute_shares(amount, 'Equal', [None] * friends, include_self)
+            shares = split.friend_shares + ([split.owner_share] if include_self else [])
+            self.assert_fair(amount, [1] * len(shares), shares)
+            self.assertLessEqual(max(shares) - min(shares), CENT)
+
+            percentages = [Decimal(rng.randint(1, 1000)) / 100 for _ in range(friends)]
+            if not include_self:
+                percentages[-1] = 100 - sum(percentages[:-1])
+                if percentages[-1] < 0:
+                    continue
+            elif sum(percentages) >= 100:
+                continue
+            split = compute_shares(amount, 'Percentage', percentages, include_self)
+            shares = split.friend_shares + ([split.owner_share] if include_self else [])
+            weights = percentages + ([100 - sum(percentages)] if include_self else [])
+            self.assert_fair(amount, weights, shares)
+
+    def test_exact_split_gives_the_owner_the_rest(self):
+        rng = random.Random(26)
+        for _ in range(self.cases):
+            friend_shares = [self.random_cents(rng, 0, 100_000) for _ in range(rng.randint(1, 10))]
+            amount = sum(friend_shares, Decimal('0.00')) + self.random_cents(rng, 1, 100_000)
+            split = compute_shares(amount, 'Exact', friend_shares, True)
+            self.assertEqual(split.friend_shares, friend_shares)
+            self.assertEqual(sum(split.friend_shares, split.owner_share), amount)
+
+    def test_non_positive_amounts_are_rejected(self):
+        for amount in ('0.00', '-10.00'):
+            with self.assertRaises(SplitError):
+                compute_shares(Decimal(amount), 'Equal', [None, None], True)
+
+
+class ExpenseAmountTests(TestCase):
+    def test_non_positive_amounts_are_rejected(self):
+        client = client_for(make_user())
+        for amount in ('0.00', '-10.00'):
+            response = client.post('/expenses/', {
+                'date': '2024-01-02', 'name': 'Refund', 'amount': amount, 'expense_type': 'Group',
+                'split_type': 'Equal', 'total_friends': 2,
+                'group_details': [{'name': 'Carol', 'email': 'carol@example.com'}, {'name': 'Dave', 'email': 'dave@example.com'}],
+            }, format='json')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('amount', response.json())
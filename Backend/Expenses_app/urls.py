@@ -7,12 +7,24 @@ router = DefaultRouter()
 urlpatterns = [
     path('', include(router.urls)),
     path('expenses/', ExpenseListCreateView.as_view(), name='expense-list-create'),
+    path('expenses/batch/', ExpenseBatchCreateView.as_view(), name='expense-batch-create'),
+    path('expenses/import/', ExpenseImportView.as_view(), name='expense-import'),
+    path('expenses/export/', ExpenseExportView.as_view(), name='expense-export'),
+    path('expenses/search/', ExpenseSearchView.as_view(), name='expense-search'),
+    path('expenses/sync/', ExpenseSyncView.as_view(), name='expense-sync'),
+    path('expenses/as-of/', ExpenseStateAsOfView.as_view(), name='expense-state-as-of'),
+    path('expenses/<int:expense_id>/events/', ExpenseEventListView.as_view(), name='expense-events'),
+    path('expenses/update-payments/', BulkPaymentStatusView.as_view(), name='bulk-update-payment-status'),
     path('expenses/<int:expense_id>/update-payment/<int:detail_id>/', UpdatePaymentStatusView.as_view(), name='update-payment-status'),
     path('update-expense/', ExpenseUpdateView.as_view(), name='update-expense'),
     path('expenses/<int:expense_id>/group-details/<int:detail_id>/', UpdateGroupExpenseDetailView.as_view(), name='update-group-expense-detail'),
     path('expense-portfolio-summary/', ExpensePortfolioSummaryView.as_view(), name='expense-portfolio-summary'),
     path('delete-expense/<int:expense_id>/', DeleteExpenseView.as_view(), name='delete-expense'),
     path('delete-group-expense-detail/<int:expense_id>/<int:detail_id>/', DeleteGroupExpenseDetailView.as_view(), name='delete-group-expense-detail'),
+    path('settle-up/', SettleUpView.as_view(), name='settle-up'),
+    path('balances/', FriendBalanceListView.as_view(), name='friend-balances'),
+    path('balances/<str:friend>/', FriendBalanceDetailView.as_view(), name='friend-balance-detail'),
+    path('my-debts/', MyDebtsListView.as_view(), name='my-debts'),
     path('unpaid-expenses/', UnpaidExpenseListView.as_view(), name='unpaid_expenses'),
     
 ]
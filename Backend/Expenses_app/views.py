@@ -5,36 +5,101 @@ from .models import *
 from .serializers import *
 from UserManagement_app.models import *
 from UserManagement_app.serializers import *
+from UserManagement_app.lookups import lookup_user
+from UserManagement_app.versioning import DataVersionETagMixin
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from django.db.models import Q
+from django.db.models import CharField, Count, Q, Prefetch, Sum
+from django.db.models.functions import Coalesce
 from rest_framework.exceptions import ValidationError
 from django.core.exceptions import ObjectDoesNotExist
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
+from django.db import transaction
+from .pagination import AggregatePagination, ExpenseCursorPagination, ExpenseEventCursorPagination, GroupExpenseDetailCursorPagination
+from .importers import DEFAULT_COLUMNS, ExpenseImporter, iter_csv_rows
+from .exporters import gzip_stream, iter_export_rows, stream_csv, stream_ndjson
+from .changes import ExpenseChangeSet
+from .search import search_expense_ids
+from .settlements import CENT, net_balances, simplify_debts
+from .ledger import friend_balances
+from .events import rebuild_state, state_totals
+from .sync import CursorExpired, InvalidCursor, changed_expenses
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from .participants import resolve_participant_id, resolve_participants
+from .splits import SplitError, build_group_details, compute_batch_shares, split_group_expense
+from rest_framework.parsers import MultiPartParser
+from datetime import datetime, time
+from decimal import Decimal, InvalidOperation
 import csv
 import io
 
  # Listing and creating expenses
-class ExpenseListCreateView(generics.ListCreateAPIView):
+class ExpenseListCreateView(DataVersionETagMixin, generics.ListCreateAPIView):
     serializer_class = ExpenseSerializer
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = ExpenseCursorPagination
 
     def get_queryset(self):
-        return Expense.objects.filter(user=self.request.user)
+        return Expense.objects.filter(user=self.request.user).prefetch_related(
+            Prefetch('group_details', queryset=GroupExpenseDetail.objects.order_by('id'))
+        )
+
+    def filter_queryset(self, queryset):
+        params = self.request.query_params
+        filters = {}
+
+        # Date range filters
+        for param, lookup in (('date_from', 'date__gte'), ('date_to', 'date__lte')):
+            if params.get(param):
+                try:
+                    filters[lookup] = datetime.strptime(params[param], '%Y-%m-%d').date()
+                except ValueError:
+                    raise ValidationError({param: "Date has wrong format. Use YYYY-MM-DD."})
+
+        # Amount range filters
+        for param, lookup in (('amount_min', 'amount__gte'), ('amount_max', 'amount__lte')):
+            if params.get(param):
+                try:
+                    value = Decimal(params[param])
+                except InvalidOperation:
+                    raise ValidationError({param: "A valid number is required."})
+                # NaN and Infinity parse but cannot be compared in the database
+                if not value.is_finite():
+                    raise ValidationError({param: "A valid number is required."})
+                filters[lookup] = value
+
+        # Type filters
+        if params.get('expense_type'):
+            if params['expense_type'] not in dict(Expense.EXPENSE_TYPE_CHOICES):
+                raise ValidationError({'expense_type': f"'{params['expense_type']}' is not a valid expense type."})
+            filters['expense_type'] = params['expense_type']
+        if params.get('split_type'):
+            if params['split_type'] not in dict(Expense.SPLIT_TYPE_CHOICES):
+                raise ValidationError({'split_type': f"'{params['split_type']}' is not a valid split type."})
+            filters['split_type'] = params['split_type']
+
+        return queryset.filter(**filters)
     
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        expense = self.perform_create(serializer)
-        
-        if expense.expense_type == 'Group':
-            group_details_data = serializer.validated_data.get('group_details', [])
-            self.handle_group_expense(expense, group_details_data)
+        with transaction.atomic():
+            expense = self.perform_create(serializer)
+            details = []
+            
+            if expense.expense_type == 'Group':
+                group_details_data = serializer.validated_data.get('group_details', [])
+                details = self.handle_group_expense(expense, group_details_data)
+
+            changes = ExpenseChangeSet(request.user)
+            changes.record_after(expense, details)
+            changes.send()
         
         # Re-fetching the expense to get the updated data including the new group details
-        updated_serializer = self.get_serializer(expense)
+        updated_serializer = self.get_serializer(self.get_queryset().get(id=expense.id))
         headers = self.get_success_headers(updated_serializer.data)
         return Response(updated_serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
@@ -42,104 +107,198 @@ class ExpenseListCreateView(generics.ListCreateAPIView):
         return serializer.save(user=self.request.user)
 
     def handle_group_expense(self, expense, group_details_data):
-        split_type = expense.split_type
-        total_amount = expense.amount
-        total_friends = expense.total_friends
+        try:
+            split = split_group_expense(expense, group_details_data)
+        except SplitError as e:
+            raise serializers.ValidationError(str(e))
+        details = resolve_participants(build_group_details(expense, group_details_data, split))
+        return GroupExpenseDetail.objects.bulk_create(details)
 
-        # Actual number of participants
-        actual_participants = total_friends + 1 if expense.include_self else total_friends
+# Creating many expenses in one request (offline clients replaying their queue)
+class ExpenseBatchCreateView(ExpenseListCreateView):
+    http_method_names = ['post', 'options']
+    max_batch_size = 1000
 
-        if split_type == 'Equal':
-            equal_share = total_amount / actual_participants
-            
-            for detail_data in group_details_data:
-                GroupExpenseDetail.objects.create(
-                    expense=expense,
-                    name=detail_data['name'],
-                    username=detail_data.get('username'),
-                    email=detail_data.get('email'),
-                    amount=equal_share,
-                    note=detail_data.get('note', ''),
-                    is_paid=False
-                )
-
-            # Create group expense detail for the current user if include_self is True
-            if expense.include_self:
-                GroupExpenseDetail.objects.create(
-                    expense=expense,
-                    name=expense.user.get_full_name() or expense.user.username,
-                    username=expense.user.username,
-                    email=expense.user.email,
-                    amount=equal_share,
-                    note='Owner\'s share',
-                    is_paid=True
-                )
-
-        elif split_type == 'Exact':
-            # Calculate the sum
-            friends_total = sum(detail['amount'] for detail in group_details_data)
-
-            # Check if the sum matches the total amount
-            if not expense.include_self:
-                if abs(friends_total - total_amount) > 0.01:  
-                    raise serializers.ValidationError(
-                        f"The sum of amounts ({friends_total}) does not match the total expense amount ({total_amount})"
-                    )
-            
-            for detail_data in group_details_data:
-                GroupExpenseDetail.objects.create(
-                    expense=expense,
-                    name=detail_data['name'],
-                    username=detail_data.get('username'),
-                    email=detail_data.get('email'),
-                    amount=detail_data['amount'],
-                    note=detail_data.get('note', ''),
-                    is_paid=False
-                )
-
-            # Create a group expense for the current user if include_self value is True
-            if expense.include_self:
-                user_amount = total_amount - friends_total
-                GroupExpenseDetail.objects.create(
-                    expense=expense,
-                    name=expense.user.get_full_name() or expense.user.username,
-                    username=expense.user.username,
-                    email=expense.user.email,
-                    amount=user_amount,
-                    note='Owner\'s share',
-                    is_paid=True
-                )
-
-        elif split_type == 'Percentage':
-            total_percentage = sum(detail['amount'] for detail in group_details_data)
-            for detail_data in group_details_data:
-                amount = (detail_data['amount'] / 100) * total_amount
-                GroupExpenseDetail.objects.create(
-                    expense=expense,
-                    name=detail_data['name'],
-                    username=detail_data.get('username'),
-                    email=detail_data.get('email'),
-                    amount=amount,
-                    note=detail_data.get('note', ''),
-                    is_paid=False
-                )
-
-            if expense.include_self:
-                user_percentage = 100 - total_percentage
-                user_amount = (user_percentage / 100) * total_amount
-                GroupExpenseDetail.objects.create(
-                    expense=expense,
-                    name=expense.user.get_full_name() or expense.user.username,
-                    username=expense.user.username,
-                    email=expense.user.email,
-                    amount=user_amount,
-                    note='Owner\'s share',
-                    is_paid=True
-                )
-            else:
-                # Check that the percentages adds up to 100%
-                if abs(total_percentage - 100) > 0.01:  
-                    raise serializers.ValidationError("Total percentage must equal 100% when not including self.")
+    def create(self, request, *args, **kwargs):
+        items = request.data.get('expenses') if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list) or not items:
+            return Response({"error": "A non-empty list of expenses is required"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > self.max_batch_size:
+            return Response({"error": f"A batch can contain at most {self.max_batch_size} expenses"}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = [None] * len(items)
+        pending = []
+
+        # Validating every item first, a bad item only fails its own result
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                results[index] = {"index": index, "status": status.HTTP_400_BAD_REQUEST, "errors": ["Expected an expense object."]}
+                continue
+
+            serializer = self.get_serializer(data=item)
+            if not serializer.is_valid():
+                results[index] = {"index": index, "status": status.HTTP_400_BAD_REQUEST, "errors": serializer.errors}
+                continue
+
+            validated_data = dict(serializer.validated_data)
+            group_details_data = validated_data.pop('group_details', [])
+            pending.append((index, Expense(user=request.user, **validated_data), group_details_data))
+
+        # Computing the shares of every group expense in the batch in one call
+        group_items = [(index, expense, data) for index, expense, data in pending if expense.expense_type == 'Group']
+        splits = compute_batch_shares(
+            (expense.amount, expense.split_type, [detail.get('amount') for detail in data], expense.include_self)
+            for _, expense, data in group_items
+        )
+        split_by_index = {index: split for (index, _, _), split in zip(group_items, splits)}
+
+        expenses = []
+        details_per_expense = []
+        valid_indexes = []
+        for index, expense, group_details_data in pending:
+            split = split_by_index.get(index)
+            if isinstance(split, SplitError):
+                results[index] = {"index": index, "status": status.HTTP_400_BAD_REQUEST, "errors": [str(split)]}
+                continue
+
+            expenses.append(expense)
+            details_per_expense.append(build_group_details(expense, group_details_data, split) if split else [])
+            valid_indexes.append(index)
+
+        # Writing all valid expenses and their group details with two bulk inserts
+        if expenses:
+            with transaction.atomic():
+                Expense.objects.bulk_create(expenses)
+                details = []
+                for expense, expense_details in zip(expenses, details_per_expense):
+                    for detail in expense_details:
+                        detail.expense = expense
+                    details.extend(expense_details)
+                GroupExpenseDetail.objects.bulk_create(resolve_participants(details))
+
+                changes = ExpenseChangeSet(request.user)
+                for expense, expense_details in zip(expenses, details_per_expense):
+                    changes.record_after(expense, expense_details)
+                changes.send()
+
+            created = self.get_queryset().filter(id__in=[expense.id for expense in expenses])
+            created_by_id = {expense.id: expense for expense in created}
+            for index, expense in zip(valid_indexes, expenses):
+                data = self.get_serializer(created_by_id[expense.id]).data
+                results[index] = {"index": index, "status": status.HTTP_201_CREATED, "data": data}
+
+        failed_count = len(items) - len(expenses)
+        response_status = status.HTTP_201_CREATED if not failed_count else status.HTTP_207_MULTI_STATUS
+        if not expenses:
+            response_status = status.HTTP_400_BAD_REQUEST
+
+        return Response({
+            "created_count": len(expenses),
+            "failed_count": failed_count,
+            "results": results,
+        }, status=response_status)
+
+# Ranked full-text search over expense and group member names and notes
+class ExpenseSearchView(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    default_page_size = 20
+    max_page_size = 100
+    # Deeper pages are refused, the offset is scanned on every request and a huge one overflows the query
+    max_offset = 10_000
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({"error": "A search query 'q' is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            page = max(int(request.query_params.get('page', 1)), 1)
+            page_size = min(max(int(request.query_params.get('page_size', self.default_page_size)), 1), self.max_page_size)
+        except ValueError:
+            return Response({"error": "page and page_size must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+
+        offset = (page - 1) * page_size
+        if offset > self.max_offset:
+            return Response(
+                {"error": f"Only the first {self.max_offset} results can be paged through, refine the search"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Asking for one extra hit to know whether there is a next page
+        expense_ids = search_expense_ids(request.user, query, page_size + 1, offset)
+        has_next = len(expense_ids) > page_size and offset + page_size <= self.max_offset
+        expense_ids = expense_ids[:page_size]
+
+        expenses = Expense.objects.filter(id__in=expense_ids).prefetch_related(
+            Prefetch('group_details', queryset=GroupExpenseDetail.objects.order_by('id'))
+        )
+        by_id = {expense.id: expense for expense in expenses}
+        results = ExpenseSerializer([by_id[expense_id] for expense_id in expense_ids], many=True).data
+
+        return Response({
+            "page": page,
+            "next_page": page + 1 if has_next else None,
+            "results": results,
+        }, status=status.HTTP_200_OK)
+
+# Importing expenses from an uploaded CSV bank statement
+class ExpenseImportView(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        csv_file = request.FILES.get('file')
+        if not csv_file:
+            return Response({"error": "A CSV file is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Optional header mapping, e.g. name_column=Description
+        columns = {}
+        for field in DEFAULT_COLUMNS:
+            header = request.data.get(f'{field}_column')
+            if header:
+                columns[field] = header
+
+        date_formats = request.data.getlist('date_format') or None
+        import_credits = request.data.get('import_credits') in ('1', 'true', 'True')
+        importer = ExpenseImporter(request.user, columns=columns, date_formats=date_formats, import_credits=import_credits)
+
+        report = importer.run(iter_csv_rows(csv_file))
+        if 'error' in report:
+            report['error'] += " The file must be UTF-8 encoded CSV."
+            return Response(report, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(report, status=status.HTTP_201_CREATED if report['imported'] else status.HTTP_400_BAD_REQUEST)
+
+# Exporting all expenses with their group details as a stream
+class ExpenseExportView(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        # 'format' is reserved by DRF for content negotiation
+        file_format = request.query_params.get('file_format', 'csv')
+        use_gzip = request.query_params.get('gzip') in ('1', 'true', 'True')
+
+        if file_format == 'csv':
+            chunks = stream_csv(iter_export_rows(request.user))
+            content_type = 'text/csv'
+        elif file_format == 'ndjson':
+            chunks = stream_ndjson(iter_export_rows(request.user))
+            content_type = 'application/x-ndjson'
+        else:
+            return Response({"error": "file_format must be 'csv' or 'ndjson'"}, status=status.HTTP_400_BAD_REQUEST)
+
+        filename = f'expenses.{file_format}'
+        if use_gzip:
+            chunks = gzip_stream(chunks)
+            content_type = 'application/gzip'
+            filename += '.gz'
+
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
 
 class UpdatePaymentStatusView(APIView):
     authentication_classes = [JWTAuthentication]
@@ -154,19 +313,126 @@ class UpdatePaymentStatusView(APIView):
 
         is_paid = request.data.get('is_paid')
         if is_paid is not None:
+            try:
+                is_paid = serializers.BooleanField().to_internal_value(is_paid)
+            except ValidationError:
+                return Response({"error": "is_paid must be a boolean"}, status=status.HTTP_400_BAD_REQUEST)
+
+            changes = ExpenseChangeSet(request.user)
+            changes.record_before(expense, [detail])
             detail.is_paid = is_paid
-            detail.save()
+            with transaction.atomic():
+                detail.save()
+                changes.record_after(expense, [detail])
+                changes.send()
             return Response({"message": "Payment status updated successfully"}, status=status.HTTP_200_OK)
         else:
             return Response({"error": "is_paid field is required"}, status=status.HTTP_400_BAD_REQUEST)
         
+# Updating the payment status of many group expense details at once (settling up)
+class BulkPaymentStatusView(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    max_updates = 1000
+
+    def patch(self, request):
+        data = request.data if isinstance(request.data, dict) else {}
+        updates = data.get('updates')
+        username = data.get('username')
+
+        if updates is not None:
+            try:
+                targets = self.parse_updates(updates)
+            except ValidationError as e:
+                return Response({"error": e.detail}, status=status.HTTP_400_BAD_REQUEST)
+
+            # Checking ownership of every detail with one query
+            details = list(
+                GroupExpenseDetail.objects.filter(id__in=targets.keys(), expense__user=request.user).select_related('expense')
+            )
+            found = {detail.id: detail for detail in details if detail.expense_id == targets[detail.id][0]}
+            missing = [detail_id for detail_id in targets if detail_id not in found]
+            if missing:
+                return Response({"error": "Expense or detail not found", "detail_ids": missing}, status=status.HTTP_404_NOT_FOUND)
+            new_values = {detail_id: is_paid for detail_id, (_, is_paid) in targets.items()}
+
+        elif username:
+            try:
+                is_paid = serializers.BooleanField().to_internal_value(data.get('is_paid', True))
+            except ValidationError:
+                return Response({"error": "is_paid must be a boolean"}, status=status.HTTP_400_BAD_REQUEST)
+            if username == request.user.username:
+                return Response({"error": "Cannot change the payment status of your own share"}, status=status.HTTP_400_BAD_REQUEST)
+
+            details = list(
+                GroupExpenseDetail.objects.filter(expense__user=request.user, username=username, is_paid=not is_paid).select_related('expense')
+            )
+            new_values = {detail.id: is_paid for detail in details}
+
+        else:
+            return Response({"error": "Either 'updates' or 'username' is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        changed = [detail for detail in details if detail.is_paid != new_values[detail.id]]
+        if changed:
+            changes = ExpenseChangeSet(request.user)
+            for detail in changed:
+                changes.record_before(detail.expense, [detail])
+
+            now = timezone.now()
+            with transaction.atomic():
+                # One UPDATE ... WHERE id IN (...) per target value
+                for is_paid in (True, False):
+                    detail_ids = [detail.id for detail in changed if new_values[detail.id] is is_paid]
+                    if detail_ids:
+                        GroupExpenseDetail.objects.filter(id__in=detail_ids).update(is_paid=is_paid, updated_at=now)
+
+                for detail in changed:
+                    detail.is_paid = new_values[detail.id]
+                    detail.updated_at = now
+                    changes.record_after(detail.expense, [detail])
+                changes.send()
+
+        return Response({"message": "Payment status updated successfully", "updated": len(changed)}, status=status.HTTP_200_OK)
+
+    def parse_updates(self, updates):
+        if not isinstance(updates, list) or not updates:
+            raise ValidationError("updates must be a non-empty list")
+        if len(updates) > self.max_updates:
+            raise ValidationError(f"At most {self.max_updates} updates can be sent at once")
+
+        targets = {}
+        for update in updates:
+            try:
+                expense_id = int(update['expense_id'])
+                detail_id = int(update['detail_id'])
+                is_paid = serializers.BooleanField().to_internal_value(update['is_paid'])
+            except (KeyError, TypeError, ValueError, ValidationError):
+                raise ValidationError("Every update needs an integer expense_id and detail_id and a boolean is_paid")
+            targets[detail_id] = (expense_id, is_paid)
+        return targets
+
+# Suggesting the payments that settle all of the user's open group expense debts
+class SettleUpView(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        balances = net_balances(request.user)
+        transfers = simplify_debts(balances, requester=request.user.username)
+        return Response({
+            "balances": {name: Decimal(cents) * CENT for name, cents in sorted(balances.items()) if cents},
+            "transfers": transfers,
+        }, status=status.HTTP_200_OK)
+
 class ExpenseUpdateView(generics.UpdateAPIView):
     serializer_class = ExpenseSerializer
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Expense.objects.filter(user=self.request.user)
+        return Expense.objects.filter(user=self.request.user).prefetch_related(
+            Prefetch('group_details', queryset=GroupExpenseDetail.objects.order_by('id'))
+        )
 
     def update(self, request, *args, **kwargs):
         expense_id = request.data.get('id')
@@ -185,7 +451,7 @@ class ExpenseUpdateView(generics.UpdateAPIView):
         updated_instance = serializer.save()
 
         # Re fetch the instance to get updated data
-        updated_serializer = self.get_serializer(updated_instance)
+        updated_serializer = self.get_serializer(self.get_queryset().get(id=updated_instance.id))
         return Response(updated_serializer.data)
 
     def perform_update(self, serializer):
@@ -211,7 +477,15 @@ class UpdateGroupExpenseDetailView(APIView):
             except ValidationError as e:
                 return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-            updated_detail = serializer.save()
+            changes = ExpenseChangeSet(request.user)
+            changes.record_before(expense, [detail])
+            with transaction.atomic():
+                updated_detail = serializer.save(participant_id=resolve_participant_id(
+                    serializer.validated_data.get('username', detail.username),
+                    serializer.validated_data.get('email', detail.email),
+                ))
+                changes.record_after(expense, [updated_detail])
+                changes.send()
             return Response(UpdateGroupExpenseDetailSerializer(updated_detail).data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -225,7 +499,7 @@ class UpdateGroupExpenseDetailView(APIView):
                 raise ValidationError(f"Duplicate entry found for username '{username}'.")
             
             # Check if username exists in model
-            if not CustomUser.objects.filter(username=username).exists():
+            if lookup_user(username) is None:
                 raise ValidationError(f"Username '{username}' is not registered. Please enter an email address instead.")
 
         if email:
@@ -266,7 +540,13 @@ class DeleteExpenseView(APIView):
     def delete(self, request, expense_id):
         try:
             expense = Expense.objects.get(id=expense_id, user=request.user)
-            expense.delete()
+            changes = ExpenseChangeSet(request.user)
+            changes.record_before(expense, expense.group_details.all())
+            with transaction.atomic():
+                # Kept as tombstones for sync clients
+                expense.group_details.all().soft_delete()
+                Expense.objects.filter(id=expense.id).soft_delete()
+                changes.send()
             return Response({"message": "Expense deleted successfully"}, status=status.HTTP_204_NO_CONTENT)
         except ObjectDoesNotExist:
             return Response({"error": "Expense not found"}, status=status.HTTP_404_NOT_FOUND)
@@ -281,23 +561,165 @@ class DeleteGroupExpenseDetailView(APIView):
         try:
             expense = Expense.objects.get(id=expense_id, user=request.user)
             detail = GroupExpenseDetail.objects.get(id=detail_id, expense=expense)
-            detail.delete()
+            changes = ExpenseChangeSet(request.user)
+            changes.record_before(expense, [detail])
+            changes.record_after(expense)
+            with transaction.atomic():
+                GroupExpenseDetail.objects.filter(id=detail.id).soft_delete()
+                changes.send()
             return Response({"message": "Group expense detail deleted successfully"}, status=status.HTTP_204_NO_CONTENT)
         except ObjectDoesNotExist:
             return Response({"error": "Expense or group expense detail not found"}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
-class UnpaidExpenseListView(APIView):
+# Unpaid shares on the user's expenses, one page of details or, with group_by=debtor, totals per debtor
+class UnpaidExpenseListView(DataVersionETagMixin, generics.ListAPIView):
+    serializer_class = UnpaidExpenseSerializer
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = GroupExpenseDetailCursorPagination
+
+    def get_queryset(self):
+        user = self.request.user
+        return (
+            GroupExpenseDetail.objects.filter(expense__user=user, is_paid=False)
+            .exclude(username=user.username)  # Exclude the user's own expenses
+            .select_related('expense')
+        )
+
+    def list(self, request, *args, **kwargs):
+        group_by = request.query_params.get('group_by')
+        if not group_by:
+            return super().list(request, *args, **kwargs)
+        if group_by != 'debtor':
+            return Response({"error": "group_by must be debtor"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Totals and counts are computed by the database, one row per debtor
+        totals = (
+            self.get_queryset()
+            .annotate(debtor=Coalesce('username', 'email', output_field=CharField()))
+            .values('debtor')
+            .annotate(total_owed=Sum('amount'), unpaid_count=Count('id'))
+            .order_by('-total_owed', 'debtor')
+        )
+        paginator = AggregatePagination()
+        page = paginator.paginate_queryset(totals, request, view=self)
+        # Sums come back at the database's own scale
+        for row in page:
+            row['total_owed'] = row['total_owed'].quantize(CENT)
+        return paginator.get_paginated_response(page)
+
+# Unpaid shares the user owes on expenses created by others
+class MyDebtsListView(generics.ListAPIView):
+    serializer_class = MyDebtSerializer
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    pagination_class = GroupExpenseDetailCursorPagination
+
+    def get_queryset(self):
+        # Served by the (participant, is_paid) index, shares of expenses turned Personal are no longer owed
+        return (
+            GroupExpenseDetail.objects.filter(participant=self.request.user, is_paid=False, expense__expense_type='Group')
+            .exclude(expense__user=self.request.user)
+            .select_related('expense__user')
+        )
+
+# Delta sync for clients keeping a local copy: only the expenses changed since their cursor
+class ExpenseSyncView(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    default_limit = 200
+    max_limit = 1000
 
     def get(self, request):
-        user = request.user
-        unpaid_expenses = GroupExpenseDetail.objects.filter(
-            expense__user=user,
-            is_paid=False
-        ).exclude(username=user.username)  # Exclude the user's own expenses
-
-        serializer = UnpaidExpenseSerializer(unpaid_expenses, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response({"error": "limit must be positive"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            changed, deleted_ids, cursor, has_more = changed_expenses(request.user, request.query_params.get('cursor'), limit)
+        except CursorExpired as e:
+            return Response({"error": str(e), "reset": True}, status=status.HTTP_410_GONE)
+        except InvalidCursor as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "changed": SyncExpenseSerializer(changed, many=True).data,
+            "deleted": deleted_ids,
+            "cursor": cursor,
+            "has_more": has_more,
+        }, status=status.HTTP_200_OK)
+
+# Event log of one expense, in the order the changes happened
+class ExpenseEventListView(generics.ListAPIView):
+    serializer_class = ExpenseEventSerializer
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    pagination_class = ExpenseEventCursorPagination
+
+    def get_queryset(self):
+        return ExpenseEvent.objects.filter(user=self.request.user, expense_id=self.kwargs['expense_id'])
+
+# Expenses and their summary as they were at a point in time, replayed from the event log
+class ExpenseStateAsOfView(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        at = self.parse_at(request.query_params.get('at'))
+        if at is False:
+            return Response({"error": "at has wrong format. Use YYYY-MM-DD or an ISO 8601 datetime."}, status=status.HTTP_400_BAD_REQUEST)
+
+        state, last_event_id = rebuild_state(request.user, at)
+        expenses = sorted(
+            (dict(entry['expense'], group_details=list(entry['details'].values())) for entry in state.values()),
+            key=lambda expense: (expense['date'], expense['id']),
+            reverse=True,
+        )
+        return Response({
+            "as_of": at or timezone.now(),
+            "last_event_id": last_event_id,
+            "summary": state_totals(state, request.user.username),
+            "expenses": expenses,
+        }, status=status.HTTP_200_OK)
+
+    # A bare date means the end of that day; False when the value cannot be parsed
+    def parse_at(self, value):
+        if not value:
+            return None
+        try:
+            at = parse_datetime(value)
+            if at is None:
+                day = parse_date(value)
+                if day is None:
+                    return False
+                at = datetime.combine(day, time.max)
+        except ValueError:
+            return False
+        if timezone.is_naive(at):
+            at = timezone.make_aware(at)
+        return at
+
+# Outstanding balance with every friend, read from the pairwise ledger
+class FriendBalanceListView(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response(friend_balances(request.user), status=status.HTTP_200_OK)
+
+# Outstanding balance with one friend
+class FriendBalanceDetailView(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, friend):
+        for balance in friend_balances(request.user):
+            if balance['friend'] == friend:
+                return Response(balance, status=status.HTTP_200_OK)
+        zero = Decimal('0.00')
+        return Response({'friend': friend, 'owes_you': zero, 'you_owe': zero, 'net': zero}, status=status.HTTP_200_OK)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class FriendsmanagementAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'FriendsManagement_app'
+
+    def ready(self):
+        from . import signals
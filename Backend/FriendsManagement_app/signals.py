@@ -0,0 +1,25 @@
+from django.db.models.signals import m2m_changed, post_save
+from django.dispatch import receiver
+from UserManagement_app.models import CustomUser
+from UserManagement_app.versioning import bump_data_versions
+from .models import FriendList
+
+
+@receiver(m2m_changed, sender=FriendList.friends.through)
+def bump_friend_list_versions(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # instance is the friend, pk_set holds friend list ids
+        user_ids = set(FriendList.objects.filter(id__in=pk_set or ()).values_list('user_id', flat=True))
+        user_ids.add(instance.id)
+    else:
+        user_ids = set(pk_set or ()) | {instance.user_id}
+    bump_data_versions(user_ids)
+
+
+# Friend lists show the friend's name and email
+@receiver(post_save, sender=CustomUser)
+def bump_friends_of_updated_user(sender, instance, created, **kwargs):
+    if not created:
+        bump_data_versions(FriendList.objects.filter(friends=instance).values_list('user_id', flat=True))
@@ -4,6 +4,7 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from .models import *
 from .serializers import *
+from UserManagement_app.versioning import DataVersionETagMixin
 
 class SendFriendRequestAPIView(APIView):
     permission_classes = [IsAuthenticated]
@@ -58,7 +59,7 @@ class RespondToFriendRequestAPIView(APIView):
 
         return Response({'message': message}, status=status.HTTP_200_OK)
 
-class ListUserFriendsAPIView(APIView):
+class ListUserFriendsAPIView(DataVersionETagMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
@@ -9,6 +9,14 @@ from django.db import IntegrityError
 
 User = get_user_model()
 
+# Reminder PeriodicTasks are named '<prefix>_reminder_for_expense_<id>', the prefixes
+# come from ExpenseNotification.schedule_reminders and the notification views
+REMINDER_TASK_PREFIXES = ['24 hour', '1 hour', '24h', '1h']
+
+
+def reminder_task_names(expense_ids):
+    return [f'{prefix}_reminder_for_expense_{expense_id}' for expense_id in expense_ids for prefix in REMINDER_TASK_PREFIXES]
+
 class ExpenseNotification(models.Model):
     expense = models.ForeignKey(Expense, on_delete=models.CASCADE, related_name='notifications')
     due_date = models.DateField()
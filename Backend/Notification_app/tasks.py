@@ -11,6 +11,7 @@ from .models import *
 from django.core.mail import send_mail
 from daily_expense_system.settings import EMAIL_HOST_USER
 from django.utils.timezone import localtime
+from UserManagement_app.lookups import lookup_users
 import logging
 
 CustomUser = get_user_model()
@@ -26,7 +27,10 @@ logger = logging.getLogger(__name__)
 def send_reminder_email(self, expense_id, reminder_type):
     logger.info(f"Sending {reminder_type} reminder for expense {expense_id}")
     try:
-        expense = Expense.objects.get(id=expense_id)
+        expense = Expense.objects.filter(id=expense_id).first()
+        if expense is None:
+            logger.info(f"Skipping reminder for expense {expense_id} as it was deleted")
+            return
         notification = expense.notifications.latest('created_at')
         now = timezone.now()
         due_datetime = timezone.make_aware(datetime.combine(notification.due_date, notification.due_time))
@@ -35,13 +39,14 @@ def send_reminder_email(self, expense_id, reminder_type):
             logger.info(f"Skipping reminder for expense {expense_id} as it's already due")
             return
 
-        unpaid_details = GroupExpenseDetail.objects.filter(expense=expense, is_paid=False).exclude(username=expense.user.username)
+        unpaid_details = list(GroupExpenseDetail.objects.filter(expense=expense, is_paid=False).exclude(username=expense.user.username))
+        registered_users = lookup_users(detail.username for detail in unpaid_details if not detail.email)
         
         for detail in unpaid_details:
             if detail.is_paid:
                 continue
             
-            recipient_email = detail.email or CustomUser.objects.get(username=detail.username).email
+            recipient_email = detail.email or registered_users[detail.username]['email']
             subject = f"{reminder_type.capitalize()} Reminder: Payment for {expense.name}"
             message = f"""
             Dear {detail.name},
@@ -83,6 +88,7 @@ def check_scheduled_reminders(self):
         notifications = ExpenseNotification.objects.filter(
             notification_status=True,
             due_date__gte=now.date(),
+            expense__deleted_at__isnull=True,
         )
 
         reminders_sent = 0
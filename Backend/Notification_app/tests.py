@@ -1,3 +1,25 @@
+from datetime import date, time
 from django.test import TestCase
+from Expenses_app.models import Expense
+from UserManagement_app.factories import client_for, make_user
+from .models import ExpenseNotification
 
-# Create your tests here.
+
+class ExpenseNotificationListTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client = client_for(self.user)
+
+    def notify(self, name):
+        expense = Expense.objects.create(user=self.user, date=date(2024, 1, 2), name=name, amount='30.00', expense_type='Group')
+        ExpenseNotification.objects.create(expense=expense, due_date=date(2024, 2, 1), due_time=time(12))
+        return expense
+
+    def test_notifications_of_deleted_expenses_are_not_listed(self):
+        self.notify('Dinner')
+        deleted = self.notify('Taxi')
+        Expense.objects.filter(id=deleted.id).soft_delete()
+
+        response = self.client.get('/notifications/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['expense_id'] for row in response.json()], [Expense.objects.get(name='Dinner').id])
@@ -12,6 +12,7 @@ from django.conf import settings
 from daily_expense_system.settings import EMAIL_HOST_USER
 from django.utils import timezone
 from datetime import datetime, timedelta 
+from UserManagement_app.lookups import lookup_users
 
 CustomUser = get_user_model()
 
@@ -43,10 +44,11 @@ class SendExpenseNotificationView(APIView):
     
     def send_immediate_notifications(self, notification):
         expense = notification.expense
-        unpaid_details = GroupExpenseDetail.objects.filter(expense=expense, is_paid=False).exclude(username=expense.user.username)
+        unpaid_details = list(GroupExpenseDetail.objects.filter(expense=expense, is_paid=False).exclude(username=expense.user.username))
+        registered_users = lookup_users(detail.username for detail in unpaid_details if not detail.email)
 
         for detail in unpaid_details:
-            recipient_email = detail.email if detail.email else CustomUser.objects.get(username=detail.username).email
+            recipient_email = detail.email if detail.email else registered_users[detail.username]['email']
             self.send_notification_email(detail, expense, notification.due_date, notification.due_time, recipient_email)
 
     def send_notification_email(self, detail, expense, due_date, due_time, recipient_email):
@@ -112,5 +114,7 @@ class ExpenseNotificationListAPIView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        # Filter notifications for the current user
-        return ExpenseNotification.objects.filter(expense__user=self.request.user).order_by('-due_date', '-due_time')
\ No newline at end of file
+        # Filter notifications for the current user, skipping expenses deleted but not yet purged
+        return ExpenseNotification.objects.filter(
+            expense__user=self.request.user, expense__deleted_at__isnull=True,
+        ).order_by('-due_date', '-due_time')
\ No newline at end of file
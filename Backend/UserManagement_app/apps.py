@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class UsermanagementAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'UserManagement_app'
+
+    def ready(self):
+        from . import signals
@@ -0,0 +1,16 @@
+from rest_framework.test import APIClient
+from .models import CustomUser
+
+
+# Test helpers shared by the apps' test suites
+def make_user(username='alice'):
+    return CustomUser.objects.create_user(
+        username=username, email=f'{username}@example.com', password='password',
+        first_name=username.title(), last_name='Test', phone_number='1234567890',
+    )
+
+
+def client_for(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import OrderedDict
+from django.core.cache import cache
+from .models import CustomUser
+from .versioning import versions_shared
+
+# Registered usernames are looked up in a small per-process LRU first, then in
+# the shared Django cache, and only the remaining ones hit the database. With a
+# process-local Django cache the second layer is skipped: another worker's
+# invalidation could never reach it
+LOCAL_CACHE_SIZE = 10000
+LOCAL_CACHE_TTL = 60
+SHARED_CACHE_TTL = 60 * 60
+
+# Stored for usernames that are not registered, None cannot be told apart from a miss.
+# Only kept in the local LRU, so a user registered without the signals firing (a bulk
+# insert, a raw update) is found again within LOCAL_CACHE_TTL at most
+NOT_REGISTERED = False
+
+
+class LRUCache:
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        found = {}
+        with self.lock:
+            for key in keys:
+                entry = self.entries.get(key)
+                if entry is None:
+                    continue
+                value, expires_at = entry
+                if expires_at < now:
+                    del self.entries[key]
+                    continue
+                self.entries.move_to_end(key)
+                found[key] = value
+        return found
+
+    def set_many(self, values):
+        expires_at = time.monotonic() + self.ttl
+        with self.lock:
+            for key, value in values.items():
+                self.entries[key] = (value, expires_at)
+                self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+local_cache = LRUCache(LOCAL_CACHE_SIZE, LOCAL_CACHE_TTL)
+
+
+def cache_key(username):
+    return f'registered-user:{username}'
+
+
+def lookup_users(usernames):
+    """Returns {username: {'id': ..., 'email': ...}} for the registered ones among usernames.
+
+    Whatever is not cached is resolved with a single IN query.
+    """
+    usernames = {username for username in usernames if username}
+    if not usernames:
+        return {}
+
+    results = local_cache.get_many(usernames)
+
+    missing = usernames - results.keys()
+    use_shared = versions_shared()
+    if missing and use_shared:
+        shared = cache.get_many([cache_key(username) for username in missing])
+        from_shared = {username: shared[cache_key(username)] for username in missing if cache_key(username) in shared}
+        local_cache.set_many(from_shared)
+        results.update(from_shared)
+        missing -= from_shared.keys()
+
+    if missing:
+        from_db = {username: NOT_REGISTERED for username in missing}
+        for user_id, username, email in CustomUser.objects.filter(username__in=missing).values_list('id', 'username', 'email'):
+            from_db[username] = {'id': user_id, 'email': email}
+        if use_shared:
+            registered = {cache_key(username): value for username, value in from_db.items() if value is not NOT_REGISTERED}
+            cache.set_many(registered, SHARED_CACHE_TTL)
+        local_cache.set_many(from_db)
+        results.update(from_db)
+
+    return {username: value for username, value in results.items() if value is not NOT_REGISTERED}
+
+
+def lookup_user(username):
+    return lookup_users([username]).get(username)
+
+
+def invalidate_usernames(usernames):
+    usernames = [username for username in usernames if username]
+    local_cache.delete_many(usernames)
+    if versions_shared():
+        cache.delete_many([cache_key(username) for username in usernames])
@@ -0,0 +1,17 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from .lookups import invalidate_usernames
+from .models import CustomUser
+
+
+# Remembering the loaded username so a rename also drops the old cache entry
+@receiver(post_init, sender=CustomUser)
+def remember_username(sender, instance, **kwargs):
+    instance._loaded_username = instance.username
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_user_lookup(sender, instance, **kwargs):
+    invalidate_usernames({instance.username, getattr(instance, '_loaded_username', None)})
+    instance._loaded_username = instance.username
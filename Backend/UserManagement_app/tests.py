@@ -1,3 +1,75 @@
-from django.test import TestCase
+import tempfile
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from .lookups import cache_key, local_cache, lookup_user
+from .models import CustomUser
+from .factories import client_for, make_user
 
-# Create your tests here.
+
+class DataVersionETagTests(TestCase):
+    def setUp(self):
+        self.client = client_for(make_user())
+
+    def add_expense(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/expenses/', {'date': '2024-01-02', 'name': 'Lunch', 'amount': '12.50', 'expense_type': 'Personal'}, format='json')
+
+    def test_no_etags_with_a_process_local_cache(self):
+        response = self.client.get('/expenses/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+
+    def test_etag_follows_writes_with_a_shared_cache(self):
+        with tempfile.TemporaryDirectory() as location:
+            shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}}
+            with override_settings(CACHES=shared):
+                etag = self.client.get('/expenses/')['ETag']
+                self.assertEqual(self.client.get('/expenses/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+                self.add_expense()
+                response = self.client.get('/expenses/', HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+                cache.clear()
+
+
+class UserLookupTests(TestCase):
+    def setUp(self):
+        local_cache.clear()
+
+    def test_registering_a_looked_up_username(self):
+        self.assertIsNone(lookup_user('bob'))
+        bob = make_user('bob')
+        self.assertEqual(lookup_user('bob'), {'id': bob.id, 'email': 'bob@example.com'})
+
+    def test_renaming_a_looked_up_user(self):
+        bob = make_user('bob')
+        self.assertEqual(lookup_user('bob')['id'], bob.id)
+        self.assertIsNone(lookup_user('robert'))
+
+        bob.username = 'robert'
+        bob.save()
+        self.assertIsNone(lookup_user('bob'))
+        self.assertEqual(lookup_user('robert')['id'], bob.id)
+
+    def test_process_local_cache_is_not_used_as_a_shared_layer(self):
+        make_user('bob')
+        lookup_user('bob')
+        lookup_user('carol')
+        self.assertIsNone(cache.get(cache_key('bob')))
+        self.assertIsNone(cache.get(cache_key('carol')))
+
+    def test_unregistered_usernames_are_not_shared(self):
+        with tempfile.TemporaryDirectory() as location:
+            shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}}
+            with override_settings(CACHES=shared):
+                bob = make_user('bob')
+                lookup_user('bob')
+                self.assertIsNone(lookup_user('carol'))
+                self.assertEqual(cache.get(cache_key('bob')), {'id': bob.id, 'email': 'bob@example.com'})
+
+                # Registered without the signals that invalidate, as another process would see it
+                carol = CustomUser.objects.bulk_create([CustomUser(username='carol', email='carol@example.com')])[0]
+                local_cache.clear()
+                self.assertEqual(lookup_user('carol')['id'], carol.id)
+                cache.clear()
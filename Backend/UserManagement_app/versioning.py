@@ -0,0 +1,131 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+# Per-user counters bumped after committed writes. The 'data' scope covers the user's
+# expenses, group details and friends and read endpoints derive their ETags from it;
+# other scopes track narrower slices of data for the caches built on them
+VERSION_KEY = '{}-version:{}'
+
+DATA = 'data'
+
+# Caches private to one process: a write made by another web worker, a management
+# command or a Celery worker never bumps the counters they hold
+PROCESS_LOCAL_CACHES = [
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+]
+
+
+# Versions can only be relied on when every process sees the same counters
+def versions_shared():
+    return settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES
+
+
+def version_key(user_id, scope=DATA):
+    return VERSION_KEY.format(scope, user_id)
+
+
+# A missing counter restarts from the clock so it never repeats a version handed out before
+def initial_version():
+    return time.time_ns()
+
+
+def get_data_version(user_id, scope=DATA):
+    key = version_key(user_id, scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, initial_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_now(user_ids, scope=DATA):
+    for user_id in user_ids:
+        key = version_key(user_id, scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, initial_version(), timeout=None)
+
+
+# Bumped only once the write is committed, so a reader never pairs a new version with old data
+def bump_data_versions(user_ids, scope=DATA):
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if user_ids:
+        transaction.on_commit(lambda: bump_now(user_ids, scope))
+
+
+class NotModified(Exception):
+    pass
+
+
+class DataVersionETagMixin:
+    """ETags for read endpoints whose response only depends on the requesting user's data.
+
+    A GET whose If-None-Match still matches gets a 304 before the view runs any
+    query: the user id is read from the already verified JWT, so the only work is
+    one cache lookup for the data version. Without a shared cache no ETags are
+    handed out, every response is computed fresh.
+    """
+
+    etag = None
+
+    def make_etag(self, request, user_id):
+        version = get_data_version(user_id)
+        identity = f"{user_id}:{type(self).__name__}:{request.get_full_path()}"
+        digest = hashlib.sha1(identity.encode('utf-8')).hexdigest()[:16]
+        return f'W/"{version}-{digest}"'
+
+    def check_not_modified(self, request, user_id):
+        self.etag = self.make_etag(request, user_id)
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            etags = parse_etags(if_none_match)
+            if '*' in etags or self.etag in etags or self.etag.removeprefix('W/') in etags:
+                raise NotModified()
+
+    def token_user_id(self, request):
+        authentication = JWTAuthentication()
+        header = authentication.get_header(request)
+        raw_token = authentication.get_raw_token(header) if header else None
+        if raw_token is None:
+            return None
+        try:
+            return authentication.get_validated_token(raw_token).get(jwt_settings.USER_ID_CLAIM)
+        except (InvalidToken, TokenError):
+            return None
+
+    def initial(self, request, *args, **kwargs):
+        self.etag = None
+        conditional = request.method in ('GET', 'HEAD') and versions_shared()
+        if conditional:
+            user_id = self.token_user_id(request)
+            if user_id is not None:
+                self.check_not_modified(request, user_id)
+
+        super().initial(request, *args, **kwargs)
+
+        # Other authentication methods are checked once the user is loaded
+        if conditional and self.etag is None and request.user.is_authenticated:
+            self.check_not_modified(request, request.user.id)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': self.etag})
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.etag and response.status_code == status.HTTP_200_OK:
+            response['ETag'] = self.etag
+            response['Cache-Control'] = 'private, no-cache'
+        return response
@@ -77,6 +77,25 @@ DATABASES = {
     }
 }
 
+# Cache
+# Shared Redis cache when REDIS_CACHE_URL is set, otherwise a local-memory cache per process
+
+REDIS_CACHE_URL = os.environ.get('REDIS_CACHE_URL')
+
+if REDIS_CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -173,9 +192,20 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Asia/Kolkata'
 
+# Soft-deleted expenses and group details are purged after this, sync cursors older than it must resync
+EXPENSE_TOMBSTONE_RETENTION = timedelta(days=30)
+
 CELERY_BEAT_SCHEDULE = {
     'check-scheduled-reminders': {
         'task': 'Notification_app.tasks.check_scheduled_reminders',
         'schedule': crontab(minute='*/15'),  # It will run every 15 minutes
     },
+    'snapshot-expense-states': {
+        'task': 'Expenses_app.tasks.snapshot_expense_states',
+        'schedule': crontab(minute=0, hour=3),  # It will run every night at 3 AM
+    },
+    'purge-deleted-expenses': {
+        'task': 'Expenses_app.tasks.purge_deleted_expenses',
+        'schedule': crontab(minute=30, hour=3),  # It will run every night at 3:30 AM
+    },
 }